@@ -0,0 +1,203 @@
+# block-aware streaming reader for lammps fix ave/time output (rdf_nnp.dat, energy_nnp.dat, ...)
+# and for the plain column tables written by the trajectory post-processing (msd-all.dat, pdf-X-X.dat)
+import itertools
+from collections import deque
+import numpy as np
+
+# blocking analysis from lammps_simulation/blocking.py when it is importable (e.g. PYTHONPATH=../lammps_simulation),
+# otherwise errors come from the batch means only
+try:
+    from blocking import OnlineBlocking
+except ImportError:
+    OnlineBlocking = None
+
+def read_header(f):
+    """read the header of an open file, return (layout, column names, number of header lines)
+
+    layout is 'vector' for fix ave/time ... mode vector, 'scalar' for the default
+    scalar mode and 'table' for plain files with a single line of column names
+    """
+    first = f.readline()
+    if first.startswith('# Time-averaged data'):
+        second = f.readline()
+        if 'Number-of-rows' in second:
+            names = f.readline().lstrip('#').split()
+            return 'vector', names, 3
+        return 'scalar', second.lstrip('#').split(), 2
+
+    # plain table: optional line of column names
+    names = first.split()
+    try:
+        [float(x) for x in names]
+    except ValueError:
+        return 'table', names, 1
+    return 'table', ['col%d' % (i + 1) for i in range(len(names))], 0
+
+def iter_blocks(filename):
+    """yield (timestep, rows) for every block of a mode vector file, one block in memory at a time"""
+    with open(filename, 'r') as f:
+        layout, names, _ = read_header(f)
+        if layout != 'vector':
+            raise ValueError(f'{filename} is not a fix ave/time mode vector file')
+        ncols = len(names)
+
+        for line in f:
+            parts = line.split()
+            if not parts or line.startswith('#'):
+                continue
+            timestep, nrows = int(parts[0]), int(parts[1])
+            # the block header gives the row count, so the whole block is read and converted at once
+            rows = np.empty((nrows, ncols))
+            text = ''.join(itertools.islice(f, nrows))
+            values = np.array(text.split(), dtype=float)
+            if values.size != nrows * ncols:
+                break  # truncated last block of a run that is still writing
+            rows[:] = values.reshape(nrows, ncols)
+            yield timestep, rows
+
+def iter_scalar_chunks(filename, chunk_rows=100000):
+    """yield (timesteps, values) chunks of a scalar mode file"""
+    with open(filename, 'r') as f:
+        layout, names, _ = read_header(f)
+        if layout != 'scalar':
+            raise ValueError(f'{filename} is not a fix ave/time scalar mode file')
+        ncols = len(names)
+        while True:
+            text = ''.join(itertools.islice(f, chunk_rows))
+            if not text:
+                break
+            values = np.array(text.split(), dtype=float)
+            values = values[:values.size // ncols * ncols].reshape(-1, ncols)
+            yield values[:, 0].astype(np.int64), values[:, 1:]
+
+def read_table(filename):
+    """read a plain column table (or a whole scalar mode file), return (column names, array)"""
+    with open(filename, 'r') as f:
+        layout, names, nheader = read_header(f)
+    if layout == 'vector':
+        raise ValueError(f'{filename} has per-timestep blocks, use iter_blocks or average_blocks')
+    data = np.loadtxt(filename, skiprows=nheader, comments='#', ndmin=2)
+    return names, data
+
+class BlockAverager:
+    """running, windowed and batch-averaged statistics over a stream of equally shaped blocks"""
+
+    def __init__(self, window=None, batch_size=1, series_rows=None):
+        self.window = window
+        self.batch_size = batch_size
+        self.series_rows = series_rows
+        self.count = 0
+        self.total = None
+        self.recent = deque(maxlen=window) if window else None
+        self.batch_sum = None
+        self.batch_count = 0
+        self.batch_means = []
+        self.timesteps = []
+        self.series = []
+        self.blocking = OnlineBlocking() if OnlineBlocking is not None else None
+
+    def add(self, timestep, block):
+        if self.total is None:
+            self.total = np.zeros_like(block)
+            self.batch_sum = np.zeros_like(block)
+        self.count += 1
+        self.total += block
+        if self.recent is not None:
+            self.recent.append(block)
+
+        self.batch_sum += block
+        self.batch_count += 1
+        if self.batch_count == self.batch_size:
+            self.batch_means.append(self.batch_sum / self.batch_size)
+            self.batch_sum = np.zeros_like(block)
+            self.batch_count = 0
+
+        if self.blocking is not None:
+            self.blocking.add(block)
+        self.timesteps.append(timestep)
+        if self.series_rows is not None:
+            self.series.append(block[self.series_rows].copy())
+
+    def running_mean(self):
+        return self.total / self.count
+
+    def window_mean(self):
+        if self.recent is None:
+            return self.running_mean()
+        return np.mean(self.recent, axis=0)
+
+    def error(self):
+        """standard error of the mean from the spread of batch averages (nan with fewer than 2 batches)"""
+        nbatches = len(self.batch_means)
+        if nbatches < 2:
+            return np.full_like(self.total, np.nan)
+        return np.std(self.batch_means, axis=0, ddof=1) / np.sqrt(nbatches)
+
+    def blocking_result(self):
+        """flyvbjerg-petersen blocking result (error, statistical inefficiency, convergence) for every element
+
+        'method' names the estimator: without blocking.py it is the batch-mean error, which ignores the
+        correlation between batches, and inefficiency and converged are None (not tested)
+        """
+        if self.blocking is None:
+            return {'error': self.error(), 'inefficiency': None, 'converged': None,
+                    'method': f'batch means of {self.batch_size} blocks (blocking.py not importable)'}
+        result = dict(self.blocking.result())
+        result['method'] = 'blocking'
+        return result
+
+def average_blocks(filename, window=None, batch_size=1, series_rows=None, skip=0):
+    """stream a mode vector file through a BlockAverager, optionally skipping the first blocks"""
+    averager = BlockAverager(window, batch_size, series_rows)
+    for i, (timestep, rows) in enumerate(iter_blocks(filename)):
+        if i >= skip:
+            averager.add(timestep, rows)
+    return averager
+
+def average_scalar(filename, window=None, batch_size=1, skip=0):
+    """stream a scalar mode file (e.g. energy_nnp.dat) through a BlockAverager, one row per block"""
+    averager = BlockAverager(window, batch_size, series_rows=slice(None))
+    nrows = 0
+    for timesteps, values in iter_scalar_chunks(filename):
+        for timestep, row in zip(timesteps, values):
+            if nrows >= skip:
+                averager.add(int(timestep), row)
+            nrows += 1
+    return averager
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='summarize a lammps fix ave/time output file')
+    parser.add_argument('filename', help='e.g. rdf_nnp.dat or energy_nnp.dat')
+    parser.add_argument('--window', type=int, default=None, help='number of most recent blocks for the windowed average')
+    parser.add_argument('--batch', type=int, default=1, help='blocks per batch for the batch-mean error')
+    parser.add_argument('--skip', type=int, default=0, help='number of leading blocks to discard (equilibration)')
+    args = parser.parse_args()
+
+    with open(args.filename) as f:
+        layout, names, _ = read_header(f)
+
+    if layout == 'vector':
+        avg = average_blocks(args.filename, args.window, args.batch, skip=args.skip)
+        result = avg.blocking_result()
+        mean, err = avg.running_mean(), result['error']
+        print(f'{avg.count} blocks, timesteps {avg.timesteps[0]} ... {avg.timesteps[-1]}'
+              f', errors from {result["method"]}')
+        print(' '.join(names) + '  (mean +- error)')
+        for row, row_err in zip(mean, err):
+            print(' '.join(f'{v:.6g}' for v in row) + '  +- ' + ' '.join(f'{e:.2g}' for e in row_err[1:]))
+    elif layout == 'scalar':
+        avg = average_scalar(args.filename, args.window, args.batch, skip=args.skip)
+        result = avg.blocking_result()
+        print(f'{avg.count} rows, timesteps {avg.timesteps[0]} ... {avg.timesteps[-1]}'
+              f', errors from {result["method"]}')
+        for i, name in enumerate(names[1:]):
+            if result['converged'] is None:
+                print(f"{name}: {avg.running_mean()[i]:.6g} +- {result['error'][i]:.2g}")
+                continue
+            note = '' if result['converged'][i] else '  (not converged, run longer)'
+            print(f"{name}: {avg.running_mean()[i]:.6g} +- {result['error'][i]:.2g} "
+                  f"(statistical inefficiency {result['inefficiency'][i]:.1f}){note}")
+    else:
+        names, data = read_table(args.filename)
+        print(f'{len(data)} rows, columns: {" ".join(names)}')
@@ -1,9 +1,9 @@
 # plot msd and pdf from 1000 step simulation
-import numpy as np
 import matplotlib.pyplot as plt
+from ave_time_reader import read_table
 
 # read msd data
-msd_data = np.loadtxt('msd-all.dat', skiprows=1)
+msd_names, msd_data = read_table('msd-all.dat')
 plt.figure(figsize=(12, 5))
 
 # msd plot
@@ -16,7 +16,7 @@ plt.grid(True, alpha=0.3)
 
 # pdf plot
 plt.subplot(1, 2, 2)
-pdf_data = np.loadtxt('pdf-X-X.dat', skiprows=1)
+pdf_names, pdf_data = read_table('pdf-X-X.dat')
 distances = pdf_data[:, 0]
 pdf_values = pdf_data[:, 1]
 
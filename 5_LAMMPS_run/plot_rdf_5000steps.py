@@ -1,28 +1,30 @@
 # plot rdf from 5000 step simulation
 import numpy as np
 import matplotlib.pyplot as plt
+from ave_time_reader import average_blocks
 
-# read rdf data
-rdf_data = []
-with open('rdf_5k.dat', 'r') as f:
-   for line in f:
-       if not line.startswith('#') and 'TimeStep' not in line:
-           parts = line.strip().split()
-           if len(parts) >= 3:
-               try:
-                   r = float(parts[1])
-                   gr = float(parts[2])
-                   rdf_data.append([r, gr])
-               except:
-                   continue
+# read rdf data block by block (fix ave/time mode vector, one block per output timestep)
+# columns: row, r, g(r), coord(r)
+rdf = average_blocks('rdf_5k.dat', batch_size=1)
+rdf_mean = rdf.running_mean()
+# blocking error (accounts for correlation between blocks) when lammps_simulation/blocking.py is importable,
+# e.g. PYTHONPATH=../lammps_simulation; otherwise the uncorrelated batch-mean error, which underestimates it
+result = rdf.blocking_result()
+rdf_err = result['error']
+print(f'averaged {rdf.count} rdf blocks (timesteps {rdf.timesteps[0]} to {rdf.timesteps[-1]}), '
+      f'error band from {result["method"]}')
 
-rdf_array = np.array(rdf_data)
+r = rdf_mean[:, 1]
+gr = rdf_mean[:, 2]
+gr_err = rdf_err[:, 2]
 
 plt.figure(figsize=(8, 6))
-plt.plot(rdf_array[:, 0], rdf_array[:, 1], 'navy', linewidth=2)
+plt.plot(r, gr, 'navy', linewidth=2)
+if np.all(np.isfinite(gr_err)):
+    plt.fill_between(r, gr - gr_err, gr + gr_err, color='navy', alpha=0.3, linewidth=0)
 plt.xlabel('distance r (a)')
 plt.ylabel('g(r)')
-plt.title('radial distribution function (5000 steps)')
+plt.title(f'radial distribution function (5000 steps, {rdf.count} blocks)')
 plt.grid(True, alpha=0.3)
 plt.xlim(0, 8)
 plt.savefig('rdf_5000steps.png', dpi=150, bbox_inches='tight')
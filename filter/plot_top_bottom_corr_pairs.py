@@ -1,9 +1,11 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
 import os
 
-def plot_extreme_corr_pairs(data_path, corr_table_path, output_dir="extreme_corr_plots", top_n=10):
+def plot_extreme_corr_pairs(data_path, corr_table_path, output_dir="extreme_corr_plots", top_n=10,
+                            density=None, bins=200):
     # 加载数据和相关性表
     data = np.loadtxt(data_path, delimiter=",")
     df_corr = pd.read_csv(corr_table_path)
@@ -18,10 +20,21 @@ def plot_extreme_corr_pairs(data_path, corr_table_path, output_dir="extreme_corr
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
 
+    # 样本很多时画二维直方图（密度栅格），绘图时间与点数无关
+    if density is None:
+        density = len(data) > 100000
+
     # 画图函数
     def plot_pair(i, j, r, label, rank):
         plt.figure(figsize=(6, 6))
-        plt.scatter(data[:, i], data[:, j], alpha=0.5, s=10)
+        if density:
+            counts, xedges, yedges = np.histogram2d(data[:, i], data[:, j], bins=bins)
+            plt.imshow(np.ma.masked_equal(counts.T, 0), origin="lower", aspect="auto", interpolation="nearest",
+                       extent=(xedges[0], xedges[-1], yedges[0], yedges[-1]),
+                       norm=LogNorm(vmin=1, vmax=max(counts.max(), 2)))
+            plt.colorbar(label="Samples per bin")
+        else:
+            plt.scatter(data[:, i], data[:, j], alpha=0.5, s=10)
         plt.xlabel(f"Function {i}")
         plt.ylabel(f"Function {j}")
         plt.title(f"{label} {rank}: f{i} vs f{j}\nPearson r = {r:.4f}")
@@ -47,7 +60,12 @@ if __name__ == "__main__":
     parser.add_argument("corr_table_csv", help="CSV file of correlation table (e.g. correlation_table.csv)")
     parser.add_argument("--output_dir", default="extreme_corr_plots", help="Folder to save plots")
     parser.add_argument("--top_n", type=int, default=10, help="Number of top/bottom pairs to plot")
+    parser.add_argument("--density", dest="density", action="store_true", default=None,
+                        help="Draw 2D histograms instead of scatter plots (default: above 100000 samples)")
+    parser.add_argument("--scatter", dest="density", action="store_false", help="Always draw scatter plots")
+    parser.add_argument("--bins", type=int, default=200, help="Histogram bins per axis in density mode")
     args = parser.parse_args()
 
-    plot_extreme_corr_pairs(args.data_csv, args.corr_table_csv, args.output_dir, args.top_n)
+    plot_extreme_corr_pairs(args.data_csv, args.corr_table_csv, args.output_dir, args.top_n,
+                            args.density, args.bins)
 
@@ -0,0 +1,182 @@
+import numpy as np
+import argparse
+import os
+import re
+
+# n2p2 sf_index order (same key as lammps_simulation/symmetry_functions.py)
+def sf_sort_key(parts):
+    sf_type = int(parts[2])
+    if sf_type == 2:
+        # symfunction_short <e_c> 2 <e_1> <eta> <rs> <rc>
+        return (2, (parts[3],), float(parts[6]), float(parts[4]), float(parts[5]), 0.0, 0.0)
+    # symfunction_short <e_c> 3|9 <e_1> <e_2> <eta> <lambda> <zeta> <rc> [<rs>]
+    rs = float(parts[9]) if len(parts) > 9 else 0.0
+    return (sf_type, (parts[3], parts[4]), float(parts[8]), float(parts[5]), rs, float(parts[7]), float(parts[6]))
+
+def read_symfunction_lines(input_nn):
+    """All lines of input.nn and, in sf_index order, (line number, sf type, cutoff) of every symfunction_short line"""
+    with open(input_nn, "r") as f:
+        lines = f.readlines()
+    entries = []
+    for number, line in enumerate(lines):
+        parts = line.split("#")[0].split()
+        if parts and parts[0] == "symfunction_short":
+            key = sf_sort_key(parts)
+            entries.append((key, number, key[0], key[2]))
+    entries.sort()
+    return lines, [entry[1:] for entry in entries]
+
+def read_sensitivity(path):
+    """(sf_index, msa_norm, max_norm, msa_phys, max_phys) columns of an n2p2 sensitivity.XXX.out"""
+    data = np.loadtxt(path, comments="#", ndmin=2)
+    data = data[np.argsort(data[:, 0])]
+    return data[:, 0].astype(int), data[:, 1], data[:, 2], data[:, 3], data[:, 4]
+
+def redundant_by_correlation(data, sensitivity, threshold):
+    """Functions that correlate with a more sensitive kept function at |r| >= threshold: {dropped: partner}"""
+    variances = np.var(data, axis=0)
+    corr = np.abs(np.corrcoef(data[:, variances > 0].T))
+    full = np.zeros((data.shape[1], data.shape[1]))
+    valid = np.where(variances > 0)[0]
+    full[np.ix_(valid, valid)] = corr
+    np.fill_diagonal(full, 0.0)
+
+    # walk from the most to the least sensitive function, like filter_symfuncs but keeping the sensitive member
+    redundant = {}
+    for i in np.argsort(-sensitivity):
+        if i in redundant:
+            continue
+        for j in np.where(full[i] >= threshold)[0]:
+            if j not in redundant and sensitivity[j] <= sensitivity[i]:
+                redundant[j] = i
+    return redundant
+
+def select_by_budget(sensitivity, budget, removable, min_functions=1, preferred=()):
+    """Drop functions while their summed sensitivity stays <= budget (%)
+
+    preferred functions (correlated with a kept one) are tried first, then the least sensitive removable ones,
+    each group from the smallest sensitivity up.
+    """
+    preferred = sorted(preferred, key=lambda i: sensitivity[i])
+    order = preferred + [i for i in np.argsort(sensitivity) if i not in set(preferred)]
+    dropped = []
+    total = 0.0
+    for i in order:
+        if not removable[i] or len(sensitivity) - len(dropped) <= min_functions:
+            continue
+        if total + sensitivity[i] > budget:
+            continue
+        dropped.append(i)
+        total += sensitivity[i]
+    return dropped, total
+
+def evaluations_per_atom(symfuncs, density):
+    """Symmetry function terms per atom: radial functions per neighbor, angular functions per neighbor pair"""
+    total = 0.0
+    for _, sf_type, cutoff in symfuncs:
+        neighbors = 4.0 / 3.0 * np.pi * cutoff**3 * density
+        total += neighbors if sf_type == 2 else neighbors * (neighbors - 1) / 2
+    return total
+
+def prune(input_nn, scaling_file, sensitivity_file, budget=1.0, column="msa", data_csv=None, corr_threshold=0.99,
+          min_functions=1, output_dir="pruned", density=0.0211):
+    indices, msa_norm, max_norm, _, _ = read_sensitivity(sensitivity_file)
+    sensitivity = msa_norm if column == "msa" else max_norm
+    lines, symfuncs = read_symfunction_lines(input_nn)
+    n = len(symfuncs)
+    if len(indices) != n or indices[0] != 1 or indices[-1] != n:
+        raise ValueError(f"[×] {sensitivity_file} has {len(indices)} functions, {input_nn} has {n}")
+    print(f"[✓] Loaded {n} symmetry functions and their {column} sensitivity (sum {sensitivity.sum():.2f}%)")
+
+    removable = np.ones(n, dtype=bool)
+    redundant = {}
+    if data_csv:
+        data = np.loadtxt(data_csv, delimiter=",", ndmin=2)
+        if data.shape[1] != n:
+            raise ValueError(f"[×] {data_csv} has {data.shape[1]} columns, expected {n}")
+        redundant = redundant_by_correlation(data, sensitivity, corr_threshold)
+        # the kept partners carry the information of their correlated functions
+        removable[list(set(redundant.values()))] = False
+        print(f"[✓] {len(redundant)} functions are redundant at |r| >= {corr_threshold} "
+              f"(sensitivity {sum(sensitivity[j] for j in redundant):.3f}%)")
+
+    # correlated and low-sensitivity drops share one cumulative budget
+    dropped, total = select_by_budget(sensitivity, budget, removable, min_functions, preferred=list(redundant))
+    correlated = [i for i in dropped if i in redundant]
+    redundant = {i: redundant[i] for i in correlated}
+    removed = sorted(dropped)
+    retained = [i for i in range(n) if i not in set(removed)]
+    print(f"[✓] Budget {budget}%: dropped {len(correlated)} correlated "
+          f"({sum(sensitivity[i] for i in correlated):.3f}%) and {len(dropped) - len(correlated)} low-sensitivity "
+          f"functions, {total:.3f}% of the total sensitivity")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # input.nn: removed functions stay in the file as comments
+    removed_lines = {symfuncs[i][0]: i for i in removed}
+    with open(os.path.join(output_dir, "input.nn"), "w") as f:
+        f.write(f"# Pruned with {os.path.basename(sensitivity_file)}: {len(retained)} of {n} symmetry functions kept\n")
+        for number, line in enumerate(lines):
+            if number in removed_lines:
+                i = removed_lines[number]
+                reason = f"r >= {corr_threshold} with sf {redundant[i] + 1}" if i in redundant \
+                    else f"sensitivity {sensitivity[i]:.3g}%"
+                f.write(f"# pruned sf {i + 1} ({reason}): {line}")
+            else:
+                f.write(line)
+
+    # scaling.data: keep the retained rows, renumbered in the new sf_index order
+    new_index = {i + 1: k + 1 for k, i in enumerate(retained)}
+    with open(scaling_file, "r") as f, open(os.path.join(output_dir, "scaling.data"), "w") as out:
+        for line in f:
+            parts = line.split()
+            if line.startswith("#") or len(parts) < 6:
+                out.write(line)
+                continue
+            sf_index = int(parts[1])
+            if sf_index in new_index:
+                # replace the second field in place to keep the column widths
+                out.write(re.sub(r"^(\s*\S+)(\s+\d+)", lambda m: m.group(1) +
+                                 f"{new_index[sf_index]:>{len(m.group(2))}}", line, count=1))
+
+    with open(os.path.join(output_dir, "retained_sf_indices.txt"), "w") as f:
+        f.write("# new_sf_index old_sf_index sensitivity_percent\n")
+        for k, i in enumerate(retained):
+            f.write(f"{k + 1} {i + 1} {sensitivity[i]:.6g}\n")
+
+    before = evaluations_per_atom(symfuncs, density)
+    after = evaluations_per_atom([symfuncs[i] for i in retained], density)
+    radial = sum(1 for i in retained if symfuncs[i][1] == 2)
+    print(f"[✓] Kept {len(retained)} of {n} functions ({radial} radial, {len(retained) - radial} angular), "
+          f"retained sensitivity {sensitivity[retained].sum():.3f}%")
+    print(f"[✓] Symfunc terms per atom at {density} atoms/A^3: {before:.0f} -> {after:.0f} "
+          f"({100 * (1 - after / before):.1f}% fewer)")
+    print(f"[✓] Wrote {output_dir}/input.nn, {output_dir}/scaling.data, {output_dir}/retained_sf_indices.txt")
+    print("[!] The network input layer changed: retrain before using the pruned input.nn")
+    return retained
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune symmetry functions by n2p2 sensitivity and correlation")
+    parser.add_argument("--input-nn", default="input.nn", help="input.nn with the symfunction_short lines")
+    parser.add_argument("--scaling", default="scaling.data", help="scaling.data of the same functions")
+    parser.add_argument("--sensitivity", default="sensitivity.018.out", help="n2p2 sensitivity.XXX.out")
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="Largest total sensitivity (percent) that may be dropped")
+    parser.add_argument("--column", choices=["msa", "max"], default="msa",
+                        help="Mean square average or maximum normalized sensitivity")
+    parser.add_argument("--data", default=None,
+                        help="cleaned_symfunc.csv (columns in sf_index order) to also drop correlated functions")
+    parser.add_argument("--corr-threshold", type=float, default=0.99)
+    parser.add_argument("--min-functions", type=int, default=1)
+    parser.add_argument("--density", type=float, default=0.0211,
+                        help="Number density (atoms/A^3) for the evaluation count estimate")
+    parser.add_argument("--output-dir", default="pruned")
+    args = parser.parse_args()
+
+    for path in (args.input_nn, args.scaling, args.sensitivity):
+        if not os.path.exists(path):
+            print(f"ERROR: File {path} does not exist.")
+            exit(1)
+
+    prune(args.input_nn, args.scaling, args.sensitivity, args.budget, args.column, args.data, args.corr_threshold,
+          args.min_functions, args.output_dir, args.density)
@@ -0,0 +1,268 @@
+import numpy as np
+import argparse
+import os
+import re
+
+# relative cost of one multiply-add in the network to one symmetry function term (an exp and a cutoff)
+MAC_PER_TERM = 10.0
+
+def read_symfunc_file(path):
+    """(type, cutoff) of every symfunction_short line of input.nn, generated_symfuncs.txt or a filtered variant"""
+    functions = []
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split("#")[0].split()
+            if not parts or parts[0] != "symfunction_short":
+                continue
+            sf_type = int(parts[2])
+            # symfunction_short <e_c> 2 <e_1> <eta> <rs> <rc> | <e_c> 3|9 <e_1> <e_2> <eta> <lambda> <zeta> <rc> [<rs>]
+            functions.append((sf_type, float(parts[6] if sf_type == 2 else parts[8])))
+    return functions
+
+def _dump_frames(f):
+    """(cell rows, positions) of every frame of a LAMMPS dump; frames that are skipped are never parsed"""
+    for line in f:
+        if not line.startswith("ITEM: TIMESTEP"):
+            continue
+        next(f)
+        next(f)
+        natoms = int(next(f))
+        next(f)
+        bounds = np.array([next(f).split()[:2] for _ in range(3)], dtype=float)
+        header = next(f).split()[2:]
+        atoms = [next(f) for _ in range(natoms)]
+        yield bounds, header, atoms
+
+def _dump_positions(bounds, header, atoms):
+    lengths = bounds[:, 1] - bounds[:, 0]
+    for names, scaled in ((("x", "y", "z"), False), (("xu", "yu", "zu"), False), (("xs", "ys", "zs"), True)):
+        if all(name in header for name in names):
+            columns = [header.index(name) for name in names]
+            break
+    else:
+        raise ValueError(f"[×] Dump columns {' '.join(header)}: need x y z, xu yu zu or xs ys zs")
+    positions = np.array([line.split() for line in atoms], dtype=float)[:, columns]
+    positions = positions * lengths if scaled else positions - bounds[:, 0]
+    return np.diag(lengths), positions
+
+def _input_data_frames(f):
+    lattice, atoms = None, None
+    for line in f:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "begin":
+            lattice, atoms = [], []
+        elif parts[0] == "lattice":
+            lattice.append(parts[1:4])
+        elif parts[0] == "atom":
+            atoms.append(parts[1:4])
+        elif parts[0] == "end":
+            yield np.array(lattice, dtype=float), np.array(atoms, dtype=float)
+
+def _data_file_frame(text):
+    lines = text.split("\n")
+    bounds = np.array([line.split()[:2] for line in lines if re.search(r"\s[xyz]lo\s+[xyz]hi", line)], dtype=float)
+    natoms = int(next(line.split()[0] for line in lines if line.strip().endswith("atoms")))
+    start = next(k for k, line in enumerate(lines) if line.strip().startswith("Atoms"))
+    rows = [line.split("#")[0].split() for line in lines[start + 1:] if line.split("#")[0].strip()][:natoms]
+    return np.diag(bounds[:, 1] - bounds[:, 0]), np.array([row[2:5] for row in rows], dtype=float)
+
+def read_frames(path, every=1, max_frames=None):
+    """Yield (cell rows, positions) frames of a LAMMPS dump, LAMMPS data file or n2p2 input.data, one at a time"""
+    with open(path, "r") as f:
+        first = f.readline()
+        f.seek(0)
+        if first.startswith("ITEM:"):
+            frames = _dump_frames(f)
+        elif any(line.strip() == "begin" for line in f):
+            f.seek(0)
+            frames = _input_data_frames(f)
+        else:
+            f.seek(0)
+            frames = iter([_data_file_frame(f.read())])
+        used = 0
+        for number, frame in enumerate(frames):
+            if number % every:
+                continue
+            if max_frames and used >= max_frames:
+                break
+            used += 1
+            yield _dump_positions(*frame) if first.startswith("ITEM:") else frame
+
+def neighbor_counts(cell, positions, cutoffs, max_elements=2**22):
+    """Per-atom number of neighbors within each cutoff, periodic in all three cell directions
+
+    Cell list: atoms are binned into cells at least max(cutoffs) wide and only the 27 surrounding cells are
+    searched (with 1 or 2 cells along a direction the same cell is visited through different images). Boxes
+    thinner than the cutoff are replicated first. Memory stays below max_elements distances per chunk.
+    """
+    rc = max(cutoffs)
+    cell = np.asarray(cell, dtype=float)
+    natoms = len(positions)
+    frac = np.asarray(positions, dtype=float) @ np.linalg.inv(cell)
+    frac -= np.floor(frac)
+    frac[frac >= 1.0] = 0.0
+    volume = abs(np.linalg.det(cell))
+    spacings = np.array([volume / np.linalg.norm(np.cross(cell[(k + 1) % 3], cell[(k + 2) % 3])) for k in range(3)])
+    repeat = np.maximum(1, np.ceil(rc / spacings)).astype(np.int64)
+    if (repeat > 1).any():
+        # image (0, 0, 0) comes first, so the original atoms keep indices 0 .. natoms - 1
+        images = np.array(list(np.ndindex(*repeat)))
+        frac = ((frac[None, :, :] + images[:, None, :]) / repeat).reshape(-1, 3)
+        cell = cell * repeat[:, None]
+        spacings = spacings * repeat
+    positions = frac @ cell
+
+    nbins = np.maximum(1, np.floor(spacings / rc)).astype(np.int64)
+    bins = np.minimum((frac * nbins).astype(np.int64), nbins - 1)
+    cell_id = np.ravel_multi_index(bins.T, nbins)
+    order = np.argsort(cell_id, kind="stable")
+    occupancy = np.bincount(cell_id, minlength=int(np.prod(nbins)))
+    starts = np.concatenate([[0], np.cumsum(occupancy)[:-1]])
+    # padded (cells, max occupancy) table of atom indices, the extra last position is a far away dummy atom
+    table = np.full((len(occupancy), occupancy.max()), len(positions), dtype=np.int64)
+    table[cell_id[order], np.arange(len(order)) - starts[cell_id[order]]] = order
+    padded = np.vstack([positions, np.full((1, 3), np.inf)])
+
+    counts = np.zeros((len(cutoffs), natoms), dtype=np.int64)
+    chunk = max(1, max_elements // table.shape[1])
+    for offset in np.ndindex(3, 3, 3):
+        target = bins[:natoms] + np.array(offset) - 1
+        wrapped = np.mod(target, nbins)
+        shift = ((target - wrapped) // nbins) @ cell
+        neighbor_cell = np.ravel_multi_index(wrapped.T, nbins)
+        for start in range(0, natoms, chunk):
+            stop = min(start + chunk, natoms)
+            d = padded[table[neighbor_cell[start:stop]]] + (shift[start:stop] - positions[start:stop])[:, None, :]
+            r2 = np.einsum("ijk,ijk->ij", d, d)
+            for k, cutoff in enumerate(cutoffs):
+                counts[k, start:stop] += (r2 < cutoff**2).sum(axis=1)
+    # every atom found itself once at distance 0
+    return counts - 1
+
+def neighbor_distribution(path, cutoffs, every=1, max_frames=None):
+    """{cutoff: array of per-atom neighbor counts over all frames}"""
+    counts = [neighbor_counts(cell, positions, cutoffs) for cell, positions in read_frames(path, every, max_frames)]
+    counts = np.concatenate(counts, axis=1)
+    return {cutoff: counts[k] for k, cutoff in enumerate(cutoffs)}
+
+def cost_per_atom(functions, distribution, hidden=(20, 20)):
+    """Symmetry function terms per atom (radial: neighbors, angular: neighbor pairs) and network multiply-adds"""
+    terms = 0.0
+    for sf_type, cutoff in functions:
+        n = distribution[cutoff]
+        # the mean of N(N-1)/2, not of N, so the spread of the neighbor count matters for angular functions
+        terms += n.mean() if sf_type == 2 else (n * (n - 1) / 2).mean()
+    layers = [len(functions)] + list(hidden) + [1]
+    macs = sum(a * b for a, b in zip(layers[:-1], layers[1:]))
+    return terms, macs
+
+def parse_lammps_log(path):
+    """Timing of the last run in a LAMMPS log"""
+    with open(path, "r") as f:
+        text = f.read()
+    loop = re.findall(r"Loop time of ([\d.eE+-]+) on (\d+) procs for (\d+) steps with (\d+) atoms", text)
+    performance = re.findall(r"Performance: ([\d.eE+-]+) ns/day, [\d.eE+-]+ hours/ns, ([\d.eE+-]+) timesteps/s", text)
+    pair = re.findall(r"^Pair\s*\|.*\|\s*([\d.]+)\s*$", text, re.M)
+    style = re.findall(r"^\s*pair_style\s+(\S+)", text, re.M)
+    if not loop or not performance:
+        raise ValueError(f"[×] No 'Loop time' / 'Performance' lines in {path}")
+    seconds, procs, steps, atoms = loop[-1]
+    ns_per_day, steps_per_second = (float(v) for v in performance[-1])
+    return {
+        'loop_time': float(seconds), 'procs': int(procs), 'steps': int(steps), 'atoms': int(atoms),
+        'ns_per_day': ns_per_day, 'timestep_ns': ns_per_day / (86400.0 * steps_per_second),
+        'pair_fraction': float(pair[-1]) / 100 if pair else 1.0,
+        'pair_style': style[-1] if style else None,
+    }
+
+def calibrate(logs, distribution, hidden):
+    """Seconds per cost unit per atom-step (fitted through the origin) and non-pair seconds per atom-step"""
+    units, pair_time, other_time = [], [], []
+    for log_path, symfunc_path in logs:
+        log = parse_lammps_log(log_path)
+        if log['pair_style'] not in ("hdnnp", "nnp"):
+            print(f"[!] {log_path} ran pair_style {log['pair_style']}, not hdnnp: its Pair time only scales the model")
+        terms, macs = cost_per_atom(read_symfunc_file(symfunc_path), distribution, hidden)
+        # CPU seconds per atom and step, assuming ideal parallel scaling
+        per_atom_step = log['loop_time'] * log['procs'] / (log['steps'] * log['atoms'])
+        units.append(terms + macs / MAC_PER_TERM)
+        pair_time.append(per_atom_step * log['pair_fraction'])
+        other_time.append(per_atom_step * (1.0 - log['pair_fraction']))
+        print(f"[✓] {log_path}: {log['atoms']} atoms, {log['procs']} procs, {log['ns_per_day']:g} ns/day, "
+              f"Pair {100 * log['pair_fraction']:.1f}%, {units[-1]:.0f} cost units per atom")
+    units, pair_time = np.array(units), np.array(pair_time)
+    seconds_per_unit = float(units @ pair_time / (units @ units))
+    return seconds_per_unit, float(np.mean(other_time)), log['timestep_ns']
+
+def predict_ns_per_day(units, seconds_per_unit, other_seconds, timestep_ns, atoms, procs):
+    step = atoms * (units * seconds_per_unit + other_seconds) / procs
+    return 86400.0 * timestep_ns / step
+
+def cost_report(symfunc_files, structure, logs=(), atoms=None, procs=None, hidden=(20, 20), every=1, max_frames=None,
+                output="symfunc_cost_report.txt"):
+    candidates = {path: read_symfunc_file(path) for path in symfunc_files}
+    cutoffs = sorted({rc for functions in candidates.values() for _, rc in functions} |
+                     {rc for _, path in logs for _, rc in read_symfunc_file(path)})
+    distribution = neighbor_distribution(structure, cutoffs, every, max_frames)
+    for cutoff in cutoffs:
+        n = distribution[cutoff]
+        print(f"[✓] Neighbors within {cutoff:g} A: mean {n.mean():.2f}, std {n.std():.2f}, "
+              f"range {n.min()}-{n.max()} ({len(n)} atom environments)")
+
+    calibration = None
+    if logs:
+        calibration = calibrate(logs, distribution, hidden)
+        first = parse_lammps_log(logs[0][0])
+        atoms = atoms or first['atoms']
+        procs = procs or first['procs']
+        print(f"[✓] Calibrated: {calibration[0]:.3e} s per cost unit, {calibration[1]:.3e} s per atom-step outside Pair")
+    else:
+        print("[!] No LAMMPS log given: reporting relative costs only")
+
+    rows = []
+    for path, functions in candidates.items():
+        terms, macs = cost_per_atom(functions, distribution, hidden)
+        radial = sum(1 for sf_type, _ in functions if sf_type == 2)
+        units = terms + macs / MAC_PER_TERM
+        ns_per_day = predict_ns_per_day(units, *calibration, atoms, procs) if calibration else float("nan")
+        rows.append((path, len(functions), radial, len(functions) - radial, terms, macs, units, ns_per_day))
+    reference = max(row[6] for row in rows)
+
+    header = f"{'file':<45} {'n_sf':>5} {'G2':>4} {'ang':>4} {'terms/atom':>11} {'MACs':>6} {'rel.cost':>8} {'ns/day':>9}"
+    lines = [header]
+    for path, n, radial, angular, terms, macs, units, ns_per_day in sorted(rows, key=lambda row: row[6]):
+        lines.append(f"{path:<45} {n:>5} {radial:>4} {angular:>4} {terms:>11.0f} {macs:>6} "
+                     f"{units / reference:>8.3f} {ns_per_day:>9.3f}")
+    print("\n".join(lines))
+    with open(output, "w") as f:
+        f.write(f"# structure {structure}, MAC_PER_TERM {MAC_PER_TERM}")
+        f.write(f", {atoms} atoms on {procs} procs\n" if calibration else "\n")
+        f.write("\n".join(lines) + "\n")
+    print(f"[✓] Report saved to {output}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate per-atom cost and MD throughput of symmetry function sets")
+    parser.add_argument("symfunc_files", nargs="+",
+                        help="input.nn, generated_symfuncs.txt or filtered_generated_symfuncs_XX.txt files")
+    parser.add_argument("--structure", required=True,
+                        help="LAMMPS dump, LAMMPS data file or n2p2 input.data for the neighbor-count distribution")
+    parser.add_argument("--log", nargs=2, action="append", default=[], metavar=("LOG", "SYMFUNCS"),
+                        help="LAMMPS log and the symfunc file it ran with, for calibration (repeatable)")
+    parser.add_argument("--atoms", type=int, default=None, help="System size for the prediction (default: from log)")
+    parser.add_argument("--procs", type=int, default=None, help="MPI ranks for the prediction (default: from log)")
+    parser.add_argument("--hidden", type=int, nargs="+", default=[20, 20], help="Hidden layer sizes")
+    parser.add_argument("--every", type=int, default=1, help="Use every n-th frame of a trajectory")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--output", default="symfunc_cost_report.txt")
+    args = parser.parse_args()
+
+    for path in args.symfunc_files + [args.structure] + [p for pair in args.log for p in pair]:
+        if not os.path.exists(path):
+            print(f"ERROR: File {path} does not exist.")
+            exit(1)
+
+    cost_report(args.symfunc_files, args.structure, [tuple(pair) for pair in args.log], args.atoms, args.procs,
+                args.hidden, args.every, args.max_frames, args.output)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Active-learning frame selection from MD trajectories
+
+Every frame of a dump or .ctrj trajectory is scored by how far its symmetry
+functions leave the scaling.data ranges and by how much a committee of weight
+sets (e.g. weights.001.data and weights.018.data) disagrees on its energy and,
+optionally, its forces. The symmetry functions are computed once per frame and
+fed to all models as one batch. Only the top-K frames are kept, in a bounded min-heap, so memory does
+not grow with the trajectory length; they are written as n2p2 input.data
+structures (energy and forces zero, to be recomputed by the reference method).
+"""
+
+import argparse
+import heapq
+import multiprocessing
+import numpy as np
+from hdnnp import Committee
+from neighbor_list import orthogonal_cell, wrap_positions
+from symmetry_functions import read_scaling
+
+_worker = {}
+
+def _init_worker(input_nn, weights, scaling_file, forces=False):
+    _worker['committee'] = Committee(input_nn, weights, scaling_file)
+    _worker['min'], _worker['max'], _, _ = read_scaling(scaling_file)
+    _worker['forces'] = forces
+
+def score_frame(frame):
+    """Extrapolation and committee statistics of one frame (runs in a worker process)"""
+    from follow_trajectory import get_positions
+    committee, lo, hi = _worker['committee'], _worker['min'], _worker['max']
+    positions, _ = get_positions(frame)
+    cell, origin = orthogonal_cell(frame['box'])
+    positions, _ = wrap_positions(positions, cell, origin)
+    first = committee.models[0]
+    neighbors = first.neighbors(positions, cell, origin)
+    G = first.symmetry_functions(positions, cell, neighbors=neighbors)
+    natoms = len(positions)
+
+    span = np.where(hi > lo, hi - lo, 1.0)
+    excess = np.maximum(np.maximum(lo - G, G - hi), 0.0) / span
+    force_std = 0.0
+    if _worker['forces']:
+        _, atomic, forces = (np.array(column) for column in zip(
+            *[model.energy_and_forces(positions, cell, G=G, neighbors=neighbors) for model in committee.models]))
+        # largest spread of a force vector, sqrt(sum over components of the variance over models)
+        force_std = float(np.sqrt(forces.var(axis=0).sum(axis=1)).max()) if len(forces) > 1 else 0.0
+    else:
+        atomic = committee.atomic_energies(G)
+    return {
+        'timestep': frame['timestep'],
+        'natoms': natoms,
+        'max_excess': float(excess.max()),
+        'atoms_outside': int((excess > 0).any(axis=1).sum()),
+        # spread of the committee, per atom of the frame and worst single atom
+        'energy_std': float(atomic.sum(axis=1).std() / natoms) if len(atomic) > 1 else 0.0,
+        'atomic_std': float(atomic.std(axis=0).max()) if len(atomic) > 1 else 0.0,
+        'force_std': force_std,
+        'lattice': cell,
+        'positions': positions - origin,
+    }
+
+def combined_score(result, mode='combined', energy_scale=1e-3, force_scale=0.05):
+    """Frame score; committee spreads are measured in units of energy_scale (eV/atom) and force_scale (eV/A)"""
+    extrapolation = result['max_excess']
+    disagreement = result['energy_std'] / energy_scale + result['force_std'] / force_scale
+    if mode == 'extrapolation':
+        return extrapolation
+    if mode == 'committee':
+        return disagreement
+    return extrapolation + disagreement
+
+def select_frames(filename, input_nn="input.nn", weights=("weights.001.data", "weights.018.data"),
+                  scaling_file="scaling.data", top=50, mode='combined', energy_scale=1e-3, force_scale=None,
+                  output="input.selected.data", scores="selection_scores.dat", element="Ar", nprocs=None):
+    """Stream a trajectory, keep the top-scoring frames and write them as n2p2 structures
+
+    Force disagreement is evaluated (at several times the cost) only when force_scale is given.
+    """
+    from compressed_trajectory import iter_frames
+    from convert_structure import format_n2p2
+
+    heap = []
+    rows = []
+    with multiprocessing.Pool(nprocs, initializer=_init_worker, initargs=(input_nn, list(weights), scaling_file, force_scale is not None)) as pool:
+        for count, result in enumerate(pool.imap(score_frame, iter_frames(filename), chunksize=2)):
+            score = combined_score(result, mode, energy_scale, force_scale or 1.0)
+            rows.append([result['timestep'], score, result['max_excess'], result['atoms_outside'],
+                         result['energy_std'], result['atomic_std'], result['force_std']])
+            # count breaks ties without comparing the frame dicts
+            item = (score, count, result)
+            if len(heap) < top:
+                heapq.heappush(heap, item)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    selected = sorted(heap, key=lambda item: -item[0])
+    with open(output, 'w') as f:
+        for score, _, result in selected:
+            structure = {
+                'comment': f"{filename} timestep {result['timestep']} score {score:.6g} "
+                           f"max_excess {result['max_excess']:.4g} committee_std {result['energy_std']:.4g} eV/atom",
+                'lattice': result['lattice'],
+                'positions': result['positions'],
+                'elements': [element] * result['natoms'],
+                'energy': None,
+                'charge': None,
+            }
+            f.write(format_n2p2(structure))
+    rows = np.array(rows).reshape(-1, 7)
+    np.savetxt(scores, rows, fmt=['%d', '%.6g', '%.6g', '%d', '%.6g', '%.6g', '%.6g'],
+               header="TimeStep score max_relative_excess atoms_extrapolating committee_std_per_atom max_atomic_std "
+                      "max_force_std")
+
+    print(f"[✓] Scored {len(rows)} frames of {filename} with {len(weights)} models ({mode})")
+    if selected:
+        print(f"[✓] Kept {len(selected)} frames, highest score {selected[0][0]:.4g}, lowest {selected[-1][0]:.4g}")
+        print(f"[✓] Timesteps: {' '.join(str(result['timestep']) for _, _, result in selected[:20])}"
+              f"{' ...' if len(selected) > 20 else ''}")
+    print(f"[✓] Structures written to {output}, all frame scores to {scores}")
+    return [result['timestep'] for _, _, result in selected]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Select informative MD frames for retraining")
+    parser.add_argument("filename", help="LAMMPS dump or .ctrj file")
+    parser.add_argument("--input-nn", default="input.nn")
+    parser.add_argument("--weights", nargs="+", default=["weights.001.data", "weights.018.data"],
+                        help="Weight files of the committee (same input.nn)")
+    parser.add_argument("--scaling", default="scaling.data")
+    parser.add_argument("-k", "--top", type=int, default=50, help="Number of frames to keep")
+    parser.add_argument("--mode", choices=["combined", "extrapolation", "committee"], default="combined")
+    parser.add_argument("--energy-scale", type=float, default=1e-3,
+                        help="Committee spread (eV/atom) that counts as much as a full scaling range of excess")
+    parser.add_argument("--force-scale", type=float, default=None,
+                        help="Also score force disagreement, in units of this spread (eV/Angstrom)")
+    parser.add_argument("-o", "--output", default="input.selected.data")
+    parser.add_argument("--scores", default="selection_scores.dat")
+    parser.add_argument("--element", default="Ar")
+    parser.add_argument("--nprocs", type=int, default=None)
+    args = parser.parse_args()
+
+    select_frames(args.filename, args.input_nn, args.weights, args.scaling, args.top, args.mode,
+                  args.energy_scale, args.force_scale, args.output, args.scores, args.element, args.nprocs)
@@ -3,11 +3,19 @@
 Analysis of LAMMPS trajectory for MSD and RDF calculations with zoomed RDF
 """
 
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 
+from compressed_trajectory import is_compressed_trajectory, load_frames
+
 def read_lammpstrj(filename):
-    """Read LAMMPS trajectory file"""
+    """Read LAMMPS trajectory file (text dump or compressed .ctrj)"""
+    if is_compressed_trajectory(filename):
+        frames = load_frames(filename)
+        print(f"Read {len(frames)} frames from compressed trajectory")
+        return frames
+
     frames = []
     
     with open(filename, 'r') as f:
@@ -193,7 +201,8 @@ def create_plots(timesteps, msd, r_values, rdf):
 
 def main():
     print("Reading LAMMPS trajectory...")
-    frames = read_lammpstrj('trajectory_fcc.lammpstrj')
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'trajectory_fcc.lammpstrj'
+    frames = read_lammpstrj(filename)
     
     if not frames:
         print("No frames found in trajectory!")
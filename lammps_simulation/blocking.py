@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Online blocking analysis (Flyvbjerg-Petersen) for streamed observables
+
+Each level k holds running sums of averages over 2^k consecutive samples, so
+memory is O(log N) no matter how long the trajectory is. Values can be scalars
+(PE, temperature, MSD slope) or arrays (every g(r) bin at once). The plateau
+level is picked with the automatic criterion of Jonsson, Phys. Rev. E 98,
+043304 (2018), which needs the lag-1 autocovariance of every level as well.
+"""
+
+import argparse
+import numpy as np
+
+def chi2_quantile_99(dof):
+    """99% quantile of the chi-square distribution (Wilson-Hilferty approximation)"""
+    dof = np.asarray(dof, dtype=float)
+    z = 2.326347874
+    return dof * (1.0 - 2.0 / (9.0 * dof) + z * np.sqrt(2.0 / (9.0 * dof)))**3
+
+class OnlineBlocking:
+    """Standard error and correlation time of the mean of a stream of samples"""
+
+    def __init__(self, min_blocks=8):
+        self.min_blocks = min_blocks
+        self.nsamples = 0
+        self.levels = []
+
+    def _new_level(self, value):
+        zero = np.zeros_like(value, dtype=float)
+        return {
+            'n': 0,
+            'sum': zero.copy(),
+            'sumsq': zero.copy(),
+            'sumlag': zero.copy(),   # sum of x_i * x_(i+1)
+            'first': None,
+            'last': None,
+            'pending': None,         # unpaired sample waiting for its partner
+        }
+
+    def add(self, value):
+        """Add one sample (scalar or array of fixed shape)"""
+        value = np.array(value, dtype=float)
+        self.nsamples += 1
+        level = 0
+        while value is not None:
+            if level == len(self.levels):
+                self.levels.append(self._new_level(value))
+            entry = self.levels[level]
+            entry['n'] += 1
+            entry['sum'] += value
+            entry['sumsq'] += value * value
+            if entry['last'] is not None:
+                entry['sumlag'] += entry['last'] * value
+            else:
+                entry['first'] = value.copy()
+            entry['last'] = value.copy()
+
+            if entry['pending'] is None:
+                entry['pending'] = value.copy()
+                value = None
+            else:
+                value = 0.5 * (entry['pending'] + value)
+                entry['pending'] = None
+                level += 1
+
+    def _level_stats(self):
+        """Per-level (n, variance, lag-1 autocovariance), skipping levels with too few blocks"""
+        stats = []
+        for entry in self.levels:
+            n = entry['n']
+            if n < 2:
+                break
+            mean = entry['sum'] / n
+            variance = np.maximum(entry['sumsq'] / n - mean * mean, 0.0)
+            lag = (entry['sumlag'] - mean * (2 * entry['sum'] - entry['first'] - entry['last'])
+                   + (n - 1) * mean * mean) / n
+            stats.append((n, variance, lag))
+        return stats
+
+    def mean(self):
+        return self.levels[0]['sum'] / self.levels[0]['n']
+
+    def level_errors(self):
+        """Standard error estimate at every blocking level, shape (levels, *value shape)"""
+        return np.array([np.sqrt(variance / (n - 1)) for n, variance, _ in self._level_stats()])
+
+    def result(self):
+        """Return dict with mean, standard error, statistical inefficiency and convergence flag"""
+        stats = self._level_stats()
+        if not stats:
+            raise ValueError("Need at least 2 samples for a blocking analysis")
+
+        usable = [s for s in stats if s[0] >= self.min_blocks] or stats[:1]
+        nlevels = len(usable)
+        variance = np.array([s[1] for s in usable])
+        lag = np.array([s[2] for s in usable])
+        n = np.array([s[0] for s in usable], dtype=float).reshape((-1,) + (1,) * (variance.ndim - 1))
+
+        # M_j = sum_{k>=j} n_k ((n_k - 1) var_k / n_k^2 + lag_k)^2 / var_k^2, compared with chi^2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = n * ((n - 1) * variance / n**2 + lag)**2 / variance**2
+        terms = np.nan_to_num(terms, nan=0.0, posinf=0.0)
+        m_stat = np.cumsum(terms[::-1], axis=0)[::-1]
+        dof = np.arange(nlevels, 0, -1).reshape(n.shape)
+        accepted = m_stat < chi2_quantile_99(dof)
+
+        converged = accepted.any(axis=0)
+        level = np.where(converged, np.argmax(accepted, axis=0), nlevels - 1)
+        chosen_var = np.take_along_axis(variance, np.expand_dims(level, 0), axis=0)[0]
+        chosen_n = n.ravel()[level]
+        error = np.sqrt(chosen_var / (chosen_n - 1))
+
+        raw_variance = stats[0][1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inefficiency = np.where(raw_variance > 0, error**2 * self.nsamples / raw_variance, 1.0)
+
+        return {
+            'mean': self.mean(),
+            'error': error,
+            'inefficiency': inefficiency,            # g = 1 + 2 tau_int, in samples
+            'tau': 0.5 * (np.maximum(inefficiency, 1.0) - 1.0),
+            'level': level,
+            'converged': converged,
+            'nsamples': self.nsamples,
+        }
+
+    def samples_needed(self, target_error):
+        """Estimated number of samples to reach a target standard error"""
+        result = self.result()
+        stats = self._level_stats()
+        return np.ceil(result['inefficiency'] * stats[0][1] / target_error**2)
+
+def format_result(name, result, sample_interval=None, unit=''):
+    """One-line summary of a scalar blocking result"""
+    line = f"{name}: {float(result['mean']):.6g} +- {float(result['error']):.2g} {unit}".rstrip()
+    line += f" (g = {float(result['inefficiency']):.1f}"
+    if sample_interval is not None:
+        line += f", tau = {float(result['tau']) * sample_interval:.3g}"
+    line += ")" if result['converged'] else ", NOT converged - run longer)"
+    return line
+
+def analyze_trajectory(filename, dr=0.1, rmax=10.0, dt=0.001, target=None):
+    """Blocking analysis of temperature, MSD slope and every g(r) bin of a dump or .ctrj file"""
+    from compressed_trajectory import iter_frames
+    from follow_trajectory import (RunningRDF, RunningMSD, RunningTemperature, get_positions,
+                                   get_velocities, box_lengths)
+
+    rdf = RunningRDF(dr=dr, rmax=rmax)
+    msd = RunningMSD()
+    temperature = RunningTemperature()
+    temp_blocking = OnlineBlocking()
+    slope_blocking = OnlineBlocking()
+    rdf_blocking = OnlineBlocking()
+    steps = []
+
+    for frame in iter_frames(filename):
+        positions, unwrapped = get_positions(frame)
+        lengths = box_lengths(frame)
+        rdf_blocking.add(rdf.add(positions, lengths))
+        msd.add(frame['timestep'], positions, lengths, unwrapped)
+        if len(msd.msd) > 1:
+            interval = (msd.timesteps[-1] - msd.timesteps[-2]) * dt
+            slope_blocking.add((msd.msd[-1] - msd.msd[-2]) / interval)
+        velocities = get_velocities(frame)
+        if velocities is not None:
+            temperature.add(frame['timestep'], velocities)
+            temp_blocking.add(temperature.temperature[-1])
+        steps.append(frame['timestep'])
+
+    print(f"Read {len(steps)} frames from {filename}")
+    sample_interval = (steps[1] - steps[0]) * dt if len(steps) > 1 else None
+    if temp_blocking.nsamples > 1:
+        print(format_result("Temperature", temp_blocking.result(), sample_interval, "K"))
+        if target is not None:
+            print(f"  frames needed for +-{target} K: {int(temp_blocking.samples_needed(target))}")
+    if slope_blocking.nsamples > 1:
+        print(format_result("MSD slope", slope_blocking.result(), sample_interval, "A^2/ps"))
+    if rdf_blocking.nsamples > 1:
+        result = rdf_blocking.result()
+        peak = int(np.argmax(result['mean']))
+        print(f"g(r) first peak at r = {rdf.r[peak]:.2f} A: {result['mean'][peak]:.4f} +- {result['error'][peak]:.2g}")
+        print(f"g(r) bins converged: {int(np.sum(result['converged']))}/{len(result['converged'])}, "
+              f"max error {np.max(result['error']):.3g}")
+        np.savetxt("rdf_blocking.dat", np.column_stack([rdf.r, result['mean'], result['error'], result['inefficiency']]),
+                   header="r(A) g(r) error statistical_inefficiency")
+        print("Per-bin g(r) with error bars written to rdf_blocking.dat")
+
+def analyze_columns(filename, columns=None, skip=0):
+    """Blocking analysis of columns of a whitespace separated table (e.g. thermo output)"""
+    blockings = None
+    names = None
+    requested = skip
+    with open(filename, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if line.startswith('#'):
+                names = line.lstrip('#').split() or names   # e.g. "# TimeStep c_pe_all c_ke_all"
+                continue
+            if not parts:
+                continue
+            try:
+                values = np.array(parts, dtype=float)
+            except ValueError:
+                names = parts   # header line with column names
+                continue
+            if skip > 0:
+                skip -= 1
+                continue
+            if blockings is None:
+                selected = columns if columns is not None else list(range(len(values)))
+                blockings = {c: OnlineBlocking() for c in selected}
+            for c, blocking in blockings.items():
+                blocking.add(values[c])
+
+    if blockings is None:
+        print(f"No data rows in {filename}" + (f" after skipping {requested}" if requested else ""))
+        return
+    for c, blocking in blockings.items():
+        name = names[c] if names is not None and c < len(names) else f"column {c + 1}"
+        print(format_result(name, blocking.result()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online blocking analysis (standard error and correlation time)")
+    parser.add_argument("filename", help="LAMMPS dump, .ctrj file or a whitespace separated table")
+    parser.add_argument("--table", action="store_true", help="Treat the input as a table of columns")
+    parser.add_argument("--columns", type=int, nargs="*", default=None, help="Table columns (0-based)")
+    parser.add_argument("--skip", type=int, default=0, help="Table rows to discard as equilibration")
+    parser.add_argument("--dt", type=float, default=0.001, help="Timestep in ps")
+    parser.add_argument("--target", type=float, default=None, help="Target temperature error (K) for run sizing")
+    args = parser.parse_args()
+
+    if args.table:
+        analyze_columns(args.filename, args.columns, args.skip)
+    else:
+        analyze_trajectory(args.filename, dt=args.dt, target=args.target)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Offline extrapolation check of MD trajectories against scaling.data ranges
+
+Symmetry functions of every atom and frame are evaluated with the vectorized
+code in symmetry_functions.py and compared with sf_min/sf_max of scaling.data,
+the same test pair_style hdnnp does with showew. Frames are processed in a
+process pool, so candidate trajectories can be screened without LAMMPS.
+Excess is reported relative to the range, (G - sf_max) / (sf_max - sf_min).
+"""
+
+import argparse
+import multiprocessing
+import numpy as np
+from neighbor_list import orthogonal_cell
+from symmetry_functions import SymmetryFunctions, read_scaling, describe
+
+_worker = {}
+
+def _init_worker(input_nn, scaling_file):
+    _worker['sf'] = SymmetryFunctions.from_input_nn(input_nn)
+    _worker['min'], _worker['max'], _, _ = read_scaling(scaling_file)
+    if len(_worker['min']) != len(_worker['sf']):
+        raise ValueError(f"{scaling_file} has {len(_worker['min'])} functions, {input_nn} has {len(_worker['sf'])}")
+
+def check_frame(frame):
+    """Extrapolation statistics of one frame (runs in a worker process)"""
+    from follow_trajectory import get_positions
+    sf, lo, hi = _worker['sf'], _worker['min'], _worker['max']
+    positions, _ = get_positions(frame)
+    cell, origin = orthogonal_cell(frame['box'])
+    values = sf.compute(positions, cell, origin)
+
+    span = np.where(hi > lo, hi - lo, 1.0)
+    below = np.maximum(lo - values, 0.0) / span
+    above = np.maximum(values - hi, 0.0) / span
+    outside = (below > 0) | (above > 0)
+    atom, function = np.nonzero(outside)
+    ids = frame['atoms'][:, frame['columns'].index('id')].astype(np.int64) if 'id' in frame['columns'] \
+        else np.arange(1, len(positions) + 1)
+    return {
+        'timestep': frame['timestep'],
+        'natoms': len(positions),
+        'atoms_outside': int(outside.any(axis=1).sum()),
+        'count_below': (below > 0).sum(axis=0),
+        'count_above': (above > 0).sum(axis=0),
+        'max_below': below.max(axis=0),
+        'max_above': above.max(axis=0),
+        'records': np.column_stack([ids[atom], function + 1, values[atom, function]]),
+    }
+
+def check_trajectory(filename, input_nn="input.nn", scaling_file="scaling.data", prefix="extrapolation",
+                     nprocs=None, max_records=100000, top=10):
+    """Screen a dump or .ctrj trajectory, write per-frame, per-function and per-atom tables"""
+    from compressed_trajectory import iter_frames
+
+    functions = SymmetryFunctions.from_input_nn(input_nn).functions
+    lo, hi, _, _ = read_scaling(scaling_file)
+    nsf = len(functions)
+    count_below, count_above = np.zeros(nsf, np.int64), np.zeros(nsf, np.int64)
+    max_below, max_above = np.zeros(nsf), np.zeros(nsf)
+    frames_affected = np.zeros(nsf, np.int64)
+    frame_rows = []
+    natoms_total = 0
+    nrecords = 0
+
+    with open(f"{prefix}_atoms.dat", 'w') as records, \
+            multiprocessing.Pool(nprocs, initializer=_init_worker, initargs=(input_nn, scaling_file)) as pool:
+        records.write("# TimeStep atom_id sf_index value sf_min sf_max\n")
+        for result in pool.imap(check_frame, iter_frames(filename), chunksize=2):
+            count_below += result['count_below']
+            count_above += result['count_above']
+            max_below = np.maximum(max_below, result['max_below'])
+            max_above = np.maximum(max_above, result['max_above'])
+            frames_affected += (result['count_below'] + result['count_above']) > 0
+            natoms_total += result['natoms']
+            excess = max(result['max_below'].max(), result['max_above'].max())
+            frame_rows.append([result['timestep'], result['atoms_outside'], len(result['records']), excess])
+
+            for atom_id, index, value in result['records'][:max(0, max_records - nrecords)]:
+                k = int(index) - 1
+                records.write(f"{result['timestep']} {int(atom_id)} {int(index)} {value:.8e} {lo[k]:.8e} {hi[k]:.8e}\n")
+            nrecords += len(result['records'])
+
+    frame_rows = np.array(frame_rows)
+    np.savetxt(f"{prefix}_frames.dat", frame_rows, fmt=['%d', '%d', '%d', '%.6g'],
+               header="TimeStep atoms_extrapolating violations max_relative_excess")
+    with open(f"{prefix}_functions.dat", 'w') as f:
+        f.write("# sf_index count_below count_above frames_affected max_excess_below max_excess_above description\n")
+        for k in range(nsf):
+            f.write(f"{k + 1} {count_below[k]} {count_above[k]} {frames_affected[k]} "
+                    f"{max_below[k]:.6g} {max_above[k]:.6g} {describe(functions[k])}\n")
+
+    nframes = len(frame_rows)
+    bad_frames = int(np.sum(frame_rows[:, 1] > 0)) if nframes else 0
+    print(f"Checked {nframes} frames ({natoms_total} atom environments) of {filename}")
+    print(f"Frames with extrapolation: {bad_frames}/{nframes}, "
+          f"extrapolating atom environments: {int(frame_rows[:, 1].sum()) if nframes else 0}, "
+          f"function violations: {nrecords}")
+    if bad_frames:
+        first = int(frame_rows[np.argmax(frame_rows[:, 1] > 0), 0])
+        print(f"First extrapolating frame: timestep {first}")
+        print(f"Functions most often outside their range (top {top}):")
+        total = count_below + count_above
+        for k in np.argsort(-total)[:top]:
+            if total[k] == 0:
+                break
+            print(f"  sf {k + 1:3d} {describe(functions[k]):45s} below {count_below[k]:7d} above {count_above[k]:7d} "
+                  f"max excess {max(max_below[k], max_above[k]):.3g}")
+    if nrecords > max_records:
+        print(f"Only the first {max_records} of {nrecords} violations were written to {prefix}_atoms.dat")
+    print(f"Tables written to {prefix}_frames.dat, {prefix}_functions.dat, {prefix}_atoms.dat")
+    return frame_rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a trajectory for symmetry function extrapolation")
+    parser.add_argument("filename", help="LAMMPS dump or .ctrj file")
+    parser.add_argument("--input-nn", default="input.nn")
+    parser.add_argument("--scaling", default="scaling.data")
+    parser.add_argument("--prefix", default="extrapolation", help="Prefix of the output tables")
+    parser.add_argument("--nprocs", type=int, default=None)
+    parser.add_argument("--max-records", type=int, default=100000, help="Maximum per-atom violation records")
+    args = parser.parse_args()
+
+    check_trajectory(args.filename, args.input_nn, args.scaling, args.prefix, args.nprocs, args.max_records)
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Compact binary trajectory format (.ctrj) for LAMMPS dumps
+
+Positions are quantized to a fixed precision and delta encoded between frames,
+velocities and forces are optional and stored at their own (lower) precision.
+Frames are grouped into independently compressed chunks and a frame index at
+the end of the file gives random access to any frame.
+
+Layout:
+    magic | header length | JSON header | compressed ids | compressed types
+    chunk 0 | chunk 1 | ... | frame index | chunk index | footer
+"""
+
+import io
+import os
+import sys
+import json
+import lzma
+import time
+import zlib
+import struct
+import argparse
+import numpy as np
+
+from follow_trajectory import iter_dump_frames, get_positions
+
+MAGIC = b'ARTRJ01\n'
+END_MAGIC = b'ARTRJEND'
+FOOTER = struct.Struct('<QQQ8s')   # index offset, number of frames, number of chunks, end magic
+
+FRAME_INDEX_DTYPE = np.dtype([('timestep', '<i8'), ('chunk', '<i4'), ('box', '<f8', (3, 2))])
+CHUNK_INDEX_DTYPE = np.dtype([('offset', '<u8'), ('nbytes', '<u8'), ('first_frame', '<i8'), ('nframes', '<i8')])
+
+INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+def is_compressed_trajectory(filename):
+    """True if filename is a .ctrj file (checked by magic bytes, not by extension)"""
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def _compress(data, method, level):
+    if method == 'lzma':
+        return lzma.compress(data, preset=level)
+    return zlib.compress(data, level)
+
+def _decompress(data, method):
+    if method == 'lzma':
+        return lzma.decompress(data)
+    return zlib.decompress(data)
+
+def _pack_ints(values):
+    """Store an integer array with the smallest dtype that fits, byte-shuffled for compression"""
+    values = np.ascontiguousarray(values.T)   # column major: all x, then all y, then all z
+    extreme = max(abs(int(values.min())), abs(int(values.max()))) if values.size else 0
+    for code, dtype in enumerate(INT_TYPES):
+        if extreme <= np.iinfo(dtype).max:
+            break
+    packed = values.astype(dtype)
+    itemsize = packed.dtype.itemsize
+    shuffled = packed.view(np.uint8).reshape(-1, itemsize).T.tobytes()
+    return bytes([code]) + shuffled
+
+def _unpack_ints(buffer, offset, count):
+    """Inverse of _pack_ints, returns (int64 array of shape (count//3, 3), new offset)"""
+    dtype = np.dtype(INT_TYPES[buffer[offset]]).newbyteorder('<')
+    offset += 1
+    nbytes = count * dtype.itemsize
+    raw = np.frombuffer(buffer, dtype=np.uint8, count=nbytes, offset=offset)
+    values = raw.reshape(dtype.itemsize, count).T.copy().view(dtype).ravel()
+    return values.astype(np.int64).reshape(3, -1).T, offset + nbytes
+
+class CompressedTrajectoryWriter:
+    """Streaming writer, frames are buffered only until a chunk is full"""
+
+    def __init__(self, filename, pos_precision=1e-3, vel_precision=None, force_precision=None,
+                 chunk_frames=50, compression='zlib', level=6):
+        self.filename = filename
+        self.pos_precision = pos_precision
+        self.vel_precision = vel_precision
+        self.force_precision = force_precision
+        self.chunk_frames = chunk_frames
+        self.compression = compression
+        self.level = level
+        self.file = None
+        self.frame_index = []
+        self.chunk_index = []
+        self.chunk = []
+        self.previous = None
+        self.natoms = None
+
+    def _start(self, frame, coord_names):
+        columns = frame['columns']
+        atoms = frame['atoms']
+        self.natoms = frame['natoms']
+        ids = atoms[:, columns.index('id')].astype(np.int64) if 'id' in columns else np.arange(1, self.natoms + 1)
+        types = atoms[:, columns.index('type')].astype(np.int32) if 'type' in columns else np.ones(self.natoms, np.int32)
+        self.ids = ids
+
+        ids_bytes = zlib.compress(ids.astype('<i8').tobytes())
+        types_bytes = zlib.compress(types.astype('<i4').tobytes())
+        header = {
+            'natoms': int(self.natoms),
+            'coord_names': coord_names,
+            'pos_precision': self.pos_precision,
+            'vel_precision': self.vel_precision,
+            'force_precision': self.force_precision,
+            'chunk_frames': self.chunk_frames,
+            'compression': self.compression,
+            'ids_nbytes': len(ids_bytes),
+            'types_nbytes': len(types_bytes),
+        }
+        header_bytes = json.dumps(header).encode()
+
+        self.file = open(self.filename, 'wb')
+        self.file.write(MAGIC)
+        self.file.write(struct.pack('<I', len(header_bytes)))
+        self.file.write(header_bytes)
+        self.file.write(ids_bytes)
+        self.file.write(types_bytes)
+
+    def add(self, frame):
+        """Append one frame (dict as returned by the dump readers)"""
+        positions, unwrapped = get_positions(frame)
+        if self.file is None:
+            self._start(frame, ['xu', 'yu', 'zu'] if unwrapped else ['x', 'y', 'z'])
+        if frame['natoms'] != self.natoms:
+            raise ValueError(f"Frame at step {frame['timestep']} has {frame['natoms']} atoms, "
+                             f"expected {self.natoms} (variable atom counts are not supported)")
+
+        columns = frame['columns']
+        if 'id' in columns and not np.array_equal(frame['atoms'][:, columns.index('id')], self.ids):
+            raise ValueError(f"Atom ids changed at step {frame['timestep']}")
+
+        record = bytearray()
+        quantized = np.round(positions / self.pos_precision).astype(np.int64)
+        if not self.chunk:
+            record += _pack_ints(quantized)                   # key frame
+        else:
+            record += _pack_ints(quantized - self.previous)   # delta to previous frame
+        self.previous = quantized
+
+        for precision, names in ((self.vel_precision, ('vx', 'vy', 'vz')),
+                                 (self.force_precision, ('fx', 'fy', 'fz'))):
+            if precision is None:
+                continue
+            if not all(name in columns for name in names):
+                raise ValueError(f"Dump has no {' '.join(names)} columns, disable them for conversion")
+            values = frame['atoms'][:, [columns.index(name) for name in names]]
+            record += _pack_ints(np.round(values / precision).astype(np.int64))
+
+        self.chunk.append(bytes(record))
+        self.frame_index.append((frame['timestep'], len(self.chunk_index), frame['box']))
+        if len(self.chunk) >= self.chunk_frames:
+            self._flush()
+
+    def _flush(self):
+        if not self.chunk:
+            return
+        data = _compress(b''.join(self.chunk), self.compression, self.level)
+        offset = self.file.tell()
+        self.file.write(data)
+        first = len(self.frame_index) - len(self.chunk)
+        self.chunk_index.append((offset, len(data), first, len(self.chunk)))
+        self.chunk = []
+
+    def close(self):
+        if self.file is None:
+            raise ValueError("No frames were written")
+        self._flush()
+        frames = np.array(self.frame_index, dtype=FRAME_INDEX_DTYPE)
+        chunks = np.array(self.chunk_index, dtype=CHUNK_INDEX_DTYPE)
+        index_offset = self.file.tell()
+        self.file.write(frames.tobytes())
+        self.file.write(chunks.tobytes())
+        self.file.write(FOOTER.pack(index_offset, len(frames), len(chunks), END_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.file is not None:
+            self.file.close()
+
+class CompressedTrajectory:
+    """Random-access reader for .ctrj files, frames come back in the dump-reader dict format"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not a compressed trajectory")
+        (header_len,) = struct.unpack('<I', self.file.read(4))
+        self.header = json.loads(self.file.read(header_len))
+        self.ids = np.frombuffer(zlib.decompress(self.file.read(self.header['ids_nbytes'])), dtype='<i8')
+        self.types = np.frombuffer(zlib.decompress(self.file.read(self.header['types_nbytes'])), dtype='<i4')
+
+        self.file.seek(-FOOTER.size, os.SEEK_END)
+        index_offset, nframes, nchunks, end = FOOTER.unpack(self.file.read(FOOTER.size))
+        if end != END_MAGIC:
+            raise ValueError(f"{filename} is truncated (missing frame index)")
+        self.file.seek(index_offset)
+        self.frames = np.frombuffer(self.file.read(nframes * FRAME_INDEX_DTYPE.itemsize), dtype=FRAME_INDEX_DTYPE)
+        self.chunks = np.frombuffer(self.file.read(nchunks * CHUNK_INDEX_DTYPE.itemsize), dtype=CHUNK_INDEX_DTYPE)
+
+        self.natoms = self.header['natoms']
+        self.columns = ['id', 'type'] + self.header['coord_names']
+        if self.header['vel_precision'] is not None:
+            self.columns += ['vx', 'vy', 'vz']
+        if self.header['force_precision'] is not None:
+            self.columns += ['fx', 'fy', 'fz']
+        self._cache = (None, None)
+
+    @property
+    def timesteps(self):
+        return self.frames['timestep']
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _decode_chunk(self, chunk_id):
+        """Decode all frames of one chunk into an array (nframes, natoms, ncolumns)"""
+        if self._cache[0] == chunk_id:
+            return self._cache[1]
+
+        entry = self.chunks[chunk_id]
+        self.file.seek(int(entry['offset']))
+        buffer = _decompress(self.file.read(int(entry['nbytes'])), self.header['compression'])
+
+        natoms = self.natoms
+        decoded = np.empty((int(entry['nframes']), natoms, len(self.columns)))
+        decoded[:, :, 0] = self.ids
+        decoded[:, :, 1] = self.types
+        offset = 0
+        quantized = None
+        for k in range(int(entry['nframes'])):
+            values, offset = _unpack_ints(buffer, offset, 3 * natoms)
+            quantized = values if quantized is None else quantized + values
+            decoded[k, :, 2:5] = quantized * self.header['pos_precision']
+            col = 5
+            for key in ('vel_precision', 'force_precision'):
+                if self.header[key] is not None:
+                    values, offset = _unpack_ints(buffer, offset, 3 * natoms)
+                    decoded[k, :, col:col + 3] = values * self.header[key]
+                    col += 3
+
+        self._cache = (chunk_id, decoded)
+        return decoded
+
+    def _frame(self, index, atoms):
+        return {
+            'timestep': int(self.frames['timestep'][index]),
+            'natoms': self.natoms,
+            'box': self.frames['box'][index].tolist(),
+            'columns': list(self.columns),
+            'atoms': atoms
+        }
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        chunk_id = int(self.frames['chunk'][index])
+        decoded = self._decode_chunk(chunk_id)
+        return self._frame(index, decoded[index - int(self.chunks['first_frame'][chunk_id])].copy())
+
+    def __iter__(self):
+        for chunk_id in range(len(self.chunks)):
+            decoded = self._decode_chunk(chunk_id)
+            first = int(self.chunks['first_frame'][chunk_id])
+            for k in range(len(decoded)):
+                yield self._frame(first + k, decoded[k])
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def iter_frames(filename):
+    """Stream frames from either a text dump or a .ctrj file"""
+    if is_compressed_trajectory(filename):
+        with CompressedTrajectory(filename) as trajectory:
+            yield from trajectory
+    else:
+        yield from iter_dump_frames(filename)
+
+def load_frames(filename):
+    """Read all frames of a text dump or .ctrj file into a list"""
+    return list(iter_frames(filename))
+
+def convert(dump_file, output_file, pos_precision=1e-3, vel_precision=None, force_precision=None,
+            chunk_frames=50, compression='zlib', level=6):
+    """Convert a LAMMPS text dump into the compressed format"""
+    start = time.time()
+    nframes = 0
+    with CompressedTrajectoryWriter(output_file, pos_precision, vel_precision, force_precision,
+                                    chunk_frames, compression, level) as writer:
+        for frame in iter_dump_frames(dump_file):
+            writer.add(frame)
+            nframes += 1
+
+    in_size = os.path.getsize(dump_file)
+    out_size = os.path.getsize(output_file)
+    print(f"Converted {nframes} frames in {time.time() - start:.2f} s")
+    print(f"Size: {in_size / 1e6:.2f} MB -> {out_size / 1e6:.2f} MB ({in_size / max(out_size, 1):.1f}x smaller)")
+
+def write_dump(trajectory_file, output_file, frames=None):
+    """Write frames of a .ctrj file back out as a LAMMPS text dump"""
+    with CompressedTrajectory(trajectory_file) as trajectory, open(output_file, 'w') as f:
+        indices = range(len(trajectory)) if frames is None else frames
+        for index in indices:
+            frame = trajectory[index]
+            f.write(f"ITEM: TIMESTEP\n{frame['timestep']}\n")
+            f.write(f"ITEM: NUMBER OF ATOMS\n{frame['natoms']}\n")
+            f.write("ITEM: BOX BOUNDS pp pp pp\n")
+            for lo, hi in frame['box']:
+                f.write(f"{lo:.16e} {hi:.16e}\n")
+            f.write("ITEM: ATOMS " + " ".join(frame['columns']) + "\n")
+            ncols = len(frame['columns'])
+            buffer = io.StringIO()
+            np.savetxt(buffer, frame['atoms'], fmt=['%d', '%d'] + ['%.6g'] * (ncols - 2))
+            f.write(buffer.getvalue())
+    print(f"Wrote {len(indices)} frames to {output_file}")
+
+def info(trajectory_file, compare_with=None):
+    """Print size, precision and read speed of a .ctrj file"""
+    with CompressedTrajectory(trajectory_file) as trajectory:
+        header = trajectory.header
+        print(f"File: {trajectory_file}")
+        print(f"Frames: {len(trajectory)}, atoms: {trajectory.natoms}, chunks: {len(trajectory.chunks)}")
+        print(f"Timesteps: {trajectory.timesteps[0]} ... {trajectory.timesteps[-1]}")
+        print(f"Columns: {' '.join(trajectory.columns)}")
+        print(f"Precision: positions {header['pos_precision']}, velocities {header['vel_precision']}, "
+              f"forces {header['force_precision']} ({header['compression']})")
+
+        start = time.time()
+        for _ in trajectory:
+            pass
+        elapsed = time.time() - start
+        print(f"Sequential read: {elapsed:.3f} s ({len(trajectory) / max(elapsed, 1e-9):.1f} frames/s)")
+
+    if compare_with is not None:
+        start = time.time()
+        nframes = sum(1 for _ in iter_dump_frames(compare_with))
+        elapsed = time.time() - start
+        ratio = os.path.getsize(compare_with) / os.path.getsize(trajectory_file)
+        print(f"Text dump read: {elapsed:.3f} s ({nframes / max(elapsed, 1e-9):.1f} frames/s)")
+        print(f"Size reduction vs text dump: {ratio:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert and inspect compressed LAMMPS trajectories (.ctrj)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = subparsers.add_parser("convert", help="Convert a text dump to .ctrj")
+    p_convert.add_argument("dump_file")
+    p_convert.add_argument("output_file")
+    p_convert.add_argument("--pos-precision", type=float, default=1e-3, help="Position precision (A)")
+    p_convert.add_argument("--vel-precision", type=float, default=None,
+                           help="Store velocities with this precision (A/ps), omitted by default")
+    p_convert.add_argument("--force-precision", type=float, default=None,
+                           help="Store forces with this precision (eV/A), omitted by default")
+    p_convert.add_argument("--chunk-frames", type=int, default=50, help="Frames per compressed chunk")
+    p_convert.add_argument("--compression", choices=["zlib", "lzma"], default="zlib")
+    p_convert.add_argument("--level", type=int, default=6, help="Compression level")
+
+    p_info = subparsers.add_parser("info", help="Show contents and read speed of a .ctrj file")
+    p_info.add_argument("trajectory_file")
+    p_info.add_argument("--compare", default=None, help="Original text dump to compare size and read speed")
+
+    p_extract = subparsers.add_parser("extract", help="Write (selected) frames back to a text dump")
+    p_extract.add_argument("trajectory_file")
+    p_extract.add_argument("output_file")
+    p_extract.add_argument("--frames", type=int, nargs="*", default=None, help="Frame indices (default: all)")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        convert(args.dump_file, args.output_file, args.pos_precision, args.vel_precision,
+                args.force_precision, args.chunk_frames, args.compression, args.level)
+    elif args.command == "info":
+        info(args.trajectory_file, args.compare)
+    elif args.command == "extract":
+        write_dump(args.trajectory_file, args.output_file, args.frames)
+    else:
+        sys.exit(1)
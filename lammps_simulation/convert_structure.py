@@ -1,85 +1,255 @@
 #!/usr/bin/env python3
 """
-Convert n2p2 output.data format to LAMMPS structure.data format
+Convert n2p2 output.data format to LAMMPS structure.data format (and back)
+
+Datasets are streamed one begin ... end block at a time, so memory does not
+depend on the number of structures. General triclinic cells are rotated into
+the restricted LAMMPS form (a along x, b in the xy plane) with xy xz yz tilt
+factors, and whole datasets are converted in batches with a process pool.
 """
 
-def convert_n2p2_to_lammps(input_file, output_file):
+import argparse
+import itertools
+import multiprocessing
+import os
+import numpy as np
+
+MASSES = {'Ar': 39.948}
+
+def parse_structure(lines):
+    """Structure dict from the lines between begin and end"""
+    structure = {'comment': '', 'lattice': None, 'energy': None, 'charge': None}
+    lattice, atom_lines = [], []
+    for line in lines:
+        keyword = line[:line.find(' ')] if ' ' in line else line.strip()
+        if keyword == 'atom':
+            atom_lines.append(line)
+        elif keyword == 'lattice':
+            lattice.append([float(x) for x in line.split()[1:4]])
+        elif keyword == 'comment':
+            structure['comment'] = line[len('comment'):].strip()
+        elif keyword == 'energy':
+            structure['energy'] = float(line.split()[1])
+        elif keyword == 'charge':
+            structure['charge'] = float(line.split()[1])
+
+    if len(lattice) == 3:
+        structure['lattice'] = np.array(lattice)
+    # atom x y z element charge n fx fy fz: drop the keyword and element columns, convert the rest at once
+    tokens = ' '.join(atom_lines).split()
+    ncols = len(tokens) // max(len(atom_lines), 1)
+    structure['elements'] = tokens[4::ncols]
+    del tokens[4::ncols]
+    del tokens[0::ncols - 1]
+    values = np.array(tokens, dtype=float).reshape(len(atom_lines), ncols - 2)
+    structure['positions'] = values[:, 0:3]
+    if ncols >= 10:
+        structure['charges'] = values[:, 3]
+        structure['forces'] = values[:, 5:8]
+    return structure
+
+def iter_structures(filename, select=None):
+    """Yield (index, structure dict) for every begin ... end block, optionally only indices in select"""
+    select = None if select is None else set(select)
+    last = None if select is None else max(select)
+    index = 0
+    block = None
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.startswith('begin'):
+                block = []
+            elif line.startswith('end'):
+                if select is None or index in select:
+                    yield index, parse_structure(block)
+                index += 1
+                block = None
+                if last is not None and index > last:
+                    return
+            elif block is not None and (select is None or index in select):
+                block.append(line)
+
+def _cross(u, v):
+    # np.cross has a large per-call overhead for single 3-vectors
+    return np.array([u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0]])
+
+def lammps_rotation(lattice):
+    """Rotation matrix (apply as positions @ R) taking a to +x and b into the xy plane"""
+    a, b, c = np.asarray(lattice, dtype=float)
+    z = _cross(a, b)
+    if np.dot(z, c) <= 0.0:
+        raise ValueError("Lattice vectors must form a right-handed set for LAMMPS")
+    x = a / np.linalg.norm(a)
+    z /= np.linalg.norm(z)
+    return np.column_stack([x, _cross(z, x), z])
+
+def lammps_cell(lattice, rotation=None):
+    """Restricted LAMMPS cell (rows a, b, c) spanning the same lattice, with the smallest tilts
+
+    Returns (cell, (xhi, yhi, zhi, xy, xz, yz)).
+    """
+    if rotation is None:
+        rotation = lammps_rotation(lattice)
+    cell = np.asarray(lattice, dtype=float) @ rotation
+    cell[np.abs(cell) < 1e-12] = 0.0
+    # equivalent lattice with reduced tilts (LAMMPS rejects |tilt| > half the box length)
+    cell[2] -= np.round(cell[2, 1] / cell[1, 1]) * cell[1]
+    cell[2] -= np.round(cell[2, 0] / cell[0, 0]) * cell[0]
+    cell[1] -= np.round(cell[1, 0] / cell[0, 0]) * cell[0]
+    return cell, (cell[0, 0], cell[1, 1], cell[2, 2], cell[1, 0], cell[2, 0], cell[2, 1])
+
+def to_lammps_frame(structure, padding=2.0):
+    """Positions and box of a structure in the LAMMPS frame
+
+    Returns (positions, bounds, tilt or None). Structures without a lattice (clusters)
+    get an orthogonal box around the atoms with the given padding.
+    """
+    positions = structure['positions']
+    if structure['lattice'] is None:
+        lo = positions.min(axis=0) - padding
+        hi = positions.max(axis=0) + padding
+        return positions, np.column_stack([lo, hi]), None
+
+    rotation = lammps_rotation(structure['lattice'])
+    cell, (xhi, yhi, zhi, xy, xz, yz) = lammps_cell(structure['lattice'], rotation)
+    # the reduced cell spans the same lattice, so wrapping in its fractional coordinates is exact
+    frac = np.mod((positions @ rotation) @ np.linalg.inv(cell), 1.0)
+    frac[frac >= 1.0] = 0.0
+    bounds = np.array([[0.0, xhi], [0.0, yhi], [0.0, zhi]])
+    tilt = None if max(abs(xy), abs(xz), abs(yz)) < 1e-10 else (xy, xz, yz)
+    return frac @ cell, bounds, tilt
+
+def format_lammps_data(structure, element_types=None, title="LAMMPS data file for Argon system from n2p2"):
+    """Text of a LAMMPS data file (atom_style atomic) for one structure"""
+    if element_types is None:
+        element_types = {e: k + 1 for k, e in enumerate(sorted(set(structure['elements'])))}
+    positions, bounds, tilt = to_lammps_frame(structure)
+    types = [element_types[e] for e in structure['elements']]
+
+    lines = [f"{title}\n\n", f"{len(positions)} atoms\n", f"{len(element_types)} atom types\n\n"]
+    for (lo, hi), name in zip(bounds, ('x', 'y', 'z')):
+        lines.append(f"{lo:.6f} {hi:.6f} {name}lo {name}hi\n")
+    if tilt is not None:
+        lines.append("{:.6f} {:.6f} {:.6f} xy xz yz\n".format(*tilt))
+    lines.append("\nMasses\n\n")
+    for element, t in sorted(element_types.items(), key=lambda item: item[1]):
+        lines.append(f"{t} {MASSES.get(element, 1.0)}  # {element}\n")
+    lines.append("\nAtoms\n\n")
+
+    table = np.column_stack([np.arange(1, len(positions) + 1), types, positions])
+    lines.append(("%d %d %.6f %.6f %.6f\n" * len(positions)) % tuple(table.ravel().tolist()))
+    return ''.join(lines)
+
+def _convert_one(args):
+    index, structure, pattern, element_types = args
+    output = pattern.format(index=index)
+    with open(output, 'w') as f:
+        f.write(format_lammps_data(structure, element_types))
+    return output, len(structure['positions'])
+
+def convert_dataset(input_file, pattern="structure_{index:05d}.data", select=None, element_types=None,
+                    nprocs=None, batch_size=512):
+    """Write one LAMMPS data file per structure of an n2p2 dataset
+
+    Structures are read lazily and handed to the pool in batches, so at most
+    batch_size structures are held in memory.
+    """
+    element_types = element_types or {'Ar': 1}
+    structures = iter_structures(input_file, select)
+    count = natoms = 0
+    with multiprocessing.Pool(nprocs) as pool:
+        while True:
+            batch = [(index, s, pattern, element_types)
+                     for index, s in itertools.islice(structures, batch_size)]
+            if not batch:
+                break
+            for _, n in pool.imap(_convert_one, batch, chunksize=16):
+                count += 1
+                natoms += n
+    print(f"Converted {count} structures ({natoms} atoms) from {input_file}")
+    print(f"Output written to files named {pattern}")
+    return count
+
+def convert_n2p2_to_lammps(input_file, output_file, index=0):
     """Convert n2p2 structure to LAMMPS data file"""
-    
-    atoms = []
-    box_info = None
-    
-    with open(input_file, 'r') as f:
-        lines = f.readlines()
-    
-    # Parse the structure
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if line.startswith('begin'):
-            i += 1
-            continue
-        elif line.startswith('comment'):
-            i += 1
-            continue
-        elif line.startswith('lattice'):
-            # Read lattice vectors
-            lattice = []
-            for j in range(3):
-                i += 1
-                vec = [float(x) for x in lines[i].strip().split()]
-                lattice.append(vec)
-            
-            # Calculate box bounds (assuming orthogonal for simplicity)
-            box_info = {
-                'xlo': 0.0, 'xhi': lattice[0][0],
-                'ylo': 0.0, 'yhi': lattice[1][1], 
-                'zlo': 0.0, 'zhi': lattice[2][2]
-            }
-            i += 1
-            continue
-        elif line.startswith('atom'):
-            parts = line.split()
-            x, y, z = float(parts[1]), float(parts[2]), float(parts[3])
-            element = parts[4]  # Should be 'Ar'
-            
-            atoms.append({
-                'id': len(atoms) + 1,
-                'type': 1,  # Argon type
-                'x': x, 'y': y, 'z': z
-            })
-        i += 1
-        
-        # Only process first structure
-        if line.startswith('end'):
-            break
-    
-    # Write LAMMPS data file
-    with open(output_file, 'w') as f:
-        f.write("LAMMPS data file for Argon system from n2p2\n\n")
-        f.write(f"{len(atoms)} atoms\n")
-        f.write("1 atom types\n\n")
-        
-        if box_info:
-            f.write(f"{box_info['xlo']:.6f} {box_info['xhi']:.6f} xlo xhi\n")
-            f.write(f"{box_info['ylo']:.6f} {box_info['yhi']:.6f} ylo yhi\n") 
-            f.write(f"{box_info['zlo']:.6f} {box_info['zhi']:.6f} zlo zhi\n\n")
-        else:
-            # Default box if lattice not found
-            f.write("0.0 13.0 xlo xhi\n")
-            f.write("0.0 13.0 ylo yhi\n")
-            f.write("0.0 13.0 zlo zhi\n\n")
-        
-        f.write("Masses\n\n")
-        f.write("1 39.948  # Ar\n\n")
-        
-        f.write("Atoms\n\n")
-        for atom in atoms:
-            f.write(f"{atom['id']} {atom['type']} {atom['x']:.6f} {atom['y']:.6f} {atom['z']:.6f}\n")
-    
-    print(f"Converted {len(atoms)} atoms to LAMMPS format")
-    print(f"Output written to {output_file}")
+    for _, structure in iter_structures(input_file, [index]):
+        with open(output_file, 'w') as f:
+            f.write(format_lammps_data(structure, {'Ar': 1}))
+        print(f"Converted {len(structure['positions'])} atoms to LAMMPS format")
+        print(f"Output written to {output_file}")
+        return
+    raise ValueError(f"Structure {index} not found in {input_file}")
+
+def read_lammps_data(filename, type_elements=None):
+    """Structure dict (n2p2 layout, lattice rows a b c) from a LAMMPS atom_style atomic data file"""
+    type_elements = type_elements or {1: 'Ar'}
+    bounds = {}
+    tilt = (0.0, 0.0, 0.0)
+    with open(filename, 'r') as f:
+        f.readline()
+        natoms = None
+        for line in f:
+            parts = line.split('#')[0].split()
+            if not parts:
+                continue
+            if parts[-1] == 'atoms':
+                natoms = int(parts[0])
+            elif parts[-1] in ('xhi', 'yhi', 'zhi'):
+                bounds[parts[-1][0]] = (float(parts[0]), float(parts[1]))
+            elif parts[-1] == 'yz':
+                tilt = tuple(float(x) for x in parts[:3])
+            elif parts[0] == 'Atoms':
+                break
+        data = np.loadtxt(itertools.islice((l for l in f if l.strip()), natoms), ndmin=2)
+
+    data = data[np.argsort(data[:, 0])]
+    lo = np.array([bounds[k][0] for k in 'xyz'])
+    lengths = np.array([bounds[k][1] for k in 'xyz']) - lo
+    xy, xz, yz = tilt
+    lattice = np.array([[lengths[0], 0.0, 0.0], [xy, lengths[1], 0.0], [xz, yz, lengths[2]]])
+    return {'comment': f'converted from {os.path.basename(filename)}', 'lattice': lattice,
+            'positions': data[:, 2:5] - lo, 'elements': [type_elements[int(t)] for t in data[:, 1]],
+            'energy': None, 'charge': None}
+
+def format_n2p2(structure):
+    """Text of one begin ... end block"""
+    lines = ["begin\n", f"comment {structure.get('comment', '')}\n"]
+    if structure['lattice'] is not None:
+        for vector in structure['lattice']:
+            lines.append("lattice {:.8f} {:.8f} {:.8f}\n".format(*vector))
+    forces = structure.get('forces')
+    for k, (position, element) in enumerate(zip(structure['positions'], structure['elements'])):
+        fx, fy, fz = forces[k] if forces is not None else (0.0, 0.0, 0.0)
+        lines.append("atom {:.8f} {:.8f} {:.8f} {} 0.0 0.0 {:.8f} {:.8f} {:.8f}\n".format(*position, element, fx, fy, fz))
+    lines.append(f"energy {structure['energy'] or 0.0:.8f}\n")
+    lines.append(f"charge {structure['charge'] or 0.0:.8f}\n")
+    lines.append("end\n")
+    return ''.join(lines)
 
 if __name__ == "__main__":
-    convert_n2p2_to_lammps("../validation_500_clean/output.data", "structure.data")
+    parser = argparse.ArgumentParser(description="Convert between n2p2 input.data and LAMMPS data files")
+    subparsers = parser.add_subparsers(dest="command")
+
+    p = subparsers.add_parser("to-lammps", help="n2p2 dataset -> one LAMMPS data file per structure")
+    p.add_argument("input", help="n2p2 input.data / output.data")
+    p.add_argument("-o", "--output", default="structure_{index:05d}.data",
+                   help="Output file, '{index}' is replaced by the structure index")
+    p.add_argument("--select", type=int, nargs="*", default=None, help="Structure indices (0-based)")
+    p.add_argument("--nprocs", type=int, default=None)
+
+    p = subparsers.add_parser("to-n2p2", help="LAMMPS data files -> n2p2 dataset")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-o", "--output", default="input.data")
+
+    args = parser.parse_args()
+    if args.command == "to-lammps":
+        if args.select is not None and len(args.select) == 1 and '{' not in args.output:
+            convert_n2p2_to_lammps(args.input, args.output, args.select[0])
+        else:
+            convert_dataset(args.input, args.output, args.select, nprocs=args.nprocs)
+    elif args.command == "to-n2p2":
+        with open(args.output, 'w') as f:
+            for filename in args.inputs:
+                f.write(format_n2p2(read_lammps_data(filename)))
+        print(f"Wrote {len(args.inputs)} structures to {args.output}")
+    else:
+        convert_n2p2_to_lammps("../validation_500_clean/output.data", "structure.data")
@@ -1,53 +1,126 @@
 #!/usr/bin/env python3
-"""Create a properly spaced Argon system"""
+"""Create a properly spaced Argon system
+
+The supercell is generated with broadcasting from the unit-cell basis and the
+Atoms section is written in chunks of preformatted bytes, so memory stays
+bounded and 10^7-atom data files for weak-scaling runs take seconds.
+"""
+import argparse
 import numpy as np
 
-def create_fcc_argon(nx=4, ny=4, nz=4, lattice_param=5.26):
+# Fractional basis positions and cell edge lengths in units of the lattice parameter.
+# HCP uses the orthohexagonal 4-atom cell with ideal c/a, lattice_param is the in-plane spacing.
+LATTICES = {
+    'fcc': ([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0], [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]],
+            [1.0, 1.0, 1.0]),
+    'bcc': ([[0.0, 0.0, 0.0], [0.5, 0.5, 0.5]],
+            [1.0, 1.0, 1.0]),
+    'hcp': ([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0], [0.5, 1.0 / 6.0, 0.5], [0.0, 2.0 / 3.0, 0.5]],
+            [1.0, np.sqrt(3.0), np.sqrt(8.0 / 3.0)]),
+}
+
+def lattice_positions(basis, cell_lengths, shape, first_cell, last_cell):
+    """Cartesian positions of unit cells first_cell..last_cell-1 (cells in C order, basis innermost)"""
+    cells = np.arange(first_cell, last_cell)
+    index = np.stack(np.unravel_index(cells, shape), axis=1)
+    positions = (index[:, None, :] + np.asarray(basis)[None, :, :]) * cell_lengths
+    return positions.reshape(-1, 3)
+
+def _ascii_digits(values, width, pad=b' '):
+    """Right-aligned decimal digits of non-negative integers as an (n, width) uint8 array"""
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = (values[:, None] // powers % 10 + ord('0')).astype(np.uint8)
+    if pad != b'0':
+        digits[(values[:, None] < powers) & (powers > 1)] = ord(pad)
+    return digits
+
+def format_atoms(ids, types, positions, id_width, type_width, int_width):
+    """Atoms section lines 'id type x y z' (6 decimals) as bytes, formatted without a Python loop"""
+    n = len(ids)
+    space = np.full((n, 1), ord(' '), dtype=np.uint8)
+    columns = [_ascii_digits(ids, id_width), space, _ascii_digits(types, type_width)]
+    micro = np.rint(positions * 1e6).astype(np.int64)
+    for k in range(3):
+        columns += [space,
+                    _ascii_digits(micro[:, k] // 1000000, int_width),
+                    np.full((n, 1), ord('.'), dtype=np.uint8),
+                    _ascii_digits(micro[:, k] % 1000000, 6, pad=b'0')]
+    columns.append(np.full((n, 1), ord('\n'), dtype=np.uint8))
+    return np.concatenate(columns, axis=1).tobytes()
+
+def create_lattice(lattice='fcc', nx=4, ny=4, nz=4, lattice_param=5.26, output="structure_fcc.data",
+                   vacancy_fraction=0.0, displacement=0.0, seed=12345, chunk_atoms=1000000):
+    """Write a LAMMPS data file for an nx x ny x nz supercell of the given lattice
+
+    vacancy_fraction removes randomly chosen sites (ids stay contiguous), displacement adds
+    Gaussian noise with this standard deviation in Angstrom, wrapped back into the box.
+    """
+    basis, aspect = LATTICES[lattice]
+    cell_lengths = lattice_param * np.array(aspect)
+    shape = (nx, ny, nz)
+    box = cell_lengths * shape
+    ncells = nx * ny * nz
+    nsites = ncells * len(basis)
+
+    rng = np.random.default_rng(seed)
+    nvacancies = int(round(vacancy_fraction * nsites))
+    vacancies = np.sort(rng.choice(nsites, nvacancies, replace=False)) if nvacancies else np.zeros(0, np.int64)
+    natoms = nsites - nvacancies
+
+    id_width = len(str(natoms))
+    int_width = len(str(int(box.max())))
+    cells_per_chunk = max(1, chunk_atoms // len(basis))
+
+    with open(output, 'wb') as f:
+        header = ("LAMMPS data file for {} Argon crystal\n\n"
+                  "{} atoms\n"
+                  "1 atom types\n\n"
+                  "0.0 {:.6f} xlo xhi\n"
+                  "0.0 {:.6f} ylo yhi\n"
+                  "0.0 {:.6f} zlo zhi\n\n"
+                  "Masses\n\n"
+                  "1 39.948  # Ar\n\n"
+                  "Atoms\n\n").format(lattice.upper(), natoms, *box)
+        f.write(header.encode())
+
+        for chunk, first in enumerate(range(0, ncells, cells_per_chunk)):
+            last = min(first + cells_per_chunk, ncells)
+            positions = lattice_positions(basis, cell_lengths, shape, first, last)
+            sites = np.arange(first * len(basis), last * len(basis), dtype=np.int64)
+            if nvacancies:
+                keep = ~np.isin(sites, vacancies, assume_unique=True)
+                positions, sites = positions[keep], sites[keep]
+            if displacement > 0.0:
+                noise_rng = np.random.default_rng([seed, chunk])
+                positions = np.mod(positions + noise_rng.normal(0.0, displacement, positions.shape), box)
+                # np.mod can round up to exactly the box length, which would print as the upper bound
+                positions[positions >= box] = 0.0
+            ids = sites - np.searchsorted(vacancies, sites) + 1
+            f.write(format_atoms(ids, np.ones(len(ids), dtype=np.int64), positions,
+                                 id_width, 1, int_width))
+
+    print(f"Created {lattice.upper()} Argon system with {natoms} atoms")
+    if nvacancies:
+        print(f"Removed {nvacancies} sites as vacancies")
+    print(f"Box size: {box[0]:.2f} x {box[1]:.2f} x {box[2]:.2f} Angstroms")
+    return natoms
+
+def create_fcc_argon(nx=4, ny=4, nz=4, lattice_param=5.26, output="structure_fcc.data"):
     """Create FCC Argon structure with proper spacing"""
-    atoms = []
-    atom_id = 1
-    
-    # FCC unit cell positions (fractional coordinates)
-    fcc_positions = [
-        [0.0, 0.0, 0.0],
-        [0.5, 0.5, 0.0],
-        [0.5, 0.0, 0.5],
-        [0.0, 0.5, 0.5]
-    ]
-    
-    for i in range(nx):
-        for j in range(ny):
-            for k in range(nz):
-                for pos in fcc_positions:
-                    x = (i + pos[0]) * lattice_param
-                    y = (j + pos[1]) * lattice_param
-                    z = (k + pos[2]) * lattice_param
-                    atoms.append([atom_id, 1, x, y, z])
-                    atom_id += 1
-    
-    # Box dimensions
-    xhi = nx * lattice_param
-    yhi = ny * lattice_param
-    zhi = nz * lattice_param
-    
-    # Write LAMMPS data file
-    with open("structure_fcc.data", 'w') as f:
-        f.write("LAMMPS data file for FCC Argon crystal\n\n")
-        f.write(f"{len(atoms)} atoms\n")
-        f.write("1 atom types\n\n")
-        f.write(f"0.0 {xhi:.6f} xlo xhi\n")
-        f.write(f"0.0 {yhi:.6f} ylo yhi\n")
-        f.write(f"0.0 {zhi:.6f} zlo zhi\n\n")
-        f.write("Masses\n\n")
-        f.write("1 39.948  # Ar\n\n")
-        f.write("Atoms\n\n")
-        
-        for atom in atoms:
-            f.write(f"{atom[0]} {atom[1]} {atom[2]:.6f} {atom[3]:.6f} {atom[4]:.6f}\n")
-    
-    print(f"Created FCC Argon system with {len(atoms)} atoms")
-    print(f"Box size: {xhi:.2f} x {yhi:.2f} x {zhi:.2f} Angstroms")
-    return len(atoms)
+    return create_lattice('fcc', nx, ny, nz, lattice_param, output)
 
 if __name__ == "__main__":
-    create_fcc_argon()
+    parser = argparse.ArgumentParser(description="Create a LAMMPS data file for crystalline Argon")
+    parser.add_argument("--lattice", choices=sorted(LATTICES), default="fcc")
+    parser.add_argument("--cells", type=int, nargs=3, default=[4, 4, 4], metavar=("NX", "NY", "NZ"))
+    parser.add_argument("--lattice-param", type=float, default=5.26, help="Lattice parameter in Angstrom")
+    parser.add_argument("-o", "--output", default="structure_fcc.data")
+    parser.add_argument("--vacancies", type=float, default=0.0, help="Fraction of sites to leave empty")
+    parser.add_argument("--displacement", type=float, default=0.0,
+                        help="Standard deviation of random displacements in Angstrom (thermal noise)")
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--chunk-atoms", type=int, default=1000000, help="Atoms generated and written per chunk")
+    args = parser.parse_args()
+
+    create_lattice(args.lattice, *args.cells, args.lattice_param, args.output,
+                   args.vacancies, args.displacement, args.seed, args.chunk_atoms)
@@ -1,42 +1,191 @@
 #!/usr/bin/env python3
-"""Create a smaller system for testing"""
-
-def create_small_system():
-    atoms = []
-    atom_id = 1
-    
-    with open("structure.data", 'r') as f:
-        lines = f.readlines()
-    
-    # Find the atoms section
-    in_atoms = False
-    for line in lines:
-        if line.strip() == "Atoms":
-            in_atoms = True
-            continue
-        elif in_atoms and line.strip() and not line.startswith("#"):
-            atoms.append(line.strip())
-            atom_id += 1
-            if len(atoms) >= 1000:  # Take only first 1000 atoms
+"""Create a smaller system for testing
+
+A large data file is loaded once into arrays and indexed with a cell list, so
+any number of periodic sub-boxes (or spherical clusters) of different sizes can
+be cut from it. Sub-box edges can be rounded to whole lattice periods, and atoms
+that would overlap with a periodic image of the opposite face are removed.
+"""
+import argparse
+import itertools
+import numpy as np
+from create_proper_system import format_atoms
+from neighbor_list import neighbor_list
+
+# smallest fraction of the requested atom count a carved system may keep
+MIN_KEPT = 0.5
+
+def read_atoms(filename):
+    """Return (ids, types, positions, box) of an orthogonal atom_style atomic data file"""
+    box = np.zeros((3, 2))
+    with open(filename, 'r') as f:
+        f.readline()
+        natoms = None
+        for line in f:
+            parts = line.split('#')[0].split()
+            if not parts:
+                continue
+            if parts[-1] == 'atoms':
+                natoms = int(parts[0])
+            elif parts[-1] in ('xhi', 'yhi', 'zhi'):
+                box['xyz'.index(parts[-1][0])] = float(parts[0]), float(parts[1])
+            elif parts[-1] == 'yz':
+                raise ValueError("Triclinic data files are not supported, convert to an orthogonal box first")
+            elif parts[0] == 'Atoms':
                 break
-    
-    # Write smaller system
-    with open("structure_small.data", 'w') as f:
-        f.write("LAMMPS data file for small Argon test system\n\n")
-        f.write(f"{len(atoms)} atoms\n")
-        f.write("1 atom types\n\n")
-        f.write("-2.0 15.35 xlo xhi\n")
-        f.write("-2.0 15.35 ylo yhi\n")
-        f.write("-2.0 15.35 zlo zhi\n\n")
-        f.write("Masses\n\n")
-        f.write("1 39.948  # Ar\n\n")
-        f.write("Atoms\n\n")
-        
-        for i, atom_line in enumerate(atoms):
-            parts = atom_line.split()
-            f.write(f"{i+1} 1 {parts[2]} {parts[3]} {parts[4]}\n")
-    
-    print(f"Created small system with {len(atoms)} atoms")
+        text = ''.join(itertools.islice((l for l in f if l.strip()), natoms))
+    data = np.array(text.split(), dtype=float).reshape(natoms, -1)
+    return data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2:5], box
+
+class SpatialIndex:
+    """Cell list over a periodic orthogonal box for box and sphere queries"""
+
+    def __init__(self, positions, box, bin_size=5.0):
+        self.lo = box[:, 0]
+        self.lengths = box[:, 1] - box[:, 0]
+        self.positions = self.lo + np.mod(positions - self.lo, self.lengths)
+        self.nbins = np.maximum((self.lengths // bin_size).astype(np.int64), 1)
+        self.bin_lengths = self.lengths / self.nbins
+        bins = np.minimum(((self.positions - self.lo) / self.bin_lengths).astype(np.int64), self.nbins - 1)
+        cell_id = np.ravel_multi_index(bins.T, self.nbins)
+        self.order = np.argsort(cell_id, kind='stable')
+        counts = np.bincount(cell_id, minlength=int(np.prod(self.nbins)))
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+
+    def _candidates(self, lo, hi):
+        """Atom indices and image shifts of all atoms in cells overlapping [lo, hi) (periodic)"""
+        first = np.floor((lo - self.lo) / self.bin_lengths).astype(np.int64)
+        last = np.floor((hi - self.lo) / self.bin_lengths).astype(np.int64)
+        ranges = [np.arange(first[k], last[k] + 1) for k in range(3)]
+        cells = np.array(np.meshgrid(*ranges, indexing='ij')).reshape(3, -1).T
+        wrapped = np.mod(cells, self.nbins)
+        shifts = (cells - wrapped) // self.nbins * self.lengths
+        cell_id = np.ravel_multi_index(wrapped.T, self.nbins)
+        counts = self.starts[cell_id + 1] - self.starts[cell_id]
+        atoms = self.order[np.repeat(self.starts[cell_id], counts) + np.arange(counts.sum())
+                           - np.repeat(np.cumsum(counts) - counts, counts)]
+        return atoms, np.repeat(shifts, counts, axis=0)
+
+    def query_box(self, lo, hi):
+        """(indices, positions) of atoms with lo <= r < hi, positions taken from the nearest image"""
+        lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+        if np.any(hi - lo > self.lengths + 1e-9):
+            raise ValueError("Sub-box is larger than the source box")
+        atoms, shifts = self._candidates(lo, hi)
+        positions = self.positions[atoms] + shifts
+        inside = np.all((positions >= lo) & (positions < hi), axis=1)
+        return atoms[inside], positions[inside]
+
+    def query_sphere(self, center, radius):
+        """(indices, positions) of atoms within radius of center, positions taken from the nearest image"""
+        center = np.asarray(center, dtype=float)
+        if np.any(2.0 * radius > self.lengths):
+            raise ValueError("Sphere diameter is larger than the source box")
+        atoms, shifts = self._candidates(center - radius, center + radius)
+        positions = self.positions[atoms] + shifts
+        inside = np.sum((positions - center)**2, axis=1) < radius * radius
+        return atoms[inside], positions[inside]
+
+def remove_overlaps(positions, lengths, min_distance):
+    """Drop atoms closer than min_distance to another atom of the periodic sub-box, return kept mask"""
+    keep = np.ones(len(positions), dtype=bool)
+    i, j, _, _ = neighbor_list(positions, np.diag(lengths), min_distance)
+    for a, b in zip(i[i < j], j[i < j]):
+        if keep[a] and keep[b]:
+            keep[b] = False
+    return keep
+
+def write_data(filename, types, positions, lengths, title):
+    """Data file with box 0 ... lengths, positions must lie inside the box"""
+    with open(filename, 'wb') as f:
+        f.write((f"{title}\n\n"
+                 f"{len(positions)} atoms\n"
+                 f"{int(types.max()) if len(types) else 1} atom types\n\n"
+                 f"0.0 {lengths[0]:.6f} xlo xhi\n"
+                 f"0.0 {lengths[1]:.6f} ylo yhi\n"
+                 f"0.0 {lengths[2]:.6f} zlo zhi\n\n"
+                 "Masses\n\n"
+                 "1 39.948  # Ar\n\n"
+                 "Atoms\n\n").encode())
+        ids = np.arange(1, len(positions) + 1)
+        f.write(format_atoms(ids, types, positions, len(str(len(ids))), len(str(int(types.max()) if len(types) else 1)),
+                             len(str(int(lengths.max())))))
+
+def carve_box(index, types, natoms, center=None, period=None, min_distance=2.5):
+    """Periodic cubic sub-box holding about natoms atoms
+
+    Returns (types, positions in [0, L), L). With period (lattice parameter) the edge is
+    rounded to whole periods so the crystal stays continuous across the new boundaries.
+    """
+    density = len(index.positions) / np.prod(index.lengths)
+    edge = (natoms / density) ** (1.0 / 3.0)
+    if period is not None:
+        edge = max(1, int(round(edge / period))) * period
+    lengths = np.full(3, edge)
+    center = index.lo + 0.5 * index.lengths if center is None else np.asarray(center, dtype=float)
+    if period is not None:
+        # align the corner with the lattice of the source (assumed to start at the box origin)
+        lo = index.lo + np.round((center - 0.5 * lengths - index.lo) / period) * period
+    else:
+        lo = center - 0.5 * lengths
+    atoms, positions = index.query_box(lo, lo + lengths)
+    if len(atoms) == 0:
+        raise ValueError(f"No atoms in the {edge:.3f} A sub-box at {lo} (natoms {natoms})")
+    positions = np.clip(positions - lo, 0.0, np.nextafter(lengths, 0.0))
+    keep = remove_overlaps(positions, lengths, min_distance) if min_distance > 0 else np.ones(len(atoms), bool)
+    if not keep.all():
+        print(f"  removed {np.sum(~keep)} atoms overlapping with periodic images")
+    return types[atoms][keep], positions[keep], lengths
+
+def carve_sphere(index, types, natoms, center=None, vacuum=10.0):
+    """Spherical cluster of about natoms atoms in a box with the given vacuum padding"""
+    density = len(index.positions) / np.prod(index.lengths)
+    radius = (3.0 * natoms / (4.0 * np.pi * density)) ** (1.0 / 3.0)
+    center = index.lo + 0.5 * index.lengths if center is None else np.asarray(center, dtype=float)
+    atoms, positions = index.query_sphere(center, radius)
+    if len(atoms) == 0:
+        raise ValueError(f"No atoms within {radius:.3f} A of {center} (natoms {natoms})")
+    lengths = np.full(3, 2.0 * (radius + vacuum))
+    return types[atoms], positions - center + 0.5 * lengths, lengths
+
+def create_small_system(input_file="structure.data", sizes=(1000,), output="structure_small{suffix}.data",
+                        shape='box', center=None, period=None, min_distance=2.5, vacuum=10.0):
+    """Cut one test system per requested atom count from a single load of input_file"""
+    _, types, positions, box = read_atoms(input_file)
+    index = SpatialIndex(positions, box)
+    print(f"Loaded {len(positions)} atoms from {input_file}")
+
+    outputs = []
+    for natoms in sizes:
+        if shape == 'sphere':
+            t, p, lengths = carve_sphere(index, types, natoms, center, vacuum)
+        else:
+            t, p, lengths = carve_box(index, types, natoms, center, period, min_distance)
+        if len(p) < MIN_KEPT * natoms:
+            # e.g. a data file with many structures stacked in one box: most atoms overlap and are dropped
+            raise ValueError(f"Only {len(p)} of {natoms} requested atoms kept in a {lengths[0]:.3f} A box: "
+                             f"{input_file} has {len(positions) / np.prod(index.lengths):.3f} atoms/A^3, "
+                             f"use a bulk structure or lower --min-distance")
+        filename = output.format(suffix='' if len(sizes) == 1 else f'_{natoms}')
+        write_data(filename, t, p, lengths, f"LAMMPS data file for small Argon test system ({shape})")
+        print(f"Created small system with {len(p)} atoms, box {lengths[0]:.3f} A -> {filename}")
+        outputs.append(filename)
+    return outputs
 
 if __name__ == "__main__":
-    create_small_system()
+    parser = argparse.ArgumentParser(description="Carve periodic sub-boxes or clusters out of a large data file")
+    parser.add_argument("input", nargs="?", default="structure.data")
+    parser.add_argument("--natoms", type=int, nargs="+", default=[1000], help="Target atom counts")
+    parser.add_argument("-o", "--output", default="structure_small{suffix}.data",
+                        help="Output name, '{suffix}' becomes _<natoms> when several sizes are requested")
+    parser.add_argument("--sphere", action="store_true", help="Cut a spherical cluster instead of a periodic box")
+    parser.add_argument("--center", type=float, nargs=3, default=None, help="Center of the cut (default: box center)")
+    parser.add_argument("--lattice-param", type=float, default=None,
+                        help="Round box edges to multiples of this lattice parameter")
+    parser.add_argument("--min-distance", type=float, default=2.5,
+                        help="Remove atoms closer than this to a periodic image (0 disables)")
+    parser.add_argument("--vacuum", type=float, default=10.0, help="Vacuum padding around clusters")
+    args = parser.parse_args()
+
+    create_small_system(args.input, args.natoms, args.output, 'sphere' if args.sphere else 'box',
+                        args.center, args.lattice_param, args.min_distance, args.vacuum)
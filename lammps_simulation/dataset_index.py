@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Random-access index and query engine for n2p2 input.data datasets
+
+The index is a compact sidecar table (<dataset>.idx.npz) with the byte offset,
+length, atom count, lattice, energy, comment and per-structure statistics
+(density, max force, min distance) of every begin ... end block. Queries work
+on the table only; structures are read back with a single seek, so splits,
+samples or one failing structure take milliseconds instead of a full parse.
+"""
+
+import argparse
+import itertools
+import mmap
+import multiprocessing
+import os
+import re
+import numpy as np
+from convert_structure import parse_structure
+from neighbor_list import neighbor_list, plane_spacings
+
+INDEX_VERSION = 1
+FIELDS = ['natoms', 'energy', 'energy_per_atom', 'volume', 'density', 'max_force', 'min_distance']
+
+def index_filename(dataset):
+    return dataset + '.idx.npz'
+
+def scan_offsets(dataset):
+    """Byte offsets and lengths of all begin ... end blocks (a single regex pass over a memory map)"""
+    with open(dataset, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        begins = np.array([m.start() for m in re.finditer(rb'^begin', mm, re.M)], dtype=np.int64)
+        ends = np.array([m.end() for m in re.finditer(rb'^end[^\n]*\n?', mm, re.M)], dtype=np.int64)
+    if len(begins) != len(ends):
+        raise ValueError(f"{dataset}: {len(begins)} 'begin' but {len(ends)} 'end' lines")
+    return begins, ends - begins
+
+def min_distance(structure, cutoff=4.0, chunk=512):
+    """Shortest interatomic distance (periodic if the structure has a lattice)"""
+    positions = structure['positions']
+    if len(positions) < 2:
+        return np.nan
+    lattice = structure['lattice']
+    if lattice is not None:
+        # Minimum image through rounded fractional differences. It can only overestimate the
+        # shortest pair distance, and is exact whenever the result is below half the smallest
+        # plane spacing (the true shortest vector then has all fractional components < 1/2).
+        frac = positions @ np.linalg.inv(lattice)
+        shortest = np.inf
+        for start in range(0, len(frac), chunk):
+            d = frac[None, :, :] - frac[start:start + chunk, None, :]
+            d = (d - np.round(d)) @ lattice
+            r2 = np.einsum('ijk,ijk->ij', d, d)
+            r2[np.arange(len(r2)), np.arange(start, start + len(r2))] = np.inf
+            shortest = min(shortest, np.sqrt(r2.min()))
+        if shortest < 0.5 * plane_spacings(lattice).min():
+            return shortest
+
+    pbc = (True, True, True) if lattice is not None else (False, False, False)
+    while True:
+        if lattice is None:
+            cell = np.diag(np.ptp(positions, axis=0) + cutoff)
+            origin = positions.min(axis=0)
+        else:
+            cell, origin = lattice, None
+        _, _, _, r = neighbor_list(positions, cell, cutoff, origin, pbc)
+        if len(r):
+            return r.min()
+        cutoff *= 2.0
+
+def structure_stats(structure):
+    """Row of FIELDS for one parsed structure"""
+    natoms = len(structure['positions'])
+    energy = structure['energy'] if structure['energy'] is not None else np.nan
+    volume = abs(np.linalg.det(structure['lattice'])) if structure['lattice'] is not None else np.nan
+    forces = structure.get('forces')
+    max_force = np.sqrt((forces**2).sum(axis=1)).max() if forces is not None and natoms else np.nan
+    return [natoms, energy, energy / natoms, volume, natoms / volume, max_force, min_distance(structure)]
+
+def read_block(dataset, offset, length):
+    with open(dataset, 'rb') as f:
+        f.seek(offset)
+        return f.read(length).decode()
+
+def _index_batch(args):
+    dataset, offsets, lengths = args
+    rows, lattices, comments = [], [], []
+    with open(dataset, 'rb') as f:
+        for offset, length in zip(offsets, lengths):
+            f.seek(offset)
+            structure = parse_structure(f.read(length).decode().splitlines())
+            rows.append(structure_stats(structure))
+            lattices.append(structure['lattice'] if structure['lattice'] is not None else np.full((3, 3), np.nan))
+            comments.append(structure['comment'])
+    return rows, lattices, comments
+
+def build_index(dataset, nprocs=None, batch_size=256):
+    """Scan a dataset once and write its sidecar index"""
+    offsets, lengths = scan_offsets(dataset)
+    batches = [(dataset, offsets[k:k + batch_size], lengths[k:k + batch_size])
+               for k in range(0, len(offsets), batch_size)]
+    rows, lattices, comments = [], [], []
+    with multiprocessing.Pool(nprocs) as pool:
+        for r, l, c in pool.imap(_index_batch, batches):
+            rows += r
+            lattices += l
+            comments += c
+
+    stat = os.stat(dataset)
+    table = np.array(rows, dtype=float).reshape(-1, len(FIELDS))
+    np.savez_compressed(index_filename(dataset), version=INDEX_VERSION, size=stat.st_size, mtime=stat.st_mtime,
+                        offset=offsets, length=lengths, fields=np.array(FIELDS), table=table,
+                        lattice=np.array(lattices).reshape(-1, 3, 3), comment=np.array(comments, dtype=str))
+    print(f"Indexed {len(offsets)} structures of {dataset} -> {index_filename(dataset)}")
+
+class DatasetIndex:
+    """Query and random-access read of an indexed n2p2 dataset (the index is (re)built if missing or stale)"""
+
+    def __init__(self, dataset, nprocs=None):
+        self.dataset = dataset
+        filename = index_filename(dataset)
+        stat = os.stat(dataset)
+        if not self._is_current(filename, stat):
+            build_index(dataset, nprocs)
+        with np.load(filename) as data:
+            self.offset = data['offset']
+            self.length = data['length']
+            self.lattice = data['lattice']
+            self.comment = data['comment']
+            self.columns = dict(zip(data['fields'], data['table'].T))
+
+    @staticmethod
+    def _is_current(filename, stat):
+        if not os.path.exists(filename):
+            return False
+        with np.load(filename) as data:
+            return (int(data['version']) == INDEX_VERSION and int(data['size']) == stat.st_size
+                    and float(data['mtime']) == stat.st_mtime)
+
+    def __len__(self):
+        return len(self.offset)
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def select(self, indices=None, **ranges):
+        """Indices whose fields lie in the given (lo, hi) ranges, e.g. select(max_force=(None, 5.0))
+
+        None leaves a side of a range open; NaN values never match a range.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for field, (lo, hi) in ranges.items():
+            values = self.columns[field]
+            if lo is not None:
+                mask &= values >= lo
+            if hi is not None:
+                mask &= values <= hi
+        selected = np.flatnonzero(mask)
+        return selected if indices is None else np.intersect1d(selected, indices)
+
+    def sample(self, n, seed=None, indices=None):
+        """n distinct random structure indices (from indices if given), in file order"""
+        pool = np.arange(len(self)) if indices is None else np.asarray(indices)
+        rng = np.random.default_rng(seed)
+        return np.sort(rng.choice(pool, min(n, len(pool)), replace=False))
+
+    def split(self, fraction=0.1, seed=None, indices=None):
+        """(train, validation) index arrays, validation gets the given fraction"""
+        pool = np.arange(len(self)) if indices is None else np.asarray(indices)
+        validation = self.sample(int(round(fraction * len(pool))), seed, pool)
+        return np.setdiff1d(pool, validation), validation
+
+    def raw(self, index):
+        """Text of one begin ... end block"""
+        return read_block(self.dataset, self.offset[index], self.length[index])
+
+    def read(self, index):
+        return parse_structure(self.raw(index).splitlines())
+
+    def iter_structures(self, indices):
+        """Yield (index, structure) for the given indices, reading in file order"""
+        with open(self.dataset, 'rb') as f:
+            for index in np.sort(indices):
+                f.seek(self.offset[index])
+                yield index, parse_structure(f.read(self.length[index]).decode().splitlines())
+
+    def map(self, function, indices=None, nprocs=None, chunksize=64):
+        """[function(structure) for each selected structure], evaluated in a process pool"""
+        indices = np.arange(len(self)) if indices is None else np.sort(indices)
+        batches = [(self.dataset, self.offset[indices[k:k + chunksize]], self.length[indices[k:k + chunksize]],
+                    function) for k in range(0, len(indices), chunksize)]
+        with multiprocessing.Pool(nprocs) as pool:
+            return list(itertools.chain.from_iterable(pool.imap(_map_batch, batches)))
+
+    def extract(self, indices, output):
+        """Copy the selected blocks verbatim into a new dataset file"""
+        with open(self.dataset, 'rb') as f, open(output, 'wb') as out:
+            for index in np.sort(indices):
+                f.seek(self.offset[index])
+                out.write(f.read(self.length[index]))
+        print(f"Wrote {len(indices)} structures to {output}")
+
+    def summary(self):
+        lines = [f"{self.dataset}: {len(self)} structures"]
+        for field in FIELDS:
+            values = self.columns[field]
+            finite = values[np.isfinite(values)]
+            if len(finite):
+                lines.append(f"  {field:16s} min {finite.min():12.6g}  mean {finite.mean():12.6g}  max {finite.max():12.6g}")
+        return '\n'.join(lines)
+
+def _map_batch(args):
+    dataset, offsets, lengths, function = args
+    results = []
+    with open(dataset, 'rb') as f:
+        for offset, length in zip(offsets, lengths):
+            f.seek(offset)
+            results.append(function(parse_structure(f.read(length).decode().splitlines())))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index and query an n2p2 input.data dataset")
+    parser.add_argument("dataset", help="n2p2 input.data / output.data")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it is current")
+    parser.add_argument("--nprocs", type=int, default=None)
+    for field in FIELDS:
+        parser.add_argument("--" + field.replace('_', '-'), type=float, nargs=2, metavar=("LO", "HI"),
+                            default=None, help=f"Keep structures with {field} in [LO, HI]")
+    parser.add_argument("--sample", type=int, default=None, help="Random sample of N selected structures")
+    parser.add_argument("--split", type=float, default=None,
+                        help="Write <output>.train / <output>.valid with this validation fraction")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--show", type=int, default=None, help="Print one structure block")
+    parser.add_argument("-o", "--output", default=None, help="Write the selected structures to this file")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        build_index(args.dataset, args.nprocs)
+    index = DatasetIndex(args.dataset, args.nprocs)
+
+    if args.show is not None:
+        print(index.raw(args.show), end='')
+    else:
+        ranges = {field: tuple(getattr(args, field)) for field in FIELDS if getattr(args, field) is not None}
+        selected = index.select(**ranges)
+        if args.sample is not None:
+            selected = index.sample(args.sample, args.seed, selected)
+        print(index.summary())
+        print(f"Selected {len(selected)} structures")
+        if args.output and args.split is not None:
+            train, valid = index.split(args.split, args.seed, selected)
+            index.extract(train, args.output + '.train')
+            index.extract(valid, args.output + '.valid')
+        elif args.output:
+            index.extract(selected, args.output)
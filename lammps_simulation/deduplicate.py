@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection and removal for n2p2 training datasets
+
+Every structure gets a fixed-length fingerprint: the cumulative pair-distance
+histogram N(r) per atom (neighbors within r, linear binning so it varies
+smoothly with the positions). Fingerprints are projected onto their leading
+principal components and candidate pairs are found with a KD-tree; the exact
+distance in full fingerprint space then decides. A structure is dropped when
+an earlier kept structure lies within the tolerance, and a mapping file records
+which representative replaced it.
+"""
+
+import argparse
+import functools
+import numpy as np
+from scipy.spatial import cKDTree
+from dataset_index import DatasetIndex
+from neighbor_list import neighbor_list
+
+def fingerprint(structure, rmax=6.0, nbins=60):
+    """Cumulative neighbor count per atom on nbins points up to rmax (length nbins vector)"""
+    positions = structure['positions']
+    if structure['lattice'] is None:
+        cell = np.diag(np.ptp(positions, axis=0) + rmax)
+        _, _, _, r = neighbor_list(positions, cell, rmax, positions.min(axis=0), (False, False, False))
+    else:
+        _, _, _, r = neighbor_list(positions, structure['lattice'], rmax)
+
+    # linear binning: each distance is split between its two neighboring grid points
+    x = r / rmax * nbins
+    lower = np.floor(x).astype(np.int64)
+    weight = x - lower
+    histogram = (np.bincount(lower, 1.0 - weight, minlength=nbins + 1)
+                 + np.bincount(np.minimum(lower + 1, nbins), weight, minlength=nbins + 1))[:nbins]
+    return np.cumsum(histogram) / max(len(positions), 1)
+
+def find_duplicates(fingerprints, tolerance, energies=None, energy_tolerance=None, ncomponents=12):
+    """Greedy leader clustering in file order
+
+    Returns (representative index of every structure, fingerprint distance to it).
+    """
+    n = len(fingerprints)
+    # Euclidean distances of the scaled vectors are RMS differences over the grid points
+    fingerprints = fingerprints / np.sqrt(fingerprints.shape[1])
+    centered = fingerprints - fingerprints.mean(axis=0)
+    # projections never increase distances, so the KD-tree radius search misses no pairs
+    _, _, vt = np.linalg.svd(centered[np.random.default_rng(0).permutation(n)[:20000]], full_matrices=False)
+    projected = centered @ vt[:ncomponents].T
+    pairs = cKDTree(projected).query_pairs(tolerance, output_type='ndarray')
+
+    distance = np.sqrt(np.sum((fingerprints[pairs[:, 0]] - fingerprints[pairs[:, 1]])**2, axis=1))
+    close = distance <= tolerance
+    if energies is not None and energy_tolerance is not None:
+        close &= np.abs(energies[pairs[:, 0]] - energies[pairs[:, 1]]) <= energy_tolerance
+    pairs, distance = pairs[close], distance[close]
+
+    # sort candidate pairs by (earlier, later) structure so leaders are visited in file order
+    pairs.sort(axis=1)
+    order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+    pairs, distance = pairs[order], distance[order]
+    starts = np.searchsorted(pairs[:, 0], np.arange(n + 1))
+
+    representative = np.arange(n)
+    rep_distance = np.zeros(n)
+    removed = np.zeros(n, dtype=bool)
+    for i in np.unique(pairs[:, 0]):
+        if removed[i]:
+            continue
+        partners = pairs[starts[i]:starts[i + 1], 1]
+        new = ~removed[partners]
+        removed[partners[new]] = True
+        representative[partners[new]] = i
+        rep_distance[partners[new]] = distance[starts[i]:starts[i + 1]][new]
+    return representative, rep_distance
+
+def deduplicate(dataset, output="input.dedup.data", mapping="dedup_mapping.txt", tolerance=0.05,
+                energy_tolerance=None, rmax=6.0, nbins=60, nprocs=None):
+    """Write a reduced dataset without near-duplicates plus a mapping file"""
+    index = DatasetIndex(dataset, nprocs)
+    fingerprints = np.array(index.map(functools.partial(fingerprint, rmax=rmax, nbins=nbins), nprocs=nprocs))
+    representative, distance = find_duplicates(fingerprints, tolerance, index['energy_per_atom'], energy_tolerance)
+
+    kept = np.flatnonzero(representative == np.arange(len(index)))
+    new_index = np.full(len(index), -1)
+    new_index[kept] = np.arange(len(kept))
+    index.extract(kept, output)
+    np.savetxt(mapping, np.column_stack([np.arange(len(index)), representative, new_index[representative], distance]),
+               fmt=['%d', '%d', '%d', '%.6f'],
+               header=f"original_index representative_index index_in_{output} fingerprint_distance")
+
+    print(f"[✓] Kept {len(kept)} of {len(index)} structures ({len(index) - len(kept)} near-duplicates, "
+          f"tolerance {tolerance} neighbors RMS)")
+    print(f"[✓] Mapping written to {mapping}")
+    return kept
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove near-duplicate structures from an n2p2 dataset")
+    parser.add_argument("dataset", help="n2p2 input.data")
+    parser.add_argument("-o", "--output", default="input.dedup.data")
+    parser.add_argument("--mapping", default="dedup_mapping.txt")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Fingerprint distance (cumulative neighbors per atom) below which structures are duplicates")
+    parser.add_argument("--energy-tolerance", type=float, default=None,
+                        help="Additionally require |dE| per atom below this (eV/atom)")
+    parser.add_argument("--rmax", type=float, default=6.0, help="Fingerprint range in Angstrom")
+    parser.add_argument("--nbins", type=int, default=60)
+    parser.add_argument("--nprocs", type=int, default=None)
+    args = parser.parse_args()
+
+    deduplicate(args.dataset, args.output, args.mapping, args.tolerance, args.energy_tolerance,
+                args.rmax, args.nbins, args.nprocs)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Farthest-point / k-means++ selection of compact, diverse training subsets
+
+Each structure is described by a fixed-length vector (the RDF fingerprint of
+deduplicate.py, or any precomputed (N, d) .npy array such as averaged symmetry
+functions). Selection keeps one array with every structure's distance to the
+nearest selected structure and updates it after each pick, so k picks cost
+O(N k d) time and O(N) extra memory.
+"""
+
+import argparse
+import functools
+import numpy as np
+from dataset_index import DatasetIndex
+from deduplicate import fingerprint
+
+def _distances(descriptors, center):
+    diff = descriptors - center
+    return np.sqrt(np.einsum('ij,ij->i', diff, diff))
+
+def farthest_point_sampling(descriptors, k, first=None, seed=None):
+    """Greedy max-min selection, returns (indices in pick order, distance of each pick to the earlier ones)"""
+    n = len(descriptors)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    if first is None:
+        # start from the structure farthest from the mean, a deterministic outlier
+        first = int(np.argmax(_distances(descriptors, descriptors.mean(axis=0)))) if seed is None \
+            else int(np.random.default_rng(seed).integers(n))
+    selected = np.empty(k, dtype=np.int64)
+    radius = np.empty(k)
+    selected[0], radius[0] = first, np.inf
+    nearest = _distances(descriptors, descriptors[first])
+    for m in range(1, k):
+        pick = int(np.argmax(nearest))
+        if nearest[pick] == 0.0:
+            # every structure duplicates a selected one, more picks would repeat structures
+            return selected[:m], radius[:m]
+        selected[m], radius[m] = pick, nearest[pick]
+        np.minimum(nearest, _distances(descriptors, descriptors[pick]), out=nearest)
+    return selected, radius
+
+def kmeanspp_sampling(descriptors, k, seed=None):
+    """k-means++ seeding (picks with probability proportional to the squared distance), same returns"""
+    rng = np.random.default_rng(seed)
+    n = len(descriptors)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    selected = np.empty(k, dtype=np.int64)
+    radius = np.empty(k)
+    selected[0], radius[0] = rng.integers(n), np.inf
+    nearest = _distances(descriptors, descriptors[selected[0]])
+    for m in range(1, k):
+        weights = nearest**2
+        total = weights.sum()
+        if total <= 0.0:
+            pick = int(rng.choice(np.flatnonzero(~np.isin(np.arange(n), selected[:m]))))
+        else:
+            pick = int(np.searchsorted(np.cumsum(weights), rng.random() * total, side='right'))
+            pick = min(pick, n - 1)
+        selected[m], radius[m] = pick, nearest[pick]
+        np.minimum(nearest, _distances(descriptors, descriptors[pick]), out=nearest)
+    return selected, radius
+
+def coverage_radius(descriptors, selected):
+    """Largest distance of any structure to its nearest selected structure"""
+    if len(selected) == 0:
+        return np.inf
+    nearest = np.full(len(descriptors), np.inf)
+    for pick in selected:
+        np.minimum(nearest, _distances(descriptors, descriptors[pick]), out=nearest)
+    return float(nearest.max())
+
+def load_descriptors(dataset, descriptor_file=None, rmax=6.0, nbins=60, nprocs=None, standardize=True):
+    """(DatasetIndex, descriptor matrix) for a dataset"""
+    index = DatasetIndex(dataset, nprocs)
+    if descriptor_file is not None:
+        descriptors = np.load(descriptor_file)
+        if len(descriptors) != len(index):
+            raise ValueError(f"{descriptor_file} has {len(descriptors)} rows, {dataset} has {len(index)} structures")
+    else:
+        descriptors = np.array(index.map(functools.partial(fingerprint, rmax=rmax, nbins=nbins), nprocs=nprocs))
+    if standardize:
+        scale = descriptors.std(axis=0)
+        descriptors = (descriptors - descriptors.mean(axis=0)) / np.where(scale > 0, scale, 1.0)
+    return index, descriptors
+
+def select_subset(dataset, fraction=None, count=None, method='fps', output="input.selected.data", rest=None,
+                  descriptor_file=None, seed=None, nprocs=None, standardize=True):
+    """Write the selected structures (in file order) and a selection log"""
+    index, descriptors = load_descriptors(dataset, descriptor_file, nprocs=nprocs, standardize=standardize)
+    k = count if count is not None else int(round(fraction * len(index)))
+    if k < 1:
+        raise ValueError(f"Selecting {k} of {len(index)} structures, use a larger fraction or count")
+    if method == 'fps':
+        selected, radius = farthest_point_sampling(descriptors, k, seed=seed)
+    else:
+        selected, radius = kmeanspp_sampling(descriptors, k, seed=seed)
+
+    index.extract(selected, output)
+    if rest is not None:
+        index.extract(np.setdiff1d(np.arange(len(index)), selected), rest)
+    log = output + '.selection'
+    np.savetxt(log, np.column_stack([np.arange(len(selected)), selected, radius]), fmt=['%d', '%d', '%.6g'],
+               header="pick original_index distance_to_earlier_picks")
+
+    print(f"[✓] Selected {len(selected)} of {len(index)} structures with {method}")
+    if len(selected) < k:
+        print(f"[!] Only {len(selected)} distinct structures, the remaining ones duplicate selected ones")
+    print(f"[✓] Coverage radius (largest distance of any structure to the subset): "
+          f"{coverage_radius(descriptors, selected):.4g}")
+    print(f"[✓] Pick order written to {log}")
+    return selected
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Select a diverse training subset of an n2p2 dataset")
+    parser.add_argument("dataset", help="n2p2 input.data")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--fraction", type=float, help="Fraction of structures to keep")
+    group.add_argument("--count", type=int, help="Number of structures to keep")
+    parser.add_argument("--method", choices=["fps", "kmeans++"], default="fps")
+    parser.add_argument("-o", "--output", default="input.selected.data")
+    parser.add_argument("--rest", default=None, help="Also write the structures that were not selected")
+    parser.add_argument("--descriptors", default=None, help="Precomputed (N, d) descriptor array (.npy)")
+    parser.add_argument("--no-standardize", action="store_true", help="Use descriptors without z-scoring")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--nprocs", type=int, default=None)
+    args = parser.parse_args()
+
+    select_subset(args.dataset, args.fraction, args.count, args.method, args.output, args.rest,
+                  args.descriptors, args.seed, args.nprocs, not args.no_standardize)
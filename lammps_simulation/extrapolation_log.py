@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Streaming analysis of n2p2 extrapolation warnings in LAMMPS logs
+
+With pair_style hdnnp ... showew yes showewsum N maxew M every warning is a line
+
+### NNP EXTRAPOLATION WARNING ### STRUCTURE: <step> ATOM: <id> ELEMENT: Ar SYMFUNC: <sf> TYPE: <t> VALUE: ... MIN: ... MAX: ...
+
+and every N steps a '### NNP EW SUMMARY ### TS: ... EW ... EWPERSTEP ...' line.
+The log (or captured screen output) is read in large byte blocks (optionally by
+several worker processes), warning lines are found and cut into their
+fixed-width fields with array operations on the raw bytes, and only running
+sums are kept: per symmetry function, per timestep
+window (also split by function) and per atom. The raw lines are never stored,
+so multi-GB logs are summarized in one pass. Excess is relative to the
+scaling.data range, (G - sf_max) / (sf_max - sf_min), as in
+check_extrapolation.py.
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import numpy as np
+from symmetry_functions import SymmetryFunctions, read_scaling, describe
+
+WARNING = re.compile(rb"STRUCTURE:\s*(\d+)\s+ATOM:\s*(\d+)\s+ELEMENT:\s*\S+\s+SYMFUNC:\s*(\d+)\s+TYPE:\s*\d+\s+"
+                     rb"VALUE:\s*(\S+)\s+MIN:\s*(\S+)\s+MAX:\s*(\S+)")
+SUMMARY = re.compile(rb"### NNP EW SUMMARY ### TS:\s*(\d+)\s+EW\s+(\d+)\s+EWPERSTEP\s+(\S+)")
+
+def _grow(array, size):
+    if size <= array.shape[0]:
+        return array
+    grown = np.zeros((max(size, 2 * array.shape[0]),) + array.shape[1:], dtype=array.dtype)
+    grown[:array.shape[0]] = array
+    return grown
+
+class WarningStatistics:
+    """Running per-function, per-window and per-atom sums of extrapolation warnings"""
+
+    def __init__(self, sf_min, sf_max, window=1000):
+        self.sf_min, self.sf_max = np.asarray(sf_min), np.asarray(sf_max)
+        self.span = np.where(self.sf_max > self.sf_min, self.sf_max - self.sf_min, 1.0)
+        self.nsf = len(self.sf_min)
+        self.window = window
+        self.count_below = np.zeros(self.nsf, np.int64)
+        self.count_above = np.zeros(self.nsf, np.int64)
+        self.max_excess = np.zeros(self.nsf)
+        self.sum_excess = np.zeros(self.nsf)
+        self.window_counts = np.zeros((0, self.nsf), np.int64)
+        self.window_max = np.zeros(0)
+        self.atom_counts = np.zeros(0, np.int64)
+        self.atom_max = np.zeros(0)
+        self.step_counts = {}
+        self.summary_steps, self.summary_ew = [], []
+        self.first_step = None
+        self.total = 0
+        self.errors = []
+
+    def add(self, steps, atoms, functions, values):
+        """Accumulate one block of warnings (sf indices 1-based as in the log)"""
+        k = functions - 1
+        if k.max() >= self.nsf:
+            raise ValueError(f"Symmetry function {k.max() + 1} in the log, scaling.data has {self.nsf}")
+        below = values < self.sf_min[k]
+        excess = np.where(below, self.sf_min[k] - values, values - self.sf_max[k]) / self.span[k]
+        excess = np.maximum(excess, 0.0)
+        self.total += len(values)
+        self.first_step = int(steps.min()) if self.first_step is None else min(self.first_step, int(steps.min()))
+
+        self.count_below += np.bincount(k[below], minlength=self.nsf)
+        self.count_above += np.bincount(k[~below], minlength=self.nsf)
+        self.sum_excess += np.bincount(k, excess, minlength=self.nsf)
+        np.maximum.at(self.max_excess, k, excess)
+
+        windows = steps // self.window
+        size = int(windows.max()) + 1
+        self.window_counts, self.window_max = _grow(self.window_counts, size), _grow(self.window_max, size)
+        flat = np.bincount(windows * self.nsf + k, minlength=size * self.nsf).reshape(size, self.nsf)
+        self.window_counts[:size] += flat
+        np.maximum.at(self.window_max, windows, excess)
+
+        size = int(atoms.max()) + 1
+        self.atom_counts, self.atom_max = _grow(self.atom_counts, size), _grow(self.atom_max, size)
+        self.atom_counts[:size] += np.bincount(atoms, minlength=size)
+        np.maximum.at(self.atom_max, atoms, excess)
+
+        unique, counts = np.unique(steps, return_counts=True)
+        for step, count in zip(unique.tolist(), counts.tolist()):
+            self.step_counts[step] = self.step_counts.get(step, 0) + count
+
+PREFIX = b"### NNP EXTRAPOLATION WARNING"
+
+def _integers(buf, starts, first, last):
+    """Right-aligned integer field at columns first:last of the lines starting at starts"""
+    digits = buf[starts[:, None] + np.arange(first, last)] - np.uint8(48)
+    digits = np.where(digits < 10, digits, 0).astype(np.int64)
+    return digits @ 10**np.arange(last - first - 1, -1, -1, dtype=np.int64)
+
+def _floats(buf, starts, first, last):
+    """%E field at columns first:last; lines that do not fit the d.dddE+dd pattern are parsed one by one"""
+    field = np.ascontiguousarray(buf[starts[:, None] + np.arange(first, last)])
+    width = last - first
+    e = width - 4
+    digits = field.astype(np.int64) - 48
+    if e >= 6:
+        regular = (field[:, e] == ord('E')) & (field[:, e - 4] == ord('.'))
+        mantissa = digits[:, e - 5] + (digits[:, e - 3:e] @ np.array([100, 10, 1])) / 1000.0
+        exponent = digits[:, e + 2] * 10 + digits[:, e + 3]
+        exponent = np.where(field[:, e + 1] == ord('-'), -exponent, exponent)
+        values = np.where(field[:, e - 6] == ord('-'), -mantissa, mantissa) * 10.0**exponent
+    else:
+        regular = np.zeros(len(field), dtype=bool)
+        values = np.zeros(len(field))
+    if not regular.all():
+        values[~regular] = field[~regular].view(f'S{width}').ravel().astype(float)
+    return values
+
+def parse_block(block):
+    """(steps, atom ids, sf indices, values) of all warning lines in a block of whole lines
+
+    Lines with the layout of the first warning line (same length, labels at the same columns) are cut
+    into fixed-width fields with array operations; the few lines with other field widths (e.g. a
+    timestep that outgrew the %6zu of STRUCTURE) go through the regex.
+    """
+    buf = np.frombuffer(block, np.uint8)
+    ends = np.flatnonzero(buf == 10)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    candidates = np.flatnonzero(ends - starts >= len(PREFIX))
+    prefix = np.frombuffer(PREFIX, np.uint8)
+    warning = candidates[(buf[starts[candidates, None] + np.arange(len(prefix))] == prefix).all(axis=1)]
+    if not len(warning):
+        return None
+
+    template = block[starts[warning[0]]:ends[warning[0]]]
+    match = WARNING.search(template)
+    lengths = ends[warning] - starts[warning]
+    same = lengths == len(template)
+    for label in (b"ATOM:", b"SYMFUNC:", b"VALUE:"):
+        column = template.find(label)
+        same[same] &= (buf[starts[warning[same], None] + np.arange(column, column + len(label))] ==
+                       np.frombuffer(label, np.uint8)).all(axis=1)
+    fast = starts[warning[same]]
+    columns = [(template.rfind(b':', 0, match.start(k)) + 1, match.end(k)) for k in (1, 2, 3, 4)]
+    steps, atoms, functions = (_integers(buf, fast, *columns[k]) for k in range(3))
+    values = _floats(buf, fast, *columns[3])
+
+    others = [WARNING.search(block, starts[k], ends[k]) for k in warning[~same]]
+    others = [m.groups()[:4] for m in others if m]
+    if others:
+        table = np.array(others)
+        steps = np.concatenate([steps, table[:, 0].astype(np.int64)])
+        atoms = np.concatenate([atoms, table[:, 1].astype(np.int64)])
+        functions = np.concatenate([functions, table[:, 2].astype(np.int64)])
+        values = np.concatenate([values, table[:, 3].astype(float)])
+    return steps, atoms, functions, values
+
+def _scan_range(task):
+    """Parse the whole lines that start in [begin, end) of a file (runs in a worker process)"""
+    filename, begin, end = task
+    with open(filename, 'rb') as f:
+        if begin > 0:
+            # a line belongs to the range its first byte is in
+            f.seek(begin - 1)
+            f.readline()
+        position = f.tell()
+        block = f.read(max(end - position, 0))
+        if block and not block.endswith(b'\n'):
+            block += f.readline()
+    if block and not block.endswith(b'\n'):
+        block += b'\n'
+    summaries = [(int(step), int(ew)) for step, ew, _ in SUMMARY.findall(block)]
+    errors = []
+    index = block.find(b"ERROR")
+    while index >= 0:
+        line = block[block.rfind(b'\n', 0, index) + 1:block.find(b'\n', index)]
+        if b"xtrapolation" in line:
+            errors.append(line.decode(errors='replace'))
+        index = block.find(b"ERROR", index + 1)
+    return parse_block(block), summaries, errors
+
+def scan_log(filename, statistics, chunk_bytes=64 * 1024 * 1024, nprocs=1):
+    """Feed every warning and EW summary line of a log into statistics, one block at a time"""
+    size = os.path.getsize(filename)
+    tasks = [(filename, begin, min(begin + chunk_bytes, size)) for begin in range(0, size, chunk_bytes)]
+    pool = multiprocessing.Pool(nprocs) if nprocs > 1 else None
+    results = pool.imap(_scan_range, tasks) if pool else map(_scan_range, tasks)
+    try:
+        for parsed, summaries, errors in results:
+            if parsed is not None:
+                statistics.add(*parsed)
+            for step, ew in summaries:
+                statistics.summary_steps.append(step)
+                statistics.summary_ew.append(ew)
+            statistics.errors.extend(errors)
+    finally:
+        if pool:
+            pool.close()
+    return statistics
+
+def write_tables(statistics, functions, prefix="ew", top_steps=50):
+    s = statistics
+    with open(f"{prefix}_functions.dat", 'w') as f:
+        f.write("# sf_index count_below count_above mean_excess max_excess sf_min sf_max description\n")
+        for k in range(s.nsf):
+            count = s.count_below[k] + s.count_above[k]
+            f.write(f"{k + 1} {s.count_below[k]} {s.count_above[k]} {s.sum_excess[k] / max(count, 1):.6g} "
+                    f"{s.max_excess[k]:.6g} {s.sf_min[k]:.8e} {s.sf_max[k]:.8e} {describe(functions[k])}\n")
+
+    used = np.flatnonzero(s.window_counts.sum(axis=1))
+    np.savetxt(f"{prefix}_windows.dat",
+               np.column_stack([used * s.window, s.window_counts[used].sum(axis=1), s.window_max[used],
+                                s.window_counts[used]]),
+               fmt=['%d', '%d', '%.6g'] + ['%d'] * s.nsf,
+               header=f"window_start_step warnings max_excess counts_sf1..sf{s.nsf} (window {s.window} steps)")
+
+    atoms = np.flatnonzero(s.atom_counts)
+    np.savetxt(f"{prefix}_atoms.dat", np.column_stack([atoms, s.atom_counts[atoms], s.atom_max[atoms]]),
+               fmt=['%d', '%d', '%.6g'], header="atom_id warnings max_excess")
+
+    # timesteps with the most warnings: configurations to extract from the dump for retraining
+    worst = sorted(s.step_counts.items(), key=lambda item: -item[1])[:top_steps]
+    np.savetxt(f"{prefix}_timesteps.dat", np.array(worst, dtype=np.int64).reshape(-1, 2), fmt='%d',
+               header="TimeStep warnings (most first)")
+
+def report(statistics, functions, top=10):
+    s = statistics
+    total = s.count_below + s.count_above
+    print(f"Extrapolation warnings: {s.total} in {len(s.step_counts)} timesteps "
+          f"({len(np.flatnonzero(s.atom_counts))} distinct atoms), first at step {s.first_step}")
+    if s.summary_steps:
+        print(f"EW summary lines: {len(s.summary_steps)}, last TS {s.summary_steps[-1]} EW {s.summary_ew[-1]}")
+    for line in s.errors:
+        print(f"[!] {line.strip()}")
+    if not s.total:
+        return
+    # weight counts by how far outside the range they go: what the training data misses most
+    importance = s.sum_excess
+    print(f"Functions needing more training data (top {top} by summed excess):")
+    for k in np.argsort(-importance)[:top]:
+        if total[k] == 0:
+            break
+        side = "above" if s.count_above[k] >= s.count_below[k] else "below"
+        print(f"  sf {k + 1:3d} {describe(functions[k]):45s} {total[k]:9d} warnings, mostly {side}, "
+              f"mean excess {s.sum_excess[k] / total[k]:.3g}, max {s.max_excess[k]:.3g}")
+    worst = sorted(s.step_counts.items(), key=lambda item: -item[1])[:top]
+    print("Timesteps with most warnings: " + ", ".join(f"{step} ({count})" for step, count in worst))
+    windows = s.window_counts.sum(axis=1)
+    busiest = int(np.argmax(windows))
+    print(f"Busiest window: steps {busiest * s.window}-{(busiest + 1) * s.window - 1}, {windows[busiest]} warnings, "
+          f"max excess {s.window_max[busiest]:.3g}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize n2p2 extrapolation warnings from LAMMPS logs")
+    parser.add_argument("logs", nargs="+", help="log.lammps or captured screen output (showew yes)")
+    parser.add_argument("--input-nn", default="input.nn")
+    parser.add_argument("--scaling", default="scaling.data")
+    parser.add_argument("--window", type=int, default=1000, help="Timestep window for the time series")
+    parser.add_argument("--prefix", default="ew", help="Prefix of the output tables")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--chunk-mb", type=int, default=64)
+    parser.add_argument("--nprocs", type=int, default=1, help="Worker processes parsing blocks in parallel")
+    args = parser.parse_args()
+
+    functions = SymmetryFunctions.from_input_nn(args.input_nn).functions
+    sf_min, sf_max, _, _ = read_scaling(args.scaling)
+    statistics = WarningStatistics(sf_min, sf_max, args.window)
+    for log in args.logs:
+        scan_log(log, statistics, args.chunk_mb * 1024 * 1024, args.nprocs)
+    report(statistics, functions, args.top)
+    write_tables(statistics, functions, args.prefix)
+    print(f"Tables written to {args.prefix}_functions.dat, {args.prefix}_windows.dat, {args.prefix}_atoms.dat, "
+          f"{args.prefix}_timesteps.dat")
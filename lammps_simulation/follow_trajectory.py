@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Follow a LAMMPS dump file while the run is still writing it (dump_modify append yes)
+and update running RDF, MSD and temperature estimates from every new complete frame
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+
+from blocking import OnlineBlocking, format_result
+
+# LAMMPS metal units
+KB_METAL = 8.617333262e-5      # Boltzmann constant (eV/K)
+MVV2E_METAL = 1.0364269e-4     # mass*velocity^2 -> energy, (g/mol)(A/ps)^2 -> eV
+AR_MASS = 39.948
+
+def parse_frame(header_lines, atom_block):
+    """Parse one dump frame from its 9 header lines and the raw bytes of its atom lines"""
+    timestep = int(header_lines[1])
+    natoms = int(header_lines[3])
+    box = []
+    for line in header_lines[5:8]:
+        bounds = line.split()
+        box.append([float(bounds[0]), float(bounds[1])])
+    columns = header_lines[8].split()[2:]
+
+    atoms = np.array(atom_block.split(), dtype=float).reshape(natoms, len(columns))
+    # Dumps are not guaranteed to be sorted, analysis below relies on id order
+    if 'id' in columns:
+        atoms = atoms[np.argsort(atoms[:, columns.index('id')], kind='stable')]
+
+    return {
+        'timestep': timestep,
+        'natoms': natoms,
+        'box': box,
+        'columns': columns,
+        'atoms': atoms
+    }
+
+def split_frames(buffer):
+    """Split a byte buffer into complete frames, return (frames, number of bytes consumed)
+
+    A frame only counts as complete once all of its atom lines are newline
+    terminated, so a frame that LAMMPS is still writing is left in the buffer.
+    """
+    frames = []
+    newlines = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == 10)
+    consumed = 0
+    line = 0   # index into newlines of the first line of the current frame
+
+    while line + 9 <= len(newlines):
+        start = consumed
+        header_end = newlines[line + 8] + 1
+        header = buffer[start:header_end].decode().splitlines()
+        if not header[0].startswith("ITEM: TIMESTEP"):
+            # Skip stray lines until the next frame header
+            consumed = newlines[line] + 1
+            line += 1
+            continue
+
+        natoms = int(header[3])
+        last = line + 8 + natoms
+        if last >= len(newlines):
+            break   # atom lines of this frame are not fully written yet
+
+        frames.append(parse_frame(header, buffer[header_end:newlines[last] + 1]))
+        consumed = newlines[last] + 1
+        line = last + 1
+
+    return frames, consumed
+
+class DumpFollower:
+    """Incrementally read newly appended complete frames from a growing dump file"""
+
+    def __init__(self, filename, block_size=64 * 1024 * 1024):
+        self.filename = filename
+        self.block_size = block_size
+        self.offset = 0
+        self.pending = b''
+
+    def poll(self):
+        """Return the frames completed since the last call (at most about one block of data)"""
+        if not os.path.exists(self.filename):
+            return []
+
+        size = os.path.getsize(self.filename)
+        if size < self.offset:
+            # File was truncated or replaced by a new run, start over
+            self.offset = 0
+            self.pending = b''
+
+        frames = []
+        with open(self.filename, 'rb') as f:
+            # Keep reading while only a partial frame is buffered, so frames
+            # larger than one block are still picked up in a single poll
+            while not frames and self.offset < size:
+                f.seek(self.offset)
+                data = f.read(min(self.block_size, size - self.offset))
+                if not data:
+                    break
+                self.offset += len(data)
+                frames, consumed = split_frames(self.pending + data)
+                self.pending = (self.pending + data)[consumed:]
+        return frames
+
+def iter_dump_frames(filename, block_size=64 * 1024 * 1024):
+    """Stream all complete frames of a finished dump file with bounded memory"""
+    follower = DumpFollower(filename, block_size)
+    while True:
+        frames = follower.poll()
+        if not frames:
+            break
+        yield from frames
+
+def box_lengths(frame):
+    """Orthogonal box edge lengths of a frame"""
+    return np.array([hi - lo for lo, hi in frame['box']])
+
+def get_positions(frame):
+    """Return (positions, unwrapped) using the best coordinate columns in the frame"""
+    columns = frame['columns']
+    atoms = frame['atoms']
+    lo = np.array([b[0] for b in frame['box']])
+
+    for names, unwrapped, scaled in ((('xu', 'yu', 'zu'), True, False),
+                                     (('x', 'y', 'z'), False, False),
+                                     (('xsu', 'ysu', 'zsu'), True, True),
+                                     (('xs', 'ys', 'zs'), False, True)):
+        if all(name in columns for name in names):
+            pos = atoms[:, [columns.index(name) for name in names]]
+            if scaled:
+                pos = lo + pos * box_lengths(frame)
+            return pos, unwrapped
+
+    raise ValueError(f"No coordinate columns found in dump columns {columns}")
+
+def get_velocities(frame):
+    """Return velocities (N x 3) or None if the dump has no vx vy vz columns"""
+    columns = frame['columns']
+    if not all(name in columns for name in ('vx', 'vy', 'vz')):
+        return None
+    return frame['atoms'][:, [columns.index(name) for name in ('vx', 'vy', 'vz')]]
+
+def pair_distances(positions, lengths, rmax, chunk=2048):
+    """Yield minimum-image pair distances (i < j) below rmax, chunked over rows"""
+    natoms = len(positions)
+    for start in range(0, natoms - 1, chunk):
+        stop = min(start + chunk, natoms - 1)
+        d = positions[None, :, :] - positions[start:stop, None, :]
+        d -= lengths * np.round(d / lengths)
+        r = np.sqrt(np.sum(d * d, axis=2))
+        upper = np.arange(natoms)[None, :] > np.arange(start, stop)[:, None]
+        r = r[upper]
+        yield r[r < rmax]
+
+class RunningRDF:
+    """Frame-averaged g(r) accumulated one frame at a time"""
+
+    def __init__(self, dr=0.1, rmax=10.0):
+        self.dr = dr
+        self.nbins = int(round(rmax / dr))
+        self.rmax = self.nbins * dr
+        self.r = (np.arange(self.nbins) + 0.5) * dr
+        self.gr_sum = np.zeros(self.nbins)
+        self.nframes = 0
+        self.blocking = OnlineBlocking()
+
+    def add(self, positions, lengths):
+        natoms = len(positions)
+        hist = np.zeros(self.nbins)
+        for r in pair_distances(positions, lengths, self.rmax):
+            hist += np.bincount((r / self.dr).astype(int), minlength=self.nbins)[:self.nbins]
+
+        density = natoms / np.prod(lengths)
+        edges = np.arange(self.nbins + 1) * self.dr
+        shell_volume = 4.0 / 3.0 * np.pi * (edges[1:]**3 - edges[:-1]**3)
+        # Each i<j pair counts for both atoms
+        gr = 2.0 * hist / (density * shell_volume * natoms)
+        self.gr_sum += gr
+        self.nframes += 1
+        self.blocking.add(gr)
+        return gr
+
+    def value(self):
+        if self.nframes == 0:
+            return self.r, np.zeros(self.nbins)
+        return self.r, self.gr_sum / self.nframes
+
+    def error(self):
+        """Blocking standard error of every g(r) bin (nan until there are 2 frames)"""
+        if self.nframes < 2:
+            return np.full(self.nbins, np.nan)
+        return self.blocking.result()['error']
+
+class RunningMSD:
+    """MSD relative to the first frame, unwrapping periodic coordinates if needed"""
+
+    def __init__(self):
+        self.reference = None
+        self.previous = None
+        self.unwrapped = None
+        self.timesteps = []
+        self.msd = []
+
+    def add(self, timestep, positions, lengths, unwrapped):
+        if unwrapped:
+            current = positions
+        elif self.unwrapped is None:
+            current = positions.copy()
+        else:
+            # Accumulate minimum-image displacements since the last frame
+            step = positions - self.previous
+            step -= lengths * np.round(step / lengths)
+            current = self.unwrapped + step
+        self.previous = positions
+        self.unwrapped = current
+
+        if self.reference is None:
+            self.reference = current.copy()
+        displacement = current - self.reference
+        self.timesteps.append(timestep)
+        self.msd.append(np.mean(np.sum(displacement**2, axis=1)))
+
+class RunningTemperature:
+    """Instantaneous kinetic temperature per frame from dumped velocities"""
+
+    def __init__(self, mass=AR_MASS):
+        self.mass = mass
+        self.timesteps = []
+        self.temperature = []
+        self.blocking = OnlineBlocking()
+
+    def add(self, timestep, velocities):
+        natoms = len(velocities)
+        kinetic = 0.5 * self.mass * MVV2E_METAL * np.sum(velocities**2)
+        # Same degrees of freedom as LAMMPS compute temp (3N - 3)
+        dof = max(3 * natoms - 3, 1)
+        self.timesteps.append(timestep)
+        self.temperature.append(2.0 * kinetic / (dof * KB_METAL))
+        self.blocking.add(self.temperature[-1])
+
+    def mean(self):
+        return np.mean(self.temperature) if self.temperature else float('nan')
+
+def write_table(filename, header, columns):
+    """Write columns to a text file atomically so readers never see half a snapshot"""
+    tmp = filename + '.tmp'
+    np.savetxt(tmp, np.column_stack(columns), header=header)
+    os.replace(tmp, filename)
+
+def write_snapshot(prefix, rdf, msd, temperature, dt):
+    """Write the current running RDF, MSD and temperature to text files"""
+    r, gr = rdf.value()
+    write_table(f"{prefix}_rdf.dat", f"r(A) g(r) error  [{rdf.nframes} frames]", [r, gr, rdf.error()])
+    if msd.timesteps:
+        steps = np.array(msd.timesteps)
+        write_table(f"{prefix}_msd.dat", "timestep time(ps) MSD(A^2)",
+                    [steps, steps * dt, np.array(msd.msd)])
+    if temperature.timesteps:
+        steps = np.array(temperature.timesteps)
+        write_table(f"{prefix}_temp.dat", "timestep time(ps) T(K)",
+                    [steps, steps * dt, np.array(temperature.temperature)])
+
+def follow(filename, interval=5.0, idle_timeout=600.0, snapshot_every=1, prefix='follow',
+           dt=0.001, dr=0.1, rmax=10.0, temp_alarm=None, msd_alarm=None, once=False):
+    """Watch a dump file and update running analyses until it stops growing"""
+    follower = DumpFollower(filename)
+    rdf = RunningRDF(dr=dr, rmax=rmax)
+    msd = RunningMSD()
+    temperature = RunningTemperature()
+    nframes = 0
+    last_data = time.time()
+
+    print(f"Following {filename} (poll every {interval:.1f} s)...")
+    while True:
+        frames = follower.poll()
+        for frame in frames:
+            positions, unwrapped = get_positions(frame)
+            lengths = box_lengths(frame)
+            rdf.add(positions, lengths)
+            msd.add(frame['timestep'], positions, lengths, unwrapped)
+            velocities = get_velocities(frame)
+            if velocities is not None:
+                temperature.add(frame['timestep'], velocities)
+            nframes += 1
+
+            line = f"step {frame['timestep']:>8d}: MSD = {msd.msd[-1]:.4f} A^2"
+            if temperature.temperature:
+                line += f", T = {temperature.temperature[-1]:.1f} K"
+            print(line)
+
+            if temp_alarm is not None and temperature.temperature and temperature.temperature[-1] > temp_alarm:
+                print(f"WARNING: temperature {temperature.temperature[-1]:.1f} K above {temp_alarm:.1f} K")
+            if msd_alarm is not None and msd.msd[-1] > msd_alarm:
+                print(f"WARNING: MSD {msd.msd[-1]:.3f} A^2 above {msd_alarm:.3f} A^2 - possible melting")
+
+            if snapshot_every and nframes % snapshot_every == 0:
+                write_snapshot(prefix, rdf, msd, temperature, dt)
+
+        if frames:
+            last_data = time.time()
+        elif once or time.time() - last_data > idle_timeout:
+            break
+        else:
+            time.sleep(interval)
+
+    if nframes:
+        write_snapshot(prefix, rdf, msd, temperature, dt)
+    if len(temperature.temperature) > 1:
+        print(format_result("Mean temperature", temperature.blocking.result(), unit="K"))
+    if follower.pending.strip():
+        print("Last frame is incomplete and was not analyzed")
+    print(f"Analyzed {nframes} frames, snapshots written with prefix '{prefix}'")
+    return rdf, msd, temperature
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live analysis of a LAMMPS dump that is still being written")
+    parser.add_argument("dump_file", help="LAMMPS dump file (e.g. dump_nnp.atom)")
+    parser.add_argument("--interval", type=float, default=5.0, help="Polling interval in seconds")
+    parser.add_argument("--idle-timeout", type=float, default=600.0,
+                        help="Stop after this many seconds without new frames")
+    parser.add_argument("--snapshot-every", type=int, default=1,
+                        help="Write snapshot files every N frames (0: only when following stops)")
+    parser.add_argument("--prefix", default="follow", help="Prefix for snapshot files")
+    parser.add_argument("--dt", type=float, default=0.001, help="Timestep in ps")
+    parser.add_argument("--dr", type=float, default=0.1, help="RDF bin width (A)")
+    parser.add_argument("--rmax", type=float, default=10.0, help="RDF cutoff (A)")
+    parser.add_argument("--temp-alarm", type=float, default=None, help="Warn when T exceeds this value (K)")
+    parser.add_argument("--msd-alarm", type=float, default=None, help="Warn when MSD exceeds this value (A^2)")
+    parser.add_argument("--once", action="store_true", help="Analyze the frames present now and exit")
+    args = parser.parse_args()
+    if args.snapshot_every < 0:
+        parser.error("--snapshot-every must be >= 0")
+
+    follow(args.dump_file, args.interval, args.idle_timeout, args.snapshot_every, args.prefix,
+           args.dt, args.dr, args.rmax, args.temp_alarm, args.msd_alarm, args.once)
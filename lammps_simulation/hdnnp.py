@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+NumPy evaluation of n2p2 high-dimensional neural network potentials (single element)
+
+Reads input.nn (symmetry functions, architecture, activations, scaling and
+normalization keywords), scaling.data and a weights.XXX.data file, and
+evaluates atomic energies for whole frames in one batched matrix product per
+layer. Forces are the network input gradient dE/dG (backpropagation)
+contracted with the analytic symmetry function derivatives. Several weight
+files over the same input.nn form a committee that shares one symmetry
+function evaluation.
+"""
+
+import argparse
+import time
+import numpy as np
+from symmetry_functions import SymmetryFunctions, read_input_nn, read_scaling
+
+ACTIVATIONS = {
+    'l': lambda x: x,
+    't': np.tanh,
+    's': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'p': lambda x: np.logaddexp(0.0, x),
+    'r': lambda x: np.maximum(x, 0.0),
+    'g': lambda x: np.exp(-0.5 * x * x),
+    'h': lambda x: x * x,
+}
+
+# derivatives as functions of the pre-activation x and the activation y
+DERIVATIVES = {
+    'l': lambda x, y: np.ones_like(x),
+    't': lambda x, y: 1.0 - y * y,
+    's': lambda x, y: y * (1.0 - y),
+    'p': lambda x, y: 1.0 / (1.0 + np.exp(-x)),
+    'r': lambda x, y: (x > 0.0).astype(float),
+    'g': lambda x, y: -x * y,
+    'h': lambda x, y: 2.0 * x,
+}
+
+def read_weights(filename, layer_sizes):
+    """List of (weights (n_prev, n_next), biases (n_next,)) per layer from an n2p2 weights file"""
+    layers = [(np.zeros((n_prev, n_next)), np.zeros(n_next))
+              for n_prev, n_next in zip(layer_sizes[:-1], layer_sizes[1:])]
+    count = 0
+    with open(filename, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if not parts or line.startswith('#'):
+                continue
+            value = float(parts[0])
+            if parts[1] == 'a':
+                # connection from neuron n_s of layer l_s to neuron n_e of layer l_s + 1
+                l_s, n_s, n_e = int(parts[3]), int(parts[4]), int(parts[6])
+                layers[l_s][0][n_s - 1, n_e - 1] = value
+            else:
+                # bias of neuron n_s in layer l_s
+                l_s, n_s = int(parts[3]), int(parts[4])
+                layers[l_s - 1][1][n_s - 1] = value
+            count += 1
+    expected = sum(w.size + b.size for w, b in layers)
+    if count != expected:
+        raise ValueError(f"{filename} has {count} connections, the architecture needs {expected}")
+    return layers
+
+class NeuralNetworkPotential:
+    """Energies of one n2p2 potential; G is the (atoms, functions) symmetry function matrix"""
+
+    def __init__(self, input_nn="input.nn", weights="weights.001.data", scaling="scaling.data",
+                 symmetry_functions=None):
+        settings, _ = read_input_nn(input_nn)
+        self.settings = settings
+        self.sf = symmetry_functions or SymmetryFunctions.from_input_nn(input_nn)
+        nodes = [int(n) for n in settings['global_nodes_short']]
+        self.layer_sizes = [len(self.sf)] + nodes + [1]
+        self.activations = settings['global_activation_short']
+        if len(self.activations) != len(self.layer_sizes) - 1:
+            raise ValueError("global_activation_short does not match the number of layers")
+        self.normalize_nodes = 'normalize_nodes' in settings
+        self.layers = read_weights(weights, self.layer_sizes)
+        self.offset = float(settings['atom_energy'][1]) if 'atom_energy' in settings else 0.0
+        # data set normalization written by nnp-norm (absent means physical units)
+        self.mean_energy = float(settings.get('mean_energy', ['0'])[0])
+        self.conv_energy = float(settings.get('conv_energy', ['1'])[0])
+        self.conv_length = float(settings.get('conv_length', ['1'])[0])
+        self._setup_scaling(settings, scaling)
+
+    def _setup_scaling(self, settings, scaling):
+        smin = float(settings.get('scale_min_short', ['0'])[0])
+        smax = float(settings.get('scale_max_short', ['1'])[0])
+        if 'scale_symmetry_functions_sigma' in settings:
+            self.scaling_type = 'scalesigma'
+        elif 'scale_symmetry_functions' in settings and 'center_symmetry_functions' in settings:
+            self.scaling_type = 'scalecenter'
+        elif 'scale_symmetry_functions' in settings:
+            self.scaling_type = 'scale'
+        elif 'center_symmetry_functions' in settings:
+            self.scaling_type = 'center'
+        else:
+            self.scaling_type = 'none'
+        self.smin, self.smax = smin, smax
+        if self.scaling_type != 'none':
+            self.gmin, self.gmax, self.gmean, self.gsigma = read_scaling(scaling)
+
+    def scale_factor(self):
+        """d Gs / d G of the input scaling"""
+        if self.scaling_type in ('none', 'center'):
+            return 1.0
+        if self.scaling_type == 'scalesigma':
+            return (self.smax - self.smin) / self.gsigma
+        return (self.smax - self.smin) / (self.gmax - self.gmin)
+
+    def scale(self, G):
+        """Symmetry function values as seen by the network input layer"""
+        if self.scaling_type == 'none':
+            return G
+        if self.scaling_type == 'center':
+            return G - self.gmean
+        if self.scaling_type == 'scale':
+            return self.smin + (self.smax - self.smin) * (G - self.gmin) / (self.gmax - self.gmin)
+        if self.scaling_type == 'scalecenter':
+            return self.smin + (self.smax - self.smin) * (G - self.gmean) / (self.gmax - self.gmin)
+        return self.smin + (self.smax - self.smin) * (G - self.gmean) / self.gsigma
+
+    def forward(self, G, keep_layers=False):
+        """Network output (atoms,) in network units; with keep_layers also the per-layer activations"""
+        values = self.scale(G)
+        stored = [values]
+        for (weights, biases), activation in zip(self.layers, self.activations):
+            x = values @ weights + biases
+            if self.normalize_nodes:
+                x = x / weights.shape[0]
+            values = ACTIVATIONS[activation](x)
+            stored.append((x, values))
+        return (values[:, 0], stored) if keep_layers else values[:, 0]
+
+    def input_gradient(self, G):
+        """(atomic energies in eV, dE_i / dG_i of shape (atoms, functions))"""
+        output, stored = self.forward(G, keep_layers=True)
+        upstream = np.full((len(G), 1), 1.0 / self.conv_energy)
+        for (weights, _), activation, (x, y) in zip(self.layers[::-1], self.activations[::-1], stored[:0:-1]):
+            delta = upstream * DERIVATIVES[activation](x, y)
+            if self.normalize_nodes:
+                delta = delta / weights.shape[0]
+            upstream = delta @ weights.T
+        return output / self.conv_energy, upstream * self.scale_factor()
+
+    def atomic_energies(self, G):
+        """Atomic energy contributions in eV (no mean energy or offset added, like nnatoms.out)"""
+        return self.forward(G) / self.conv_energy
+
+    def energy(self, G):
+        """Total energy in eV of the atoms whose symmetry functions are given"""
+        natoms = len(G)
+        return self.atomic_energies(G).sum() + natoms * (self.mean_energy + self.offset)
+
+    def neighbors(self, positions, cell, origin=None, pbc=(True, True, True)):
+        """Neighbor list in network length units"""
+        origin = None if origin is None else np.asarray(origin) * self.conv_length
+        return self.sf.neighbors(np.asarray(positions) * self.conv_length, np.asarray(cell) * self.conv_length,
+                                 origin, pbc)
+
+    def symmetry_functions(self, positions, cell, origin=None, pbc=(True, True, True), neighbors=None):
+        neighbors = neighbors if neighbors is not None else self.neighbors(positions, cell, origin, pbc)
+        return self.sf.compute(positions, None, neighbors=neighbors)
+
+    def energy_and_forces(self, positions, cell, origin=None, pbc=(True, True, True), G=None, neighbors=None):
+        """(total energy in eV, atomic energies, forces in eV/Angstrom)"""
+        neighbors = neighbors if neighbors is not None else self.neighbors(positions, cell, origin, pbc)
+        G = G if G is not None else self.sf.compute(positions, None, neighbors=neighbors)
+        atomic, dEdG = self.input_gradient(G)
+        forces = -self.sf.gradient(dEdG, neighbors, len(G)) * self.conv_length
+        return atomic.sum() + len(G) * (self.mean_energy + self.offset), atomic, forces
+
+class Committee:
+    """Several weight sets of one input.nn evaluated on the same symmetry functions"""
+
+    def __init__(self, input_nn="input.nn", weights=("weights.001.data",), scaling="scaling.data"):
+        sf = SymmetryFunctions.from_input_nn(input_nn)
+        self.models = [NeuralNetworkPotential(input_nn, w, scaling, sf) for w in weights]
+        self.sf = sf
+
+    def input_gradient(self, G):
+        """(models, atoms) atomic energies and (models, atoms, functions) dE_i / dG_i"""
+        return tuple(np.array(column) for column in zip(*(model.input_gradient(G) for model in self.models)))
+
+    def atomic_energies(self, G):
+        """(models, atoms) atomic energies"""
+        return np.array([model.atomic_energies(G) for model in self.models])
+
+    def energies(self, G):
+        """(models,) total energies"""
+        return np.array([model.energy(G) for model in self.models])
+
+    def energies_and_forces(self, positions, cell, origin=None, pbc=(True, True, True)):
+        """(models,) energies, (models, atoms) atomic energies and (models, atoms, 3) forces"""
+        first = self.models[0]
+        neighbors = first.neighbors(positions, cell, origin, pbc)
+        G = first.symmetry_functions(positions, cell, neighbors=neighbors)
+        results = [model.energy_and_forces(positions, cell, G=G, neighbors=neighbors) for model in self.models]
+        return tuple(np.array(column) for column in zip(*results))
+
+def fcc_lattice(n, lattice_param):
+    """(positions, cell) of an n x n x n FCC supercell"""
+    from create_proper_system import LATTICES, lattice_positions
+    basis, _ = LATTICES['fcc']
+    positions = lattice_positions(basis, lattice_param, (n, n, n), 0, n**3)
+    return positions, np.diag([n * lattice_param] * 3)
+
+def benchmark(model, sizes=(3, 4, 6, 8), lattice_param=4.45, displacement=0.05, repeats=3, seed=0):
+    """Energy and force throughput (atoms per second) on thermally displaced FCC supercells"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n in sizes:
+        positions, cell = fcc_lattice(n, lattice_param)
+        positions = positions + rng.normal(0.0, displacement, positions.shape)
+        timings = {'energy': [], 'forces': []}
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            model.energy(model.symmetry_functions(positions, cell))
+            t1 = time.perf_counter()
+            model.energy_and_forces(positions, cell)
+            t2 = time.perf_counter()
+            timings['energy'].append(t1 - t0)
+            timings['forces'].append(t2 - t1)
+        natoms = len(positions)
+        rows.append((natoms, natoms / min(timings['energy']), natoms / min(timings['forces'])))
+        print(f"{natoms:8d} atoms: energy {rows[-1][1]:10.0f} atoms/s, energy + forces {rows[-1][2]:10.0f} atoms/s")
+    return rows
+
+def compare_with_n2p2(model, dataset, energy_file=None, forces_file=None):
+    """Maximum deviations from n2p2 energy.comp/energy.out and nnforces.out for the structures of dataset"""
+    from convert_structure import iter_structures
+    ref_energy, ref_forces = {}, {}
+    if energy_file is not None:
+        # conf natoms Eref Ennp ... (energy.comp and energy.out share the first four columns)
+        for row in np.loadtxt(energy_file, comments='#', ndmin=2):
+            ref_energy[int(row[0])] = row[3]
+    if forces_file is not None:
+        data = np.loadtxt(forces_file, comments='#', ndmin=2)
+        for conf in np.unique(data[:, 0]).astype(int):
+            rows = data[data[:, 0] == conf]
+            ref_forces[conf] = rows[np.argsort(rows[:, 1]), 5:8]
+
+    max_de, max_df = 0.0, 0.0
+    for index, structure in iter_structures(dataset):
+        conf = index + 1
+        if conf not in ref_energy and conf not in ref_forces:
+            continue
+        positions = structure['positions']
+        energy, _, forces = model.energy_and_forces(positions, structure['lattice'])
+        if conf in ref_energy:
+            max_de = max(max_de, abs(energy - ref_energy[conf]) / len(positions))
+        if conf in ref_forces:
+            max_df = max(max_df, np.abs(forces - ref_forces[conf]).max())
+    return max_de, max_df
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--input-nn", default="input.nn")
+    common.add_argument("--weights", nargs="+", default=["weights.001.data"])
+    common.add_argument("--scaling", default="scaling.data")
+    parser = argparse.ArgumentParser(description="Evaluate n2p2 potentials without n2p2")
+    subparsers = parser.add_subparsers(dest="command")
+
+    p = subparsers.add_parser("evaluate", parents=[common], help="Energy and forces of a LAMMPS data file")
+    p.add_argument("structure", help="LAMMPS data file (orthogonal box)")
+    p.add_argument("--forces", default=None, help="Write forces to this file")
+
+    p = subparsers.add_parser("compare", parents=[common], help="Compare with nnp-predict/nnp-dataset outputs")
+    p.add_argument("dataset", help="n2p2 input.data the outputs were computed for")
+    p.add_argument("--energy", default="energy.comp", help="energy.comp or energy.out")
+    p.add_argument("--nnforces", default="nnforces.out")
+
+    p = subparsers.add_parser("benchmark", parents=[common], help="Throughput on FCC supercells")
+    p.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 6, 8], help="Supercell repetitions")
+    p.add_argument("--lattice-param", type=float, default=4.45)
+    p.add_argument("--repeats", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        raise SystemExit(1)
+    committee = Committee(args.input_nn, args.weights, args.scaling)
+
+    if args.command == "evaluate":
+        from create_small_system import read_atoms
+        ids, _, positions, box = read_atoms(args.structure)
+        energies, _, forces = committee.energies_and_forces(positions, np.diag(box[:, 1] - box[:, 0]), box[:, 0])
+        for weights, energy in zip(args.weights, energies):
+            print(f"{weights}: E = {energy:.8f} eV ({energy / len(positions):.8f} eV/atom)")
+        if args.forces:
+            np.savetxt(args.forces, np.column_stack([ids, forces[0]]), fmt=['%d', '%.10e', '%.10e', '%.10e'],
+                       header=f"id fx fy fz (eV/Angstrom, {args.weights[0]})")
+            print(f"Forces written to {args.forces}")
+    elif args.command == "compare":
+        for weights, model in zip(args.weights, committee.models):
+            max_de, max_df = compare_with_n2p2(model, args.dataset, args.energy, args.nnforces)
+            print(f"{weights}: max |dE| {max_de:.3e} eV/atom, max |dF| {max_df:.3e} eV/Angstrom")
+    elif args.command == "benchmark":
+        for weights, model in zip(args.weights, committee.models):
+            print(f"{weights}:")
+            benchmark(model, args.sizes, args.lattice_param, repeats=args.repeats)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+LAMMPS log parser and performance history
+
+Reads a log.lammps line by line and yields one record per run command: the
+thermo table as arrays (one per column), Loop time, the Performance line,
+CPU use, the MPI task timing breakdown (Pair/Neigh/Comm/Output/Modify/Other)
+and the neighbor statistics. Runs can be appended to a JSON-lines history
+keyed by input script, atom count, symmetry function set and weights hash, and
+every new run is compared with the last run of the same input script and atom
+count to flag throughput regressions.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+import numpy as np
+
+LOOP = re.compile(r"Loop time of ([\d.eE+-]+) on (\d+) procs for (\d+) steps with (\d+) atoms")
+PERFORMANCE = re.compile(r"Performance:(.*)")
+CPU = re.compile(r"([\d.]+)% CPU use with (\d+) MPI tasks x (\d+) OpenMP threads")
+SECTION = re.compile(r"^(Pair|Bond|Kspace|Neigh|Comm|Output|Modify|Other)\s*\|(.*)$")
+STATS = re.compile(r"^(Nlocal|Nghost|Neighs|FullNghs):\s+([\d.eE+-]+) ave\s+([\d.eE+-]+) max\s+([\d.eE+-]+) min")
+COUNTS = {
+    'Total # of neighbors': 'total_neighbors',
+    'Ave neighs/atom': 'neighbors_per_atom',
+    'Neighbor list builds': 'neighbor_builds',
+    'Dangerous builds': 'dangerous_builds',
+}
+
+def _performance(text):
+    """Performance line values: ns/day, hours/ns, timesteps/s (tau/day etc. for other unit styles)"""
+    values = {}
+    for value, unit in re.findall(r"([\d.eE+-]+) ([\w/%]+)", text):
+        values[unit.replace('/', '_per_').replace('%', 'percent_')] = float(value)
+    return values
+
+def _thermo(header, rows):
+    columns = np.array(rows, dtype=float).reshape(-1, len(header))
+    return {name: columns[:, k] for k, name in enumerate(header)}
+
+def iter_runs(filename):
+    """Yield a dict per run section of a LAMMPS log, reading one line at a time"""
+    settings = {}
+    run = None
+    header, rows = None, []
+    with open(filename, 'r', errors='replace') as f:
+        for line in f:
+            stripped = line.strip()
+            words = stripped.split()
+            # commands echoed into the log
+            if words and words[0] in ('units', 'pair_style', 'pair_coeff', 'timestep', 'run', 'minimize'):
+                if words[0] in ('run', 'minimize'):
+                    # runs with 'post no' end without the neighbor statistics
+                    if run is not None and 'loop_time' in run:
+                        yield run
+                    run ={'command': stripped, 'settings': dict(settings), 'thermo': {}, 'breakdown': {}}
+                else:
+                    settings[words[0]] = ' '.join(words[1:])
+                continue
+            if run is None:
+                if stripped.startswith('LAMMPS ('):
+                    settings['version'] = stripped
+                continue
+            if words and words[0] == 'Step':
+                header, rows = words, []
+                continue
+            if header is not None:
+                match = LOOP.match(stripped)
+                if match:
+                    run['thermo'] = _thermo(header, rows)
+                    header = None
+                    run['loop_time'] = float(match.group(1))
+                    run['procs'], run['steps'], run['atoms'] = (int(match.group(k)) for k in (2, 3, 4))
+                    continue
+                if len(words) == len(header):
+                    try:
+                        rows.append([float(word) for word in words])
+                    except ValueError:
+                        pass
+                continue
+            match = PERFORMANCE.match(stripped)
+            if match:
+                run['performance'] = _performance(match.group(1))
+                continue
+            match = CPU.match(stripped)
+            if match:
+                run['cpu_use'] = float(match.group(1))
+                run['mpi_tasks'], run['omp_threads'] = int(match.group(2)), int(match.group(3))
+                continue
+            match = SECTION.match(stripped)
+            if match:
+                fields = [field.strip() for field in match.group(2).split('|')]
+                values = [float(field) if field else None for field in fields]
+                run['breakdown'][match.group(1)] = dict(zip(['min', 'avg', 'max', 'varavg', 'total'], values))
+                continue
+            match = STATS.match(stripped)
+            if match:
+                run[match.group(1).lower()] = {'ave': float(match.group(2)), 'max': float(match.group(3)),
+                                               'min': float(match.group(4))}
+                continue
+            for label, key in COUNTS.items():
+                if stripped.startswith(label):
+                    run[key] = float(stripped.split('=')[1])
+                    if key == 'dangerous_builds':
+                        # last line of a run section
+                        yield run
+                        run = None
+                    break
+    if run is not None and 'loop_time' in run:
+        yield run
+
+def file_sha1(paths):
+    """SHA-1 over the contents of the files (sorted by name), None if there are none"""
+    paths = sorted(p for p in paths if os.path.isfile(p))
+    if not paths:
+        return None
+    sha1 = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            sha1.update(f.read())
+    return sha1.hexdigest()
+
+def potential_directory(run, log_directory):
+    """Directory of input.nn / weights for a run (pair_style hdnnp ... dir <path>, else the log directory)"""
+    words = run['settings'].get('pair_style', '').split()
+    if 'dir' in words and words.index('dir') + 1 < len(words):
+        return os.path.join(log_directory, words[words.index('dir') + 1].strip('"\''))
+    return log_directory
+
+def symfunc_hash(input_nn):
+    """SHA-1 of the symfunction_short lines of input.nn (whitespace-normalized), None if it does not exist"""
+    if not os.path.isfile(input_nn):
+        return None
+    with open(input_nn, 'r') as f:
+        lines = [' '.join(line.split('#')[0].split()) for line in f if line.split('#')[0].strip()]
+    symfuncs = sorted(line for line in lines if line.startswith('symfunction_short'))
+    return hashlib.sha1('\n'.join(symfuncs).encode()).hexdigest()
+
+def run_record(run, log, input_script=None, label=None):
+    """Flat JSON record of a run's timings and the keys it is compared by"""
+    directory = os.path.dirname(os.path.abspath(log))
+    potential = potential_directory(run, directory)
+    hdnnp = run['settings'].get('pair_style', '').startswith(('hdnnp', 'nnp'))
+    breakdown = {section: values['total'] for section, values in run['breakdown'].items()}
+    record = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'label': label,
+        'log': os.path.abspath(log),
+        'input_script': os.path.basename(input_script) if input_script else None,
+        'input_sha1': file_sha1([input_script]) if input_script else None,
+        'atoms': run['atoms'],
+        'procs': run['procs'],
+        'omp_threads': run.get('omp_threads'),
+        'pair_style': run['settings'].get('pair_style'),
+        'symfunc_sha1': symfunc_hash(os.path.join(potential, 'input.nn')) if hdnnp else None,
+        'weights_sha1': file_sha1(glob.glob(os.path.join(potential, 'weights.*.data'))) if hdnnp else None,
+        'steps': run['steps'],
+        'loop_time': run['loop_time'],
+        'timesteps_per_s': run.get('performance', {}).get('timesteps_per_s'),
+        'ns_per_day': run.get('performance', {}).get('ns_per_day'),
+        'cpu_use': run.get('cpu_use'),
+        'breakdown_percent': breakdown,
+        'neighbors_per_atom': run.get('neighbors_per_atom'),
+        'neighbor_builds': run.get('neighbor_builds'),
+        'dangerous_builds': run.get('dangerous_builds'),
+    }
+    # atom-steps per second per core, comparable across system sizes and core counts
+    cores = run['procs'] * (run.get('omp_threads') or 1)
+    record['atom_steps_per_core_s'] = run['steps'] * run['atoms'] / (run['loop_time'] * cores) if run['loop_time'] else None
+    return record
+
+def read_history(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def check_regression(record, history):
+    """Compare with the last run of the same input script, atom count and procs; (previous, relative change, changes)"""
+    same = [r for r in history if (r['input_script'], r['atoms'], r['procs']) ==
+            (record['input_script'], record['atoms'], record['procs'])]
+    if not same or not same[-1].get('timesteps_per_s') or not record.get('timesteps_per_s'):
+        return None, None, []
+    previous = same[-1]
+    change = record['timesteps_per_s'] / previous['timesteps_per_s'] - 1.0
+    changed = [key for key in ('input_sha1', 'symfunc_sha1', 'weights_sha1', 'pair_style', 'omp_threads')
+               if record.get(key) != previous.get(key)]
+    return previous, change, changed
+
+def record_runs(log, history_file="perf_history.jsonl", input_script=None, label=None, tolerance=0.05):
+    """Append every run of a log to the history; returns the number of regressions beyond tolerance"""
+    history = read_history(history_file)
+    regressions = 0
+    with open(history_file, 'a') as f:
+        for run in iter_runs(log):
+            record = run_record(run, log, input_script, label)
+            previous, change, changed = check_regression(record, history)
+            f.write(json.dumps(record) + '\n')
+            history.append(record)
+            print(f"[✓] {record['input_script'] or os.path.basename(log)}: {record['atoms']} atoms, "
+                  f"{record['timesteps_per_s']} timesteps/s, {record['ns_per_day']} ns/day, "
+                  f"Pair {record['breakdown_percent'].get('Pair', float('nan')):.1f}%")
+            if previous is None:
+                continue
+            cause = f" (changed: {', '.join(changed)})" if changed else ""
+            if change < -tolerance:
+                regressions += 1
+                print(f"[!] Throughput regression {100 * change:+.1f}% vs {previous['time']}{cause}")
+            else:
+                print(f"[✓] {100 * change:+.1f}% vs {previous['time']}{cause}")
+    print(f"[✓] History appended to {history_file}")
+    return regressions
+
+def print_summary(log, thermo_output=None):
+    for number, run in enumerate(iter_runs(log), 1):
+        performance = run.get('performance', {})
+        print(f"Run {number}: {run['command']} ({run['settings'].get('pair_style', '?')})")
+        print(f"  {run['steps']} steps, {run['atoms']} atoms, {run['procs']} procs, loop time {run['loop_time']:g} s")
+        print("  " + ", ".join(f"{value:g} {unit}" for unit, value in performance.items()))
+        print("  " + ", ".join(f"{section} {values['total']:.1f}%" for section, values in run['breakdown'].items()))
+        if 'neighbors_per_atom' in run:
+            print(f"  {run['neighbors_per_atom']:g} neighbors/atom, {run.get('neighbor_builds', 0):g} builds, "
+                  f"{run.get('dangerous_builds', 0):g} dangerous")
+        thermo = run['thermo']
+        if thermo:
+            rows = len(next(iter(thermo.values())))
+            print(f"  thermo: {rows} rows of {' '.join(thermo)}")
+            for name in thermo:
+                if name != 'Step':
+                    print(f"    {name:>10}: mean {thermo[name].mean():.6g}, last {thermo[name][-1]:.6g}")
+            if thermo_output:
+                base, ext = os.path.splitext(thermo_output)
+                filename = f"{base}.run{number}{ext or '.npz'}"
+                np.savez(filename, **thermo)
+                print(f"  thermo table saved to {filename}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse LAMMPS logs and track performance")
+    subparsers = parser.add_subparsers(dest="command")
+    p = subparsers.add_parser("show", help="Summarize every run of a log")
+    p.add_argument("log", nargs="?", default="log.lammps")
+    p.add_argument("--thermo", default=None, help="Save each thermo table as <name>.runN.npz")
+    p = subparsers.add_parser("record", help="Append the runs of a log to the performance history")
+    p.add_argument("log", nargs="?", default="log.lammps")
+    p.add_argument("--input", default=None, help="Input script the log was produced with (history key)")
+    p.add_argument("--label", default=None, help="Free-form note, e.g. a git revision")
+    p.add_argument("--history", default="perf_history.jsonl")
+    p.add_argument("--tolerance", type=float, default=0.05, help="Relative throughput drop that counts as regression")
+    p = subparsers.add_parser("history", help="Print the performance history")
+    p.add_argument("--history", default="perf_history.jsonl")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print_summary(args.log, args.thermo)
+    elif args.command == "record":
+        if record_runs(args.log, args.history, args.input, args.label, args.tolerance):
+            raise SystemExit(1)
+    elif args.command == "history":
+        print(f"{'time':<20} {'script':<16} {'atoms':>7} {'procs':>5} {'steps/s':>10} {'ns/day':>9} {'Pair%':>6} "
+              f"{'symfuncs':>8} {'weights':>8} label")
+        for r in read_history(args.history):
+            print(f"{r['time']:<20} {str(r['input_script']):<16} {r['atoms']:>7} {r['procs']:>5} "
+                  f"{r['timesteps_per_s'] or float('nan'):>10.2f} {r['ns_per_day'] or float('nan'):>9.3f} "
+                  f"{r['breakdown_percent'].get('Pair', float('nan')):>6.1f} {(r['symfunc_sha1'] or '-')[:8]:>8} "
+                  f"{(r['weights_sha1'] or '-')[:8]:>8} {r['label'] or ''}")
+    else:
+        parser.print_help()
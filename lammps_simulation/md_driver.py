@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Minimal NumPy MD driver for quick potential smoke tests without LAMMPS
+
+Velocity Verlet (NVE) or Langevin (BAOAB) integration in LAMMPS metal units
+on either the in-project HDNNP evaluator (hdnnp.py) or the lj/cut stand-in of
+input_lj.lmp. Pairs within cutoff + skin are stored with their periodic image
+shift and only rebuilt when an atom has moved more than half the skin
+(neigh_modify every/delay/check semantics). Trajectories are written as
+LAMMPS custom dumps (id type xu yu zu vx vy vz fx fy fz), so follow_trajectory,
+check_extrapolation etc. read them unchanged. 'screen' runs short MD for many
+weight files in parallel and reports which ones stay stable.
+"""
+
+import argparse
+import io
+import multiprocessing
+import time
+import numpy as np
+from follow_trajectory import KB_METAL, MVV2E_METAL, AR_MASS
+from neighbor_list import neighbor_list, orthogonal_cell
+
+FTM2V_METAL = 1.0 / MVV2E_METAL   # (eV/A)/(g/mol) -> A/ps^2
+
+class VerletList:
+    """Pairs within cutoff + skin with image shifts, reused until atoms move skin / 2"""
+
+    def __init__(self, cutoff, skin=2.0, every=1, delay=0, check=True):
+        self.cutoff = cutoff
+        self.skin = skin
+        self.every = every
+        self.delay = delay
+        self.check = check
+        self.builds = 0
+        self.dangerous = 0
+        self.last_build = None
+
+    def build(self, positions, cell, origin, step=0):
+        i, j, d, _ = neighbor_list(positions, cell, self.cutoff + self.skin, origin)
+        self.i, self.j = i, j
+        # d = x_j - x_i + shift with a lattice vector shift that stays fixed until the next build
+        self.shift = d - (positions[j] - positions[i])
+        self.reference = positions.copy()
+        self.last_build = step
+        self.builds += 1
+
+    def needs_build(self, positions, step):
+        if self.last_build is None:
+            return True
+        since = step - self.last_build
+        if since < self.delay or since % self.every:
+            return False
+        if not self.check:
+            return True
+        moved = np.einsum('ij,ij->i', positions - self.reference, positions - self.reference)
+        build = moved.max() > (0.5 * self.skin)**2
+        if build and since == max(self.every, self.delay):
+            # the first allowed check already needs a build, atoms may have crossed the skin earlier (LAMMPS counts
+            # these as dangerous builds)
+            self.dangerous += 1
+        return build
+
+    def pairs(self, positions, cell, origin, step=0):
+        """Full pair list (i, j, d, r) within the cutoff, sorted by i like neighbor_list"""
+        if self.needs_build(positions, step):
+            self.build(positions, cell, origin, step)
+        d = positions[self.j] - positions[self.i] + self.shift
+        r = np.sqrt(np.einsum('ij,ij->i', d, d))
+        inside = r < self.cutoff
+        return self.i[inside], self.j[inside], d[inside], r[inside]
+
+class LennardJones:
+    """pair_style lj/cut (unshifted), parameters of input_lj.lmp"""
+
+    def __init__(self, epsilon=0.0103, sigma=3.405, cutoff=12.0):
+        self.epsilon = epsilon
+        self.sigma = sigma
+        self.cutoff = cutoff
+
+    def __call__(self, natoms, neighbors):
+        """(potential energy, forces) from a full pair list"""
+        i, _, d, r = neighbors
+        sr6 = (self.sigma / r)**6
+        energy = 0.5 * np.sum(4.0 * self.epsilon * (sr6 * sr6 - sr6))
+        # dU/dr / r, the force on i from j is dU/dr * d / r with d = x_j - x_i
+        du = -24.0 * self.epsilon * (2.0 * sr6 * sr6 - sr6) / (r * r)
+        forces = np.zeros((natoms, 3))
+        for c in range(3):
+            forces[:, c] = np.bincount(i, du * d[:, c], minlength=natoms)
+        return energy, forces
+
+class NeuralNetworkForces:
+    """HDNNP energies and forces (hdnnp.py) on the shared Verlet list"""
+
+    def __init__(self, input_nn="input.nn", weights="weights.001.data", scaling="scaling.data"):
+        from hdnnp import NeuralNetworkPotential
+        self.model = NeuralNetworkPotential(input_nn, weights, scaling)
+        self.cutoff = self.model.sf.rmax / self.model.conv_length
+
+    def __call__(self, natoms, neighbors):
+        i, j, d, r = neighbors
+        scale = self.model.conv_length
+        energy, _, forces = self.model.energy_and_forces(np.zeros((natoms, 3)), None,
+                                                         neighbors=(i, j, d * scale, r * scale))
+        return energy, forces
+
+def create_velocities(natoms, temperature, mass, seed=12345):
+    """Gaussian velocities without net momentum, rescaled to exactly temperature (3N - 3 dof)"""
+    rng = np.random.default_rng(seed)
+    velocities = rng.normal(0.0, 1.0, (natoms, 3))
+    velocities -= velocities.mean(axis=0)
+    if temperature > 0 and natoms > 1:
+        current = mass * MVV2E_METAL * np.sum(velocities**2) / ((3 * natoms - 3) * KB_METAL)
+        velocities *= np.sqrt(temperature / current)
+    else:
+        velocities[:] = 0.0
+    return velocities
+
+def kinetic_energy(velocities, mass):
+    return 0.5 * mass * MVV2E_METAL * np.sum(velocities**2)
+
+class DumpWriter:
+    """LAMMPS 'custom id type xu yu zu vx vy vz fx fy fz' dump"""
+
+    def __init__(self, filename, ids, types, box):
+        self.file = open(filename, 'w')
+        self.ids, self.types, self.box = ids, types, box
+
+    def write(self, step, positions, velocities, forces):
+        f = self.file
+        f.write(f"ITEM: TIMESTEP\n{step}\nITEM: NUMBER OF ATOMS\n{len(positions)}\nITEM: BOX BOUNDS pp pp pp\n")
+        for lo, hi in self.box:
+            f.write(f"{lo:.16e} {hi:.16e}\n")
+        f.write("ITEM: ATOMS id type xu yu zu vx vy vz fx fy fz\n")
+        buffer = io.StringIO()
+        np.savetxt(buffer, np.column_stack([self.ids, self.types, positions, velocities, forces]),
+                   fmt=['%d', '%d'] + ['%.6g'] * 9)
+        f.write(buffer.getvalue())
+
+    def close(self):
+        self.file.close()
+
+def run_md(structure, potential, steps=1000, dt=0.001, temperature=300.0, thermostat='langevin', damp=0.1,
+           seed=12345, mass=AR_MASS, skin=2.0, every=1, delay=0, check=True, dump=None, dump_every=100,
+           thermo=100, quiet=False):
+    """Run MD from a LAMMPS data file, return a summary dict (thermo rows, timing, neighbor builds)"""
+    from create_small_system import read_atoms
+    ids, types, positions, box = read_atoms(structure)
+    cell, origin = orthogonal_cell(box)
+    natoms = len(positions)
+    velocities = create_velocities(natoms, temperature, mass, seed)
+    rng = np.random.default_rng(seed + 1)
+    neighbors = VerletList(potential.cutoff, skin, every, delay, check)
+    writer = DumpWriter(dump, ids, types, box) if dump else None
+
+    energy, forces = potential(natoms, neighbors.pairs(positions, cell, origin, 0))
+    accel = FTM2V_METAL / mass
+    friction = np.exp(-dt / damp)
+    noise = np.sqrt((1.0 - friction**2) * KB_METAL * temperature / (mass * MVV2E_METAL))
+    rows = []
+    dof = 3 * natoms - 3
+
+    def record(step):
+        ke = kinetic_energy(velocities, mass)
+        rows.append((step, 2.0 * ke / (dof * KB_METAL), energy, ke, energy + ke))
+        if not quiet:
+            print("{:8d} {:10.3f} {:14.6f} {:12.6f} {:14.6f}".format(*rows[-1]))
+
+    if not quiet:
+        print(f"{'Step':>8s} {'Temp':>10s} {'PotEng':>14s} {'KinEng':>12s} {'TotEng':>14s}")
+    record(0)
+    if writer:
+        writer.write(0, positions, velocities, forces)
+
+    start = time.perf_counter()
+    step = 0
+    for step in range(1, steps + 1):
+        velocities += 0.5 * dt * accel * forces
+        if thermostat == 'langevin':
+            # BAOAB: half drift, Ornstein-Uhlenbeck velocity update, half drift
+            positions += 0.5 * dt * velocities
+            velocities = friction * velocities + noise * rng.normal(0.0, 1.0, velocities.shape)
+            positions += 0.5 * dt * velocities
+        else:
+            positions += dt * velocities
+        energy, forces = potential(natoms, neighbors.pairs(positions, cell, origin, step))
+        velocities += 0.5 * dt * accel * forces
+
+        if thermo and step % thermo == 0:
+            record(step)
+        if writer and dump_every and step % dump_every == 0:
+            writer.write(step, positions, velocities, forces)
+        if not np.isfinite(energy):
+            break
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    if writer:
+        writer.close()
+
+    rows = np.array(rows)
+    if not quiet:
+        print(f"Loop time {elapsed:.3f} s for {step} steps with {natoms} atoms: "
+              f"{step / elapsed:.2f} steps/s, {step * natoms / elapsed:.0f} atom-steps/s, "
+              f"{neighbors.builds} neighbor list builds, {neighbors.dangerous} dangerous")
+    return {'thermo': rows, 'steps': step, 'elapsed': elapsed, 'steps_per_second': step / elapsed,
+            'builds': neighbors.builds, 'dangerous': neighbors.dangerous, 'natoms': natoms, 'positions': positions,
+            'cell': cell, 'origin': origin}
+
+def _screen_one(args):
+    weights, structure, input_nn, scaling, steps, dt, temperature, max_temperature, min_distance = args
+    potential = NeuralNetworkForces(input_nn, weights, scaling)
+    result = run_md(structure, potential, steps, dt, temperature, 'none', thermo=10, quiet=True)
+    thermo = result['thermo']
+    _, _, _, r = neighbor_list(result['positions'], result['cell'], min_distance * 2, result['origin'])
+    closest = r.min() if len(r) else np.inf
+    drift = np.abs(thermo[:, 4] - thermo[0, 4]).max() / result['natoms']
+    hottest = thermo[:, 1].max()
+    stable = bool(np.isfinite(thermo[:, 4]).all() and hottest < max_temperature and closest > min_distance)
+    reason = "ok" if stable else ("temperature" if hottest >= max_temperature else "collapse")
+    return weights, stable, reason, drift, hottest, closest
+
+def screen_weights(structure, weights, input_nn="input.nn", scaling="scaling.data", steps=500, dt=0.001,
+                   temperature=300.0, max_temperature=2000.0, min_distance=2.0, nprocs=None):
+    """NVE stability screen of several weight files, one process per file"""
+    jobs = [(w, structure, input_nn, scaling, steps, dt, temperature, max_temperature, min_distance)
+            for w in weights]
+    print(f"{'weights':40s} {'stable':>6s} {'reason':>12s} {'|dE| eV/atom':>13s} {'T max':>9s} {'r min':>7s}")
+    results = []
+    with multiprocessing.Pool(nprocs) as pool:
+        for result in pool.imap(_screen_one, jobs):
+            results.append(result)
+            name, stable, reason, drift, hottest, closest = result
+            print(f"{name:40s} {str(stable):>6s} {reason:>12s} {drift:13.3e} {hottest:9.1f} {closest:7.3f}")
+    return results
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("structure", help="LAMMPS data file (orthogonal box, atom_style atomic)")
+    common.add_argument("--steps", type=int, default=1000)
+    common.add_argument("--dt", type=float, default=0.001, help="Timestep in ps")
+    common.add_argument("--temp", type=float, default=300.0)
+    common.add_argument("--input-nn", default="input.nn")
+    common.add_argument("--scaling", default="scaling.data")
+
+    parser = argparse.ArgumentParser(description="Small MD driver for HDNNP / LJ smoke tests")
+    subparsers = parser.add_subparsers(dest="command")
+    for name, help_text in (("run", "Run MD and write a LAMMPS dump"), ("benchmark", "Steps per second")):
+        p = subparsers.add_parser(name, parents=[common], help=help_text)
+        p.add_argument("--potential", choices=["nnp", "lj"], default="nnp")
+        p.add_argument("--weights", default="weights.001.data")
+        p.add_argument("--thermostat", choices=["langevin", "none"], default="langevin")
+        p.add_argument("--damp", type=float, default=0.1, help="Langevin damping time in ps")
+        p.add_argument("--seed", type=int, default=12345)
+        p.add_argument("--skin", type=float, default=2.0)
+        p.add_argument("--every", type=int, default=1)
+        p.add_argument("--delay", type=int, default=0)
+        p.add_argument("--no-check", action="store_true", help="Rebuild every 'every' steps without checking")
+    subparsers.choices["run"].add_argument("--dump", default="trajectory_md.lammpstrj")
+    subparsers.choices["run"].add_argument("--dump-every", type=int, default=100)
+    subparsers.choices["run"].add_argument("--thermo", type=int, default=100)
+
+    p = subparsers.add_parser("screen", parents=[common], help="NVE stability screen of weight files")
+    p.add_argument("--weights", nargs="+", required=True)
+    p.add_argument("--max-temp", type=float, default=2000.0)
+    p.add_argument("--min-distance", type=float, default=2.0)
+    p.add_argument("--nprocs", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "screen":
+        screen_weights(args.structure, args.weights, args.input_nn, args.scaling, args.steps, args.dt, args.temp,
+                       args.max_temp, args.min_distance, args.nprocs)
+    elif args.command in ("run", "benchmark"):
+        potential = LennardJones() if args.potential == "lj" else \
+            NeuralNetworkForces(args.input_nn, args.weights, args.scaling)
+        benchmark = args.command == "benchmark"
+        run_md(args.structure, potential, args.steps, args.dt, args.temp, args.thermostat, args.damp, args.seed,
+               skin=args.skin, every=args.every, delay=args.delay, check=not args.no_check,
+               dump=None if benchmark else args.dump, dump_every=0 if benchmark else args.dump_every,
+               thermo=0 if benchmark else args.thermo)
+    else:
+        parser.print_help()
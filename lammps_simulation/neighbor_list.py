@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Vectorized periodic neighbor list shared by the structure, symmetry-function and MD tools
+
+Cells are given as a 3x3 matrix whose rows are the lattice vectors, so general
+triclinic boxes work as well as orthogonal LAMMPS boxes. Bins are at least one
+cutoff wide, so only the 27 surrounding bins (each with its own periodic image)
+need to be searched; with 1 or 2 bins along a direction the same bin is simply
+visited through different images. Cells thinner than the cutoff fall back to an
+all-pairs search over the periodic images needed.
+"""
+
+import itertools
+import numpy as np
+
+def orthogonal_cell(box):
+    """Cell matrix and origin for a LAMMPS style [[xlo, xhi], [ylo, yhi], [zlo, zhi]] box"""
+    box = np.asarray(box, dtype=float)
+    return np.diag(box[:, 1] - box[:, 0]), box[:, 0].copy()
+
+def plane_spacings(cell):
+    """Distances between opposite faces of the cell"""
+    volume = abs(np.linalg.det(cell))
+    return np.array([volume / np.linalg.norm(np.cross(cell[(k + 1) % 3], cell[(k + 2) % 3]))
+                     for k in range(3)])
+
+def wrap_positions(positions, cell, origin=None, pbc=(True, True, True)):
+    """Return (wrapped cartesian positions, fractional coordinates in [0, 1) for periodic directions)"""
+    origin = np.zeros(3) if origin is None else np.asarray(origin, dtype=float)
+    frac = (np.asarray(positions, dtype=float) - origin) @ np.linalg.inv(cell)
+    for k in range(3):
+        if pbc[k]:
+            frac[:, k] -= np.floor(frac[:, k])
+            frac[frac[:, k] >= 1.0, k] = 0.0   # guard against round-off at exactly 1
+    return origin + frac @ cell, frac
+
+def _brute_force(positions, cell, cutoff, pbc, max_elements=2**24):
+    natoms = len(positions)
+    nimages = [int(np.ceil(cutoff / d)) if p else 0 for d, p in zip(plane_spacings(cell), pbc)]
+    images = np.array(list(itertools.product(*[range(-n, n + 1) for n in nimages])))
+    shifts = images @ cell
+    zero = np.flatnonzero(~images.any(axis=1))[0]
+
+    chunk = max(1, max_elements // max(1, len(shifts) * natoms))
+    cutoff2 = cutoff * cutoff
+    out_i, out_j, out_d = [], [], []
+    for start in range(0, natoms, chunk):
+        stop = min(start + chunk, natoms)
+        # (images, chunk, natoms, 3)
+        d = positions[None, None, :, :] + shifts[:, None, None, :] - positions[None, start:stop, None, :]
+        r2 = np.einsum('sijk,sijk->sij', d, d)
+        mask = r2 < cutoff2
+        mask[zero, np.arange(stop - start), np.arange(start, stop)] = False   # no self pairs
+        s, i, j = np.nonzero(mask)
+        out_i.append(i + start)
+        out_j.append(j)
+        out_d.append(d[s, i, j])
+    if not out_i:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros((0, 3))
+    return np.concatenate(out_i), np.concatenate(out_j), np.concatenate(out_d)
+
+def _cell_list(positions, frac, cell, cutoff, pbc, nbins, max_elements=2**22):
+    natoms = len(positions)
+    bins = np.minimum((frac * nbins).astype(np.int64), nbins - 1)
+    bins = np.maximum(bins, 0)
+    cell_id = np.ravel_multi_index(bins.T, nbins)
+    ncells = int(np.prod(nbins))
+
+    order = np.argsort(cell_id, kind='stable')
+    counts = np.bincount(cell_id, minlength=ncells)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    occupancy = int(counts.max())
+    # padded (cells, occupancy) table of atom indices, -1 marks empty slots
+    table = np.full((ncells, occupancy), -1, dtype=np.int64)
+    slot = np.arange(natoms) - starts[cell_id[order]]
+    table[cell_id[order], slot] = order
+
+    cell_coords = np.array(np.unravel_index(np.arange(ncells), nbins)).T
+    padded_pos = np.vstack([positions, np.zeros((1, 3))])   # index -1 -> dummy atom
+    cutoff2 = cutoff * cutoff
+    chunk = max(1, max_elements // (occupancy * occupancy))
+
+    # Half shell: every cell pair is visited once and mirrored at the end
+    half_shell = [o for o in itertools.product((-1, 0, 1), repeat=3) if o >= (0, 0, 0)]
+    out_i, out_j, out_d = [], [], []
+    for offset in half_shell:
+        target = cell_coords + np.array(offset)
+        wrapped = np.mod(target, nbins)
+        image = (target - wrapped) // nbins
+        valid_cell = np.ones(ncells, dtype=bool)
+        for k in range(3):
+            if not pbc[k]:
+                valid_cell &= image[:, k] == 0
+        neighbor_cell = np.ravel_multi_index(wrapped.T, nbins)
+        shift = image @ cell
+        is_self = offset == (0, 0, 0)
+
+        for start in range(0, ncells, chunk):
+            stop = min(start + chunk, ncells)
+            sel = np.arange(start, stop)[valid_cell[start:stop]]
+            if len(sel) == 0:
+                continue
+            a = table[sel]                      # (c, m) atoms of the home cells
+            b = table[neighbor_cell[sel]]       # (c, m) atoms of the neighbor cells
+            d = (padded_pos[b][:, None, :, :] + shift[sel][:, None, None, :]
+                 - padded_pos[a][:, :, None, :])
+            r2 = np.einsum('cabk,cabk->cab', d, d)
+            mask = (r2 < cutoff2) & (a[:, :, None] >= 0) & (b[:, None, :] >= 0)
+            if is_self:
+                mask &= a[:, :, None] < b[:, None, :]
+            c, ia, ib = np.nonzero(mask)
+            out_i.append(a[c, ia])
+            out_j.append(b[c, ib])
+            out_d.append(d[c, ia, ib])
+
+    if not out_i:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros((0, 3))
+    i, j, d = np.concatenate(out_i), np.concatenate(out_j), np.concatenate(out_d)
+    return np.concatenate([i, j]), np.concatenate([j, i]), np.concatenate([d, -d])
+
+def neighbor_list(positions, cell, cutoff, origin=None, pbc=(True, True, True)):
+    """Full neighbor list within cutoff
+
+    Returns (i, j, d, r) sorted by i, where d = r_j (nearest image) - r_i and
+    every pair appears in both directions.
+    """
+    cell = np.asarray(cell, dtype=float)
+    if len(positions) == 0:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros((0, 3)), np.zeros(0)
+    positions, frac = wrap_positions(positions, cell, origin, pbc)
+    nbins = np.floor(plane_spacings(cell) / cutoff).astype(np.int64)
+    for k in range(3):
+        if not pbc[k]:
+            # open directions only need enough bins to keep cells >= cutoff
+            extent = frac[:, k].max() - frac[:, k].min() if len(frac) else 0.0
+            nbins[k] = max(1, int(plane_spacings(cell)[k] * max(extent, 1e-12) // cutoff))
+            frac[:, k] = (frac[:, k] - frac[:, k].min()) / max(extent, 1e-12)
+
+    if np.all(nbins >= 1):
+        i, j, d = _cell_list(positions, frac, cell, cutoff, pbc, nbins)
+    else:
+        i, j, d = _brute_force(positions, cell, cutoff, pbc)
+
+    order = np.argsort(i, kind='stable')
+    i, j, d = i[order], j[order], d[order]
+    return i, j, d, np.sqrt(np.sum(d * d, axis=1))
+
+def padded_neighbors(i, j, natoms, values=None):
+    """Convert a pair list sorted by i into a (natoms, max neighbors) table padded with -1
+
+    If values (pairs, ...) are given, a matching zero-padded table of values is returned too.
+    """
+    counts = np.bincount(i, minlength=natoms)
+    width = int(counts.max()) if len(counts) and counts.max() > 0 else 1
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    slot = np.arange(len(i)) - starts[i]
+    table = np.full((natoms, width), -1, dtype=np.int64)
+    table[i, slot] = j
+    if values is None:
+        return table, counts
+    padded = np.zeros((natoms, width) + values.shape[1:], dtype=values.dtype)
+    padded[i, slot] = values
+    return table, counts, padded
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Per-frame structural order analysis of LAMMPS trajectories
+
+For every frame the coordination numbers, common neighbor analysis (CNA)
+signatures and Steinhardt bond-order parameters Q4/Q6 are computed from one
+shared neighbor list, and the fractions of FCC/HCP/BCC/icosahedral/other atoms
+are written per frame. A drop of the FCC fraction flags melting or a structural
+instability in long NNP runs without looking at g(r) by hand.
+"""
+
+import argparse
+import multiprocessing
+import numpy as np
+from neighbor_list import neighbor_list, orthogonal_cell, padded_neighbors
+
+STRUCTURES = ['FCC', 'HCP', 'BCC', 'ICO', 'other']
+
+# Reference Steinhardt values with 12 (FCC, HCP) nearest neighbors
+REFERENCE_Q = {'FCC': (0.19094, 0.57452), 'HCP': (0.09722, 0.48476)}
+
+def default_cutoff(natoms, volume):
+    """CNA cutoff halfway between the first and second FCC shells at the given density"""
+    lattice = (4.0 * volume / natoms) ** (1.0 / 3.0)
+    return 0.5 * (1.0 + np.sqrt(0.5)) * lattice   # 0.8536 a
+
+def common_neighbor_signatures(i, j, natoms, chunk=20000):
+    """CNA signature (common neighbors, bonds among them, longest bond chain) of every pair i < j
+
+    Returns (pairs i, pairs j, signatures (npairs, 3)).
+    """
+    table, counts = padded_neighbors(i, j, natoms)
+    width = table.shape[1]
+    # sorted bond keys for membership tests a-b
+    keys = i * natoms + j
+    keys.sort()
+
+    half = i < j
+    bi, bj = i[half], j[half]
+    signatures = np.zeros((len(bi), 3), dtype=np.int64)
+
+    for start in range(0, len(bi), chunk):
+        stop = min(start + chunk, len(bi))
+        ni = table[bi[start:stop]]                    # (b, w)
+        nj = table[bj[start:stop]]
+        # common neighbors, kept in the slots of the neighbor row of i
+        common = ((ni[:, :, None] == nj[:, None, :]) & (ni[:, :, None] >= 0)).any(axis=2)
+        ncommon = common.sum(axis=1)
+
+        # adjacency between common neighbors via the sorted bond keys
+        a = np.where(common, ni, 0)
+        pair_keys = a[:, :, None] * natoms + a[:, None, :]
+        pos = np.minimum(np.searchsorted(keys, pair_keys), len(keys) - 1)
+        edges = (keys[pos] == pair_keys) & common[:, :, None] & common[:, None, :]
+        nbonds = edges.sum(axis=(1, 2)) // 2
+
+        # connected components of the common neighbor bonds by label propagation
+        label = np.where(common, np.arange(width), width)
+        for _ in range(width):
+            neighbor_label = np.where(edges, label[:, None, :], width).min(axis=2)
+            new_label = np.minimum(label, neighbor_label)
+            if np.array_equal(new_label, label):
+                break
+            label = new_label
+        # bonds per component: each bond counted once from both ends
+        onehot = label[:, :, None] == np.arange(width)[None, None, :]
+        degree = edges.sum(axis=2)
+        chain = np.einsum('ba,bak->bk', degree, onehot) // 2
+        signatures[start:stop] = np.column_stack([ncommon, nbonds, chain.max(axis=1)])
+
+    return bi, bj, signatures
+
+def classify_cna(bi, bj, signatures, natoms):
+    """Structure index (into STRUCTURES) of every atom from its bond signatures"""
+    code = signatures[:, 0] * 100 + signatures[:, 1] * 10 + signatures[:, 2]
+    atoms = np.concatenate([bi, bj])
+    code = np.concatenate([code, code])
+
+    def count(value):
+        return np.bincount(atoms[code == value], minlength=natoms)
+
+    nbonds = np.bincount(atoms, minlength=natoms)
+    n421, n422, n444, n555, n666 = (count(v) for v in (421, 422, 444, 555, 666))
+
+    structure = np.full(natoms, STRUCTURES.index('other'))
+    structure[(nbonds == 12) & (n421 == 12)] = STRUCTURES.index('FCC')
+    structure[(nbonds == 12) & (n421 == 6) & (n422 == 6)] = STRUCTURES.index('HCP')
+    structure[(nbonds == 14) & (n666 == 8) & (n444 == 6)] = STRUCTURES.index('BCC')
+    structure[(nbonds == 12) & (n555 == 12)] = STRUCTURES.index('ICO')
+    return structure
+
+def legendre(l, x):
+    """Legendre polynomial P_l(x) by the three-term recurrence"""
+    p_prev, p = np.ones_like(x), x
+    if l == 0:
+        return p_prev
+    for n in range(1, l):
+        p_prev, p = p, ((2 * n + 1) * x * p - n * p_prev) / (n + 1)
+    return p
+
+def steinhardt(i, d, r, natoms, ls=(4, 6)):
+    """Steinhardt Q_l of every atom, (natoms, len(ls))
+
+    Uses the addition theorem, sum_m |q_lm|^2 = (2l+1)/(4 pi) sum_jk P_l(cos theta_jk) / Nb^2,
+    so no spherical harmonics are needed.
+    """
+    unit = d / r[:, None]
+    _, counts, padded = padded_neighbors(i, i, natoms, unit)
+    cos = np.clip(np.einsum('awk,avk->awv', padded, padded), -1.0, 1.0)
+    valid = np.arange(padded.shape[1])[None, :] < counts[:, None]
+    mask = valid[:, :, None] & valid[:, None, :]
+
+    q = np.zeros((natoms, len(ls)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for k, l in enumerate(ls):
+            total = np.where(mask, legendre(l, cos), 0.0).sum(axis=(1, 2))
+            q[:, k] = np.where(counts > 0, np.sqrt(np.maximum(total, 0.0)) / counts, 0.0)
+    return q
+
+def analyze_positions(positions, cell, origin=None, cutoff=None, pbc=(True, True, True)):
+    """Coordination, CNA structure index and Q4/Q6 of every atom of one configuration"""
+    natoms = len(positions)
+    if cutoff is None:
+        cutoff = default_cutoff(natoms, abs(np.linalg.det(cell)))
+    i, j, d, r = neighbor_list(positions, cell, cutoff, origin, pbc)
+    coordination = np.bincount(i, minlength=natoms)
+    bi, bj, signatures = common_neighbor_signatures(i, j, natoms)
+    structure = classify_cna(bi, bj, signatures, natoms)
+    q = steinhardt(i, d, r, natoms)
+    return {'coordination': coordination, 'structure': structure, 'q4': q[:, 0], 'q6': q[:, 1]}
+
+def _analyze_frame(args):
+    from follow_trajectory import get_positions
+    frame, cutoff = args
+    positions, _ = get_positions(frame)
+    cell, origin = orthogonal_cell(frame['box'])
+    result = analyze_positions(positions, cell, origin, cutoff)
+    fractions = np.bincount(result['structure'], minlength=len(STRUCTURES)) / len(positions)
+    return (frame['timestep'], fractions, result['coordination'].mean(),
+            result['q4'].mean(), result['q6'].mean())
+
+def analyze_trajectory(filename, output='structure_fractions.dat', cutoff=None, nprocs=None,
+                       fcc_alarm=0.5):
+    """Per-frame structure fractions of a dump or .ctrj file, frames processed in parallel"""
+    from compressed_trajectory import iter_frames
+
+    rows = []
+    alarm_step = None
+    tasks = ((frame, cutoff) for frame in iter_frames(filename))
+    with multiprocessing.Pool(nprocs) as pool:
+        for timestep, fractions, coordination, q4, q6 in pool.imap(_analyze_frame, tasks, chunksize=4):
+            rows.append([timestep, *fractions, coordination, q4, q6])
+            if alarm_step is None and fractions[0] < fcc_alarm:
+                alarm_step = timestep
+
+    rows = np.array(rows)
+    header = "TimeStep " + " ".join(f"f_{name}" for name in STRUCTURES) + " mean_CN mean_Q4 mean_Q6"
+    np.savetxt(output, rows, header=header, fmt=['%d'] + ['%.6f'] * (rows.shape[1] - 1))
+
+    print(f"Analyzed {len(rows)} frames from {filename}")
+    print(f"First frame: FCC {rows[0, 1]:.3f}, HCP {rows[0, 2]:.3f}, other {rows[0, 5]:.3f}, "
+          f"Q4 {rows[0, 7]:.4f}, Q6 {rows[0, 8]:.4f}")
+    print(f"Last frame:  FCC {rows[-1, 1]:.3f}, HCP {rows[-1, 2]:.3f}, other {rows[-1, 5]:.3f}, "
+          f"Q4 {rows[-1, 7]:.4f}, Q6 {rows[-1, 8]:.4f}")
+    print(f"Reference (perfect crystal): FCC Q4 {REFERENCE_Q['FCC'][0]}, Q6 {REFERENCE_Q['FCC'][1]}")
+    if alarm_step is not None:
+        print(f"WARNING: FCC fraction fell below {fcc_alarm} at timestep {alarm_step} "
+              "- the crystal is melting or unstable")
+    print(f"Per-frame fractions written to {output}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-frame CNA and Steinhardt analysis of a trajectory")
+    parser.add_argument("filename", nargs="?", default="trajectory_fcc.lammpstrj", help="LAMMPS dump or .ctrj file")
+    parser.add_argument("-o", "--output", default="structure_fractions.dat", help="Output table")
+    parser.add_argument("--cutoff", type=float, default=None,
+                        help="Neighbor cutoff in A (default: between first and second FCC shell at the frame density)")
+    parser.add_argument("--nprocs", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--fcc-alarm", type=float, default=0.5, help="Warn when the FCC fraction drops below this")
+    args = parser.parse_args()
+
+    analyze_trajectory(args.filename, args.output, args.cutoff, args.nprocs, args.fcc_alarm)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Vectorized n2p2 symmetry functions for single-element systems
+
+Reads the symfunction_short lines of input.nn, orders them the way n2p2 does
+(by type, then cutoff, eta, rs, zeta, lambda; this is the sf_index order of
+scaling.data and of the network input layer) and evaluates radial (type 2),
+narrow angular (type 3) and wide angular (type 9) functions for all atoms of a
+frame at once from a shared neighbor list. gradient() contracts the analytic
+derivatives with dE/dG, which gives forces without storing dG/dr.
+"""
+
+import numpy as np
+from neighbor_list import neighbor_list, padded_neighbors
+
+# n2p2 cutoff_type numbers, x = (r - alpha rc) / (rc - alpha rc)
+CUTOFF_FUNCTIONS = {
+    1: lambda x: 0.5 * (np.cos(np.pi * x) + 1.0),                                   # COS
+    2: None,                                                                        # TANHU, needs r/rc
+    4: lambda x: np.exp(1.0 - 1.0 / np.maximum(1.0 - x * x, 1e-300)),              # EXP
+    5: lambda x: (2.0 * x - 3.0) * x * x + 1.0,                                     # POLY1
+    6: lambda x: ((15.0 - 6.0 * x) * x - 10.0) * x * x * x + 1.0,                   # POLY2
+    7: lambda x: (x * (x * (20.0 * x - 70.0) + 84.0) - 35.0) * x**4 + 1.0,          # POLY3
+    8: lambda x: (x * (x * ((315.0 - 70.0 * x) * x - 540.0) + 420.0) - 126.0) * x**5 + 1.0,  # POLY4
+}
+
+# derivatives of the above with respect to x
+CUTOFF_DERIVATIVES = {
+    1: lambda x: -0.5 * np.pi * np.sin(np.pi * x),
+    2: None,
+    4: lambda x: CUTOFF_FUNCTIONS[4](x) * -2.0 * x / np.maximum(1.0 - x * x, 1e-150)**2,
+    5: lambda x: 6.0 * x * (x - 1.0),
+    6: lambda x: -30.0 * (x * (x - 1.0))**2,
+    7: lambda x: 140.0 * (x * (x - 1.0))**3,
+    8: lambda x: -630.0 * (x * (x - 1.0))**4,
+}
+
+def read_input_nn(filename="input.nn"):
+    """Return (settings dict of keyword -> list of strings, list of symmetry function dicts in file order)"""
+    settings = {}
+    functions = []
+    with open(filename, 'r') as f:
+        for line in f:
+            parts = line.split('#')[0].split()
+            if not parts:
+                continue
+            if parts[0] == 'symfunction_short':
+                functions.append(parse_symfunction(parts))
+            else:
+                settings[parts[0]] = parts[1:]
+    return settings, functions
+
+def parse_symfunction(parts):
+    """Symmetry function dict from the tokens of one symfunction_short line"""
+    sf_type = int(parts[2])
+    if sf_type == 2:
+        # symfunction_short <e_c> 2 <e_1> <eta> <rs> <rc>
+        return {'type': 2, 'element': parts[1], 'neighbors': (parts[3],), 'eta': float(parts[4]),
+                'rs': float(parts[5]), 'rc': float(parts[6]), 'lambda': 0.0, 'zeta': 0.0}
+    if sf_type in (3, 9):
+        # symfunction_short <e_c> 3|9 <e_1> <e_2> <eta> <lambda> <zeta> <rc> [<rs>]
+        return {'type': sf_type, 'element': parts[1], 'neighbors': (parts[3], parts[4]),
+                'eta': float(parts[5]), 'lambda': float(parts[6]), 'zeta': float(parts[7]),
+                'rc': float(parts[8]), 'rs': float(parts[9]) if len(parts) > 9 else 0.0}
+    raise ValueError(f"Symmetry function type {sf_type} is not supported: {' '.join(parts)}")
+
+def sort_key(sf):
+    return (sf['type'], sf['neighbors'], sf['rc'], sf['eta'], sf['rs'], sf['zeta'], sf['lambda'])
+
+def sort_symmetry_functions(functions):
+    """Symmetry functions in n2p2 order (index i of the result is sf_index i + 1)"""
+    return sorted(functions, key=sort_key)
+
+def describe(sf):
+    if sf['type'] == 2:
+        return f"G2 eta={sf['eta']:g} rs={sf['rs']:g} rc={sf['rc']:g}"
+    return (f"G{sf['type']} eta={sf['eta']:g} lambda={sf['lambda']:+g} zeta={sf['zeta']:g} "
+            f"rc={sf['rc']:g} rs={sf['rs']:g}")
+
+def read_scaling(filename="scaling.data", element=1):
+    """Per-function (min, max, mean, sigma) arrays of one element, in sf_index order"""
+    data = np.loadtxt(filename, comments='#', ndmin=2)
+    data = data[data[:, 0] == element]
+    data = data[np.argsort(data[:, 1])]
+    return data[:, 2], data[:, 3], data[:, 4], data[:, 5]
+
+class SymmetryFunctions:
+    """Evaluate a set of symmetry functions (sorted in n2p2 order) for whole frames"""
+
+    def __init__(self, functions, cutoff_type=6, cutoff_alpha=0.0):
+        self.functions = sort_symmetry_functions(functions)
+        self.cutoff_type = int(cutoff_type)
+        self.cutoff_alpha = cutoff_alpha
+        if self.cutoff_type not in CUTOFF_FUNCTIONS:
+            raise ValueError(f"cutoff_type {cutoff_type} is not supported")
+        self.radial = [k for k, sf in enumerate(self.functions) if sf['type'] == 2]
+        self.angular = [k for k, sf in enumerate(self.functions) if sf['type'] in (3, 9)]
+        self.rmax = max(sf['rc'] for sf in self.functions)
+
+    @classmethod
+    def from_input_nn(cls, filename="input.nn"):
+        settings, functions = read_input_nn(filename)
+        cutoff_type = int(float(settings.get('cutoff_type', ['1'])[0]))
+        cutoff_alpha = float(settings['cutoff_type'][1]) if len(settings.get('cutoff_type', [])) > 1 else 0.0
+        return cls(functions, cutoff_type, cutoff_alpha)
+
+    def __len__(self):
+        return len(self.functions)
+
+    def cutoff(self, r, rc):
+        """Cutoff function values (0 beyond rc)"""
+        inner = self.cutoff_alpha * rc
+        x = np.clip((r - inner) / (rc - inner), 0.0, 1.0)
+        if self.cutoff_type == 2:
+            value = np.tanh(1.0 - r / rc)**3
+        else:
+            value = CUTOFF_FUNCTIONS[self.cutoff_type](x)
+        return np.where(r < rc, value, 0.0)
+
+    def cutoff_derivative(self, r, rc):
+        """d fc / d r (0 beyond rc)"""
+        inner = self.cutoff_alpha * rc
+        x = np.clip((r - inner) / (rc - inner), 0.0, 1.0)
+        if self.cutoff_type == 2:
+            t = np.tanh(1.0 - r / rc)
+            value = -3.0 * t * t * (1.0 - t * t) / rc
+        else:
+            value = CUTOFF_DERIVATIVES[self.cutoff_type](x) / (rc - inner)
+        return np.where((r < rc) & (r > inner), value, 0.0)
+
+    def neighbors(self, positions, cell, origin=None, pbc=(True, True, True)):
+        """Neighbor list (i, j, d, r) within the largest cutoff, shared by compute() and gradient()"""
+        return neighbor_list(positions, cell, self.rmax, origin, pbc)
+
+    def compute(self, positions, cell, origin=None, pbc=(True, True, True), chunk_atoms=32, neighbors=None):
+        """Symmetry function values, shape (natoms, number of functions)"""
+        natoms = len(positions)
+        i, j, d, r = neighbors if neighbors is not None else self.neighbors(positions, cell, origin, pbc)
+        values = np.zeros((natoms, len(self.functions)))
+
+        # radial: one (pairs, functions) matrix summed per central atom
+        if self.radial:
+            eta = np.array([self.functions[k]['eta'] for k in self.radial])
+            rs = np.array([self.functions[k]['rs'] for k in self.radial])
+            rc = np.array([self.functions[k]['rc'] for k in self.radial])
+            terms = np.exp(-eta * (r[:, None] - rs)**2) * self.cutoff(r[:, None], rc)
+            for column, k in enumerate(self.radial):
+                values[:, k] = np.bincount(i, terms[:, column], minlength=natoms)
+
+        if self.angular:
+            table, counts, vectors = padded_neighbors(i, j, natoms, d)
+            for start in range(0, natoms, chunk_atoms):
+                stop = min(start + chunk_atoms, natoms)
+                width = max(int(counts[start:stop].max()), 1)
+                values[start:stop, self.angular] = self._angular(vectors[start:stop, :width], counts[start:stop])
+        return values
+
+    def gradient(self, dEdG, neighbors, natoms, chunk_atoms=16):
+        """Sum over i, s of dEdG[i, s] * dG[i, s] / dr_k for every atom k, shape (natoms, 3)
+
+        The forces of a potential E(G) are minus this gradient.
+        """
+        i, j, d, r = neighbors
+        grad = np.zeros((natoms, 3))
+        if self.radial:
+            eta = np.array([self.functions[k]['eta'] for k in self.radial])
+            rs = np.array([self.functions[k]['rs'] for k in self.radial])
+            rc = np.array([self.functions[k]['rc'] for k in self.radial])
+            x = r[:, None] - rs
+            gauss = np.exp(-eta * x * x)
+            terms = gauss * (self.cutoff_derivative(r[:, None], rc) - 2.0 * eta * x * self.cutoff(r[:, None], rc))
+            coefficient = np.einsum('ps,ps->p', terms, dEdG[i][:, self.radial])
+            # d r_ij / d r_j = d_ij / r_ij, d r_ij / d r_i = -d_ij / r_ij
+            _scatter(grad, j, coefficient[:, None] / r[:, None] * d)
+            _scatter(grad, i, -coefficient[:, None] / r[:, None] * d)
+
+        if self.angular:
+            table, counts, vectors = padded_neighbors(i, j, natoms, d)
+            for start in range(0, natoms, chunk_atoms):
+                stop = min(start + chunk_atoms, natoms)
+                width = max(int(counts[start:stop].max()), 1)
+                self._angular_gradient(vectors[start:stop, :width], table[start:stop, :width], counts[start:stop],
+                                       dEdG[start:stop][:, self.angular], start, grad)
+        return grad
+
+    def _triplets(self, vectors, counts):
+        """Geometry of all neighbor pairs j < k of each central atom of a padded chunk"""
+        width = vectors.shape[1]
+        jj, kk = np.triu_indices(width, 1)
+        valid = (kk[None, :] < counts[:, None])
+        atom, pair = np.nonzero(valid)
+        js, ks = jj[pair], kk[pair]
+        distances = np.sqrt(np.einsum('awk,awk->aw', vectors, vectors))
+        dij = vectors[atom, js]
+        dik = vectors[atom, ks]
+        rij = distances[atom, js]
+        rik = distances[atom, ks]
+        djk = dik - dij
+        rjk = np.sqrt(np.einsum('tk,tk->t', djk, djk))
+        cos = np.einsum('tk,tk->t', dij, dik) / (rij * rik)
+        return {'atom': atom, 'j': js, 'k': ks, 'distances': distances, 'dij': dij, 'dik': dik, 'djk': djk,
+                'rij': rij, 'rik': rik, 'rjk': rjk, 'cos': cos}
+
+    def _shared_terms(self, sf, geometry, cache, derivatives=False):
+        """Per-triplet terms shared by all angular functions of one type and cutoff
+
+        The exponent eta sum (r - rs)^2 is expanded into sums of r and r^2, so each
+        function then costs a single exp over the triplets.
+        """
+        rc = sf['rc']
+        key = (sf['type'], rc)
+        if key not in cache:
+            atom, js, ks = geometry['atom'], geometry['j'], geometry['k']
+            rij, rik, rjk = geometry['rij'], geometry['rik'], geometry['rjk']
+            fc_pair = self.cutoff(geometry['distances'], rc)
+            fij, fik = fc_pair[atom, js], fc_pair[atom, ks]
+            s1, s2 = rij + rik, rij * rij + rik * rik
+            fjk = 1.0
+            if sf['type'] == 3:
+                fjk = self.cutoff(rjk, rc)
+                s1, s2 = s1 + rjk, s2 + rjk * rjk
+            entry = {'s1': s1, 's2': s2, 'n': 3 if sf['type'] == 3 else 2, 'fc': fij * fik * fjk}
+            if derivatives:
+                dfc_pair = self.cutoff_derivative(geometry['distances'], rc)
+                entry['d_rij'] = dfc_pair[atom, js] * fik * fjk
+                entry['d_rik'] = fij * dfc_pair[atom, ks] * fjk
+                entry['d_rjk'] = fij * fik * self.cutoff_derivative(rjk, rc) if sf['type'] == 3 else None
+            cache[key] = entry
+        return cache[key]
+
+    def _gauss(self, sf, entry):
+        """exp(-eta sum (r - rs)^2) per triplet"""
+        eta, rs = sf['eta'], sf['rs']
+        return np.exp(-eta * (entry['s2'] - 2.0 * rs * entry['s1'] + entry['n'] * rs * rs))
+
+    def _angle(self, sf, cos, cache, derivatives=False):
+        """(1 + lambda cos)^zeta per triplet (and its derivative by cos)"""
+        key = ('angle', sf['lambda'], sf['zeta'])
+        if key not in cache:
+            base = np.maximum(1.0 + sf['lambda'] * cos, 0.0)
+            if sf['zeta'] == 1.0:
+                lower = np.ones_like(base)
+            elif sf['zeta'] == 2.0:
+                lower = base
+            else:
+                lower = base**(sf['zeta'] - 1.0)
+            cache[key] = (lower * base, sf['zeta'] * sf['lambda'] * lower)
+        return cache[key] if derivatives else cache[key][0]
+
+    def _angular(self, vectors, counts):
+        """Angular functions for a chunk of atoms from their padded neighbor vectors (atoms, width, 3)"""
+        natoms = len(vectors)
+        geometry = self._triplets(vectors, counts)
+        atom, cos = geometry['atom'], geometry['cos']
+
+        out = np.zeros((natoms, len(self.angular)))
+        cache = {}
+        for column, k in enumerate(self.angular):
+            sf = self.functions[k]
+            entry = self._shared_terms(sf, geometry, cache)
+            terms = self._gauss(sf, entry) * entry['fc'] * self._angle(sf, cos, cache)
+            out[:, column] = 2.0**(1.0 - sf['zeta']) * np.bincount(atom, terms, minlength=natoms)
+        return out
+
+    def _angular_gradient(self, vectors, table, counts, dEdG, start, grad):
+        """Add the angular contributions of a chunk of central atoms to grad"""
+        geometry = self._triplets(vectors, counts)
+        atom, cos = geometry['atom'], geometry['cos']
+        dij, dik, djk = geometry['dij'], geometry['dik'], geometry['djk']
+        rij, rik, rjk = geometry['rij'], geometry['rik'], geometry['rjk']
+
+        # functions sharing type, cutoff, lambda and zeta differ only in the Gaussian:
+        # accumulate sum w g, sum w eta g and sum w eta rs g per group (w = dE/dG 2^(1-zeta))
+        cache = {}
+        groups = {}
+        for column, k in enumerate(self.angular):
+            sf = self.functions[k]
+            entry = self._shared_terms(sf, geometry, cache, derivatives=True)
+            weighted = 2.0**(1.0 - sf['zeta']) * dEdG[atom, column] * self._gauss(sf, entry)
+            key = (sf['type'], sf['rc'], sf['lambda'], sf['zeta'])
+            if key not in groups:
+                groups[key] = [sf, entry, np.zeros(len(atom)), np.zeros(len(atom)), np.zeros(len(atom))]
+            group = groups[key]
+            group[2] += weighted
+            group[3] += sf['eta'] * weighted
+            group[4] += sf['eta'] * sf['rs'] * weighted
+
+        # dE/d(rij, rik, rjk, cos) per triplet
+        c_rij, c_rik, c_rjk, c_cos = (np.zeros(len(atom)) for _ in range(4))
+        for sf, entry, total, eta_total, eta_rs_total in groups.values():
+            angle, d_angle = self._angle(sf, cos, cache, derivatives=True)
+            fc = entry['fc']
+            c_rij += angle * (entry['d_rij'] * total - 2.0 * fc * (rij * eta_total - eta_rs_total))
+            c_rik += angle * (entry['d_rik'] * total - 2.0 * fc * (rik * eta_total - eta_rs_total))
+            if sf['type'] == 3:
+                c_rjk += angle * (entry['d_rjk'] * total - 2.0 * fc * (rjk * eta_total - eta_rs_total))
+            c_cos += d_angle * fc * total
+
+        # gradients with respect to the vectors d_ij = r_j - r_i, d_ik = r_k - r_i, d_jk = r_k - r_j
+        inv = 1.0 / (rij * rik)
+        g_ij = (c_rij / rij - c_cos * cos / rij**2)[:, None] * dij + (c_cos * inv)[:, None] * dik
+        g_ik = (c_rik / rik - c_cos * cos / rik**2)[:, None] * dik + (c_cos * inv)[:, None] * dij
+        g_jk = (c_rjk / rjk)[:, None] * djk
+        _scatter(grad, start + atom, -g_ij - g_ik)
+        _scatter(grad, table[atom, geometry['j']], g_ij - g_jk)
+        _scatter(grad, table[atom, geometry['k']], g_ik + g_jk)
+
+def _scatter(out, index, vectors):
+    """out[index] += vectors with repeated indices accumulated"""
+    for c in range(3):
+        out[:, c] += np.bincount(index, vectors[:, c], minlength=len(out))
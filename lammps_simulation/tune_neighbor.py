@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Neighbor skin / rebuild frequency tuning for the LAMMPS inputs
+
+Writes a variant of a .lmp template for every point of a skin x every x delay
+grid (neighbor <skin> bin, neigh_modify delay <d> every <e> check yes, a short
+run, no dumps), each in its own directory with links to the files the input
+reads, runs them briefly and compares timesteps/s and dangerous builds parsed
+from the logs (lammps_log.py). The fastest setting without dangerous builds is
+recommended. Without a LAMMPS binary the grid is run on the NumPy stand-in of
+md_driver.py: lj/cut truncated at the template's pair cutoff by default (same
+cutoff + skin neighbor geometry as hdnnp at a fraction of the cost), or the
+in-project HDNNP with --standin nnp. --dry-run only writes the variants and
+prints the commands.
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import time
+from lammps_log import iter_runs
+
+LAMMPS_BINARIES = ("lmp", "lmp_serial", "lmp_mpi")
+# n2p2 files pair_style hdnnp reads from the run directory
+NNP_FILES = ("input.nn", "scaling.data", "weights.*.data")
+DISABLED = ("dump", "dump_modify", "undump")
+
+def find_lammps():
+    return next((path for path in map(shutil.which, LAMMPS_BINARIES) if path), None)
+
+def commands(lines):
+    """{command: words} of the last occurrence of every command in the script"""
+    found = {}
+    for line in lines:
+        words = line.split('#')[0].split()
+        if words:
+            found[words[0]] = words[1:]
+    return found
+
+def neighbor_setting(lines):
+    """(skin, every, delay) of the template, LAMMPS defaults for what it does not set"""
+    found = commands(lines)
+    skin = float(found['neighbor'][0]) if 'neighbor' in found else 2.0
+    options = found.get('neigh_modify', [])
+    values = dict(zip(options[::2], options[1::2]))
+    return skin, int(values.get('every', 1)), int(values.get('delay', 0))
+
+def make_variant(lines, skin, every, delay, steps):
+    """Template lines with the neighbor settings replaced, every run shortened to steps and dumps disabled"""
+    out, placed = [], False
+    for line in lines:
+        words = line.split('#')[0].split()
+        command = words[0] if words else None
+        if command == 'neighbor':
+            out.append(f"neighbor        {skin:g} bin\n")
+            placed = True
+        elif command == 'neigh_modify':
+            # keep other keywords (one, page, exclude ...)
+            options = dict(zip(words[1::2], words[2::2]))
+            options.update({'delay': str(delay), 'every': str(every), 'check': 'yes'})
+            out.append("neigh_modify    " + " ".join(f"{k} {v}" for k, v in options.items()) + "\n")
+            placed = True
+        elif command == 'run':
+            if not placed:
+                out.append(f"neighbor        {skin:g} bin\n")
+                out.append(f"neigh_modify    delay {delay} every {every} check yes\n")
+                placed = True
+            out.append(f"run             {steps}\n")
+        elif command in DISABLED:
+            out.append("# tune: " + line)
+        else:
+            out.append(line)
+    return out
+
+def input_files(lines, template_dir):
+    """Files the script reads (read_data, include, pair_coeff arguments, n2p2 files) that exist next to it"""
+    names = set()
+    for line in lines:
+        words = line.split('#')[0].split()
+        if words and words[0] in ('read_data', 'read_restart', 'include', 'molecule', 'pair_coeff'):
+            names.update(words[1:])
+    for pattern in NNP_FILES:
+        names.update(os.path.basename(path) for path in glob.glob(os.path.join(template_dir, pattern)))
+    return sorted(name for name in names if os.path.isfile(os.path.join(template_dir, name)))
+
+def grid(skins, everies, delays, baseline):
+    """(skin, every, delay) points, delay must be 0 or a multiple of every as LAMMPS requires"""
+    points = [p for p in itertools.product(skins, everies, delays) if p[0] > 0 and (p[2] == 0 or p[2] % p[1] == 0)]
+    if baseline not in points:
+        points.append(baseline)
+    return points
+
+def write_variant(template, lines, point, steps, output_dir):
+    skin, every, delay = point
+    run_dir = os.path.join(output_dir, f"skin{skin:g}_every{every}_delay{delay}")
+    os.makedirs(run_dir, exist_ok=True)
+    template_dir = os.path.dirname(os.path.abspath(template))
+    for name in input_files(lines, template_dir):
+        link = os.path.join(run_dir, name)
+        if not os.path.lexists(link):
+            os.symlink(os.path.join(template_dir, name), link)
+    # the hdnnp potential directory (pair_style hdnnp ... dir <path>) is read, never written
+    for entry in os.listdir(template_dir):
+        if os.path.isdir(os.path.join(template_dir, entry)) and entry.startswith(('hdnnp', 'nnp')):
+            link = os.path.join(run_dir, entry)
+            if not os.path.lexists(link):
+                os.symlink(os.path.join(template_dir, entry), link)
+    with open(os.path.join(run_dir, "in.tune"), 'w') as f:
+        f.writelines(make_variant(lines, skin, every, delay, steps))
+    return run_dir
+
+def run_lammps(run_dir, lammps, mpi="", timeout=None):
+    """Run in.tune in run_dir, return the timing of its last run from log.lammps (None if LAMMPS failed)"""
+    command = mpi.split() + [lammps, "-in", "in.tune", "-log", "log.lammps", "-screen", "none"]
+    try:
+        completed = subprocess.run(command, cwd=run_dir, timeout=timeout, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True)
+    except subprocess.TimeoutExpired:
+        return None
+    log = os.path.join(run_dir, "log.lammps")
+    if completed.returncode != 0 or not os.path.exists(log):
+        return None
+    runs = list(iter_runs(log))
+    if not runs:
+        return None
+    run = runs[-1]
+    performance = run.get('performance', {})
+    breakdown = run.get('breakdown', {})
+    return {
+        'timesteps_per_s': performance.get('timesteps_per_s') or run['steps'] / max(run['loop_time'], 1e-9),
+        'builds': int(run.get('neighbor_builds', 0)),
+        'dangerous': int(run.get('dangerous_builds', 0)),
+        'neighbors_per_atom': run.get('neighbors_per_atom'),
+        'pair_percent': (breakdown.get('Pair') or {}).get('total'),
+        'neigh_percent': (breakdown.get('Neigh') or {}).get('total'),
+    }
+
+def standin_potential(lines, template_dir, kind="lj", input_nn=None, weights=None, scaling=None):
+    """md_driver potential standing in for the template's pair style"""
+    from md_driver import LennardJones, NeuralNetworkForces
+    found = commands(lines)
+    style = found.get('pair_style', ['lj/cut'])
+    if kind == "nnp":
+        return NeuralNetworkForces(input_nn or os.path.join(template_dir, "input.nn"),
+                                   weights or os.path.join(template_dir, "weights.001.data"),
+                                   scaling or os.path.join(template_dir, "scaling.data"))
+    cutoff = float(style[1]) if len(style) > 1 and style[1].replace('.', '', 1).isdigit() else None
+    coeff = found.get('pair_coeff', [])
+    if style[0] == 'lj/cut' and len(coeff) >= 4:
+        return LennardJones(float(coeff[2]), float(coeff[3]), cutoff or 12.0)
+    # other styles (hdnnp): input_lj.lmp parameters truncated at the template cutoff
+    return LennardJones(cutoff=cutoff or 12.0)
+
+def run_standin(lines, template_dir, potential, point, steps):
+    """The variant on md_driver.run_md with the template's structure, timestep, temperature and thermostat"""
+    from md_driver import run_md
+    skin, every, delay = point
+    found = commands(lines)
+    structure = os.path.join(template_dir, found['read_data'][0])
+    dt = float(found.get('timestep', [0.001])[0])
+    velocity = found.get('velocity', [])
+    temperature = float(velocity[2]) if len(velocity) > 2 and velocity[1] == 'create' else 300.0
+    thermostat, damp = 'none', 0.1
+    for line in lines:
+        words = line.split('#')[0].split()
+        if len(words) > 6 and words[0] == 'fix' and words[3] in ('nvt', 'langevin'):
+            thermostat = 'langevin'
+            damp = float(words[7]) if words[3] == 'nvt' and len(words) > 7 else float(words[6])
+    result = run_md(structure, potential, steps, dt, temperature, thermostat, damp, skin=skin, every=every,
+                    delay=delay, check=True, thermo=0, quiet=True)
+    return {'timesteps_per_s': result['steps_per_second'], 'builds': result['builds'],
+            'dangerous': result['dangerous'], 'neighbors_per_atom': None, 'pair_percent': None,
+            'neigh_percent': None}
+
+def recommend(results, baseline):
+    """Fastest point without dangerous builds and its speedup over the template setting"""
+    safe = [r for r in results if r['timing'] and r['timing']['dangerous'] == 0]
+    if not safe:
+        return None, None
+    best = max(safe, key=lambda r: r['timing']['timesteps_per_s'])
+    reference = next((r for r in results if r['point'] == baseline and r['timing']), None)
+    speedup = best['timing']['timesteps_per_s'] / reference['timing']['timesteps_per_s'] if reference else None
+    return best, speedup
+
+def tune(template, skins, everies, delays, steps=200, repeat=1, output_dir=None, lammps=None, mpi="",
+         standin="lj", dry_run=False, timeout=None):
+    with open(template, 'r') as f:
+        lines = f.readlines()
+    template_dir = os.path.dirname(os.path.abspath(template))
+    baseline = neighbor_setting(lines)
+    points = grid(skins, everies, delays, baseline)
+    output_dir = output_dir or os.path.join("tune_neighbor", os.path.splitext(os.path.basename(template))[0])
+    lammps = lammps or find_lammps()
+
+    if dry_run:
+        mode = "dry run"
+    elif lammps:
+        mode = f"LAMMPS ({lammps})"
+    else:
+        mode = f"md_driver stand-in ({standin}), no LAMMPS binary found"
+    print(f"Template {template}: neighbor {baseline[0]:g} bin, every {baseline[1]} delay {baseline[2]}; "
+          f"{len(points)} variants x {steps} steps, {mode}")
+    potential = None
+    if not dry_run and not lammps:
+        potential = standin_potential(lines, template_dir, standin)
+        print(f"Stand-in cutoff {potential.cutoff:g} A")
+
+    results = []
+    for point in points:
+        run_dir = write_variant(template, lines, point, steps, output_dir)
+        if dry_run:
+            print(f"  cd {run_dir} && {mpi + ' ' if mpi else ''}{lammps or 'lmp'} -in in.tune -log log.lammps")
+            continue
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            timing = run_lammps(run_dir, lammps, mpi, timeout) if lammps else \
+                run_standin(lines, template_dir, potential, point, steps)
+            if timing is None:
+                print(f"[×] skin {point[0]:g} every {point[1]} delay {point[2]}: run failed, see {run_dir}")
+                break
+            timing['wall'] = time.perf_counter() - start
+            timings.append(timing)
+        # best of the repeats for speed, worst for safety
+        timing = None
+        if timings and len(timings) == repeat:
+            timing = max(timings, key=lambda t: t['timesteps_per_s'])
+            timing['dangerous'] = max(t['dangerous'] for t in timings)
+        results.append({'point': point, 'run_dir': run_dir, 'timing': timing})
+        if timing:
+            print(f"  skin {point[0]:4g} every {point[1]:3d} delay {point[2]:3d}: {timing['timesteps_per_s']:10.2f} "
+                  f"timesteps/s, {timing['builds']:5d} builds, {timing['dangerous']:3d} dangerous")
+    return baseline, results
+
+def print_report(baseline, results):
+    done = [r for r in results if r['timing']]
+    if not done:
+        return None
+    print(f"\n{'skin':>5} {'every':>5} {'delay':>5} {'steps/s':>10} {'builds':>6} {'danger':>6} {'neighs':>8} "
+          f"{'Pair%':>6} {'Neigh%':>6}")
+    for r in sorted(done, key=lambda r: -r['timing']['timesteps_per_s']):
+        t = r['timing']
+        optional = [f"{t[k]:>{w}.{p}f}" if t[k] is not None else f"{'-':>{w}}"
+                    for k, w, p in (('neighbors_per_atom', 8, 1), ('pair_percent', 6, 1), ('neigh_percent', 6, 1))]
+        mark = "  <- template" if r['point'] == baseline else ("  UNSAFE" if t['dangerous'] else "")
+        print(f"{r['point'][0]:5g} {r['point'][1]:5d} {r['point'][2]:5d} {t['timesteps_per_s']:10.2f} "
+              f"{t['builds']:6d} {t['dangerous']:6d} {' '.join(optional)}{mark}")
+    best, speedup = recommend(results, baseline)
+    if best is None:
+        print("[!] Every setting had dangerous builds: use a larger skin or check every step")
+        return None
+    skin, every, delay = best['point']
+    print(f"\nRecommended (fastest without dangerous builds):\n"
+          f"neighbor        {skin:g} bin\nneigh_modify    delay {delay} every {every} check yes")
+    if speedup:
+        print(f"{speedup:.2f}x the template setting")
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune neighbor skin and rebuild frequency of a LAMMPS input")
+    parser.add_argument("template", help="LAMMPS input script (.lmp)")
+    parser.add_argument("--skin", type=float, nargs="+", default=[0.5, 1.0, 1.5, 2.0, 3.0])
+    parser.add_argument("--every", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--delay", type=int, nargs="+", default=[0, 10])
+    parser.add_argument("--steps", type=int, default=200, help="Steps of every run command in the variants")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per variant (best timing is kept)")
+    parser.add_argument("--output-dir", default=None, help="Variant directories (default: tune_neighbor/<template>)")
+    parser.add_argument("--lmp", default=None, help="LAMMPS binary (default: lmp, lmp_serial or lmp_mpi on PATH)")
+    parser.add_argument("--mpi", default="", help="Launcher prefix, e.g. 'mpirun -np 4'")
+    parser.add_argument("--standin", choices=["lj", "nnp"], default="lj",
+                        help="md_driver potential when no LAMMPS binary is found")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds per LAMMPS run")
+    parser.add_argument("--dry-run", action="store_true", help="Only write the variants and print the commands")
+    parser.add_argument("--json", default=None, help="Also write the results to a JSON file")
+    args = parser.parse_args()
+
+    baseline, results = tune(args.template, args.skin, args.every, args.delay, args.steps, args.repeat,
+                             args.output_dir, args.lmp, args.mpi, args.standin, args.dry_run, args.timeout)
+    best = print_report(baseline, results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'template': args.template, 'baseline': baseline, 'results': results,
+                       'recommended': best['point'] if best else None}, f, indent=1)
+        print(f"Results written to {args.json}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Density rasters for scatter plots with very many points
+
+Points are binned into a fixed 2D grid with np.bincount on flat bin indices
+(chunk by chunk, so memory stays bounded; streamed_raster takes the blocks of
+a file reader so the data never has to be in memory at once) and the grid is
+drawn with imshow.
+Drawing then costs the same for a thousand points as for a hundred million,
+and the saved image no longer grows with the number of points. Empty bins
+are left transparent and the colour scale is logarithmic by default, so
+sparse outliers stay visible next to the dense core.
+"""
+
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm, Normalize
+
+def _bounds(x, y, chunk=2**22, bounds=None):
+    """[xmin, xmax, ymin, ymax] of the finite points, updating bounds if given"""
+    bounds = np.array([np.inf, -np.inf, np.inf, -np.inf]) if bounds is None else bounds
+    for start in range(0, len(x), chunk):
+        for k, values in enumerate((x[start:start + chunk], y[start:start + chunk])):
+            values = values[np.isfinite(values)]
+            if len(values):
+                bounds[2 * k] = min(bounds[2 * k], values.min())
+                bounds[2 * k + 1] = max(bounds[2 * k + 1], values.max())
+    return bounds
+
+def _as_range(bounds):
+    if not np.isfinite(bounds).all():
+        return (0.0, 1.0), (0.0, 1.0)
+    bounds = bounds.copy()
+    # avoid zero-width axes for constant data
+    for k in (0, 2):
+        if bounds[k] == bounds[k + 1]:
+            bounds[k] -= 0.5
+            bounds[k + 1] += 0.5
+    return (bounds[0], bounds[1]), (bounds[2], bounds[3])
+
+def data_range(x, y, chunk=2**22):
+    """((xmin, xmax), (ymin, ymax)) over the finite points, computed in chunks"""
+    return _as_range(_bounds(x, y, chunk))
+
+def _accumulate(counts, x, y, range, xbins, ybins, chunk=2**22):
+    """Add the points of (x, y) inside range to the flat counts of a (ybins, xbins) grid"""
+    (x0, x1), (y0, y1) = range
+    xscale, yscale = xbins / (x1 - x0), ybins / (y1 - y0)
+    for start in np.arange(0, len(x), chunk):
+        ix = np.floor((x[start:start + chunk] - x0) * xscale)
+        iy = np.floor((y[start:start + chunk] - y0) * yscale)
+        # the upper edge belongs to the last bin
+        ix[ix == xbins] = xbins - 1
+        iy[iy == ybins] = ybins - 1
+        inside = (ix >= 0) & (ix < xbins) & (iy >= 0) & (iy < ybins)
+        flat = iy[inside].astype(np.int64) * xbins + ix[inside].astype(np.int64)
+        counts += np.bincount(flat, minlength=xbins * ybins)
+
+def density_raster(x, y, bins=400, range=None, chunk=2**22):
+    """Counts of shape (ybins, xbins) and the x and y bin edges; points outside range are dropped"""
+    x, y = np.ravel(x), np.ravel(y)
+    xbins, ybins = (bins, bins) if np.isscalar(bins) else bins
+    range = range if range is not None else data_range(x, y, chunk)
+    counts = np.zeros(xbins * ybins, dtype=np.int64)
+    _accumulate(counts, x, y, range, xbins, ybins, chunk)
+    (x0, x1), (y0, y1) = range
+    return counts.reshape(ybins, xbins), np.linspace(x0, x1, xbins + 1), np.linspace(y0, y1, ybins + 1)
+
+def streamed_raster(chunks, bins=400, range=None, square=False):
+    """density_raster of the (x, y) blocks yielded by chunks(), a function returning a fresh iterator
+
+    Only one block is in memory at a time. Without range the blocks are read twice, once for the data
+    range (made equal on both axes with square) and once for the counts.
+    """
+    xbins, ybins = (bins, bins) if np.isscalar(bins) else bins
+    if range is None:
+        bounds = None
+        for x, y in chunks():
+            bounds = _bounds(np.ravel(x), np.ravel(y), bounds=bounds)
+        if square and bounds is not None:
+            bounds[0] = bounds[2] = min(bounds[0], bounds[2])
+            bounds[1] = bounds[3] = max(bounds[1], bounds[3])
+        range = _as_range(bounds if bounds is not None else np.full(4, np.nan))
+    counts = np.zeros(xbins * ybins, dtype=np.int64)
+    for x, y in chunks():
+        _accumulate(counts, np.ravel(x), np.ravel(y), range, xbins, ybins)
+    (x0, x1), (y0, y1) = range
+    return counts.reshape(ybins, xbins), np.linspace(x0, x1, xbins + 1), np.linspace(y0, y1, ybins + 1)
+
+def draw_raster(ax, counts, xedges, yedges, log=True, cmap='viridis', colorbar=True, label='Points per bin'):
+    """Draw a density raster on ax, return the image"""
+    masked = np.ma.masked_equal(counts, 0)
+    vmax = max(int(counts.max()), 1)
+    norm = LogNorm(vmin=1, vmax=max(vmax, 2)) if log else Normalize(vmin=0, vmax=vmax)
+    image = ax.imshow(masked, origin='lower', aspect='auto', interpolation='nearest', cmap=cmap, norm=norm,
+                      extent=(xedges[0], xedges[-1], yedges[0], yedges[-1]))
+    if colorbar:
+        ax.figure.colorbar(image, ax=ax, label=label)
+    return image
+
+def plot_density(ax, x, y, bins=400, range=None, log=True, cmap='viridis', colorbar=True, label='Points per bin'):
+    """Draw the density raster of (x, y) on ax, return the image"""
+    counts, xedges, yedges = density_raster(x, y, bins, range)
+    return draw_raster(ax, counts, xedges, yedges, log, cmap, colorbar, label)
+
+def parity_plot(ax, ref, nnp, bins=400, log=True, cmap='viridis', colorbar=True):
+    """Density parity plot of NNP against reference values on a square range, with the y = x line"""
+    ref, nnp = np.ravel(ref), np.ravel(nnp)
+    (x0, x1), (y0, y1) = data_range(ref, nnp)
+    low, high = min(x0, y0), max(x1, y1)
+    plot_density(ax, ref, nnp, bins, ((low, high), (low, high)), log, cmap, colorbar)
+    ax.plot([low, high], [low, high], 'r--', linewidth=0.8, alpha=0.7)
+    ax.set_xlim(low, high)
+    ax.set_ylim(low, high)
+    return low, high
+
+def streamed_parity_plot(ax, chunks, bins=400, log=True, cmap='viridis', colorbar=True):
+    """parity_plot of the (ref, nnp) blocks yielded by chunks() (see streamed_raster), returns the point count"""
+    counts, xedges, _ = streamed_raster(chunks, bins, square=True)
+    draw_raster(ax, counts, xedges, xedges, log, cmap, colorbar)
+    low, high = xedges[0], xedges[-1]
+    ax.plot([low, high], [low, high], 'r--', linewidth=0.8, alpha=0.7)
+    ax.set_xlim(low, high)
+    ax.set_ylim(low, high)
+    return int(counts.sum())
+
+if __name__ == "__main__":
+    import time
+    parser = argparse.ArgumentParser(description="Time density rasters against point count")
+    parser.add_argument("--points", type=int, nargs="+", default=[10**4, 10**6, 10**7])
+    parser.add_argument("--bins", type=int, default=400)
+    parser.add_argument("--output", default="density_benchmark.png")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in args.points:
+        ref = rng.normal(size=n)
+        nnp = ref + 0.05 * rng.standard_t(3, size=n)
+        start = time.perf_counter()
+        fig, ax = plt.subplots(figsize=(6, 6))
+        parity_plot(ax, ref, nnp, args.bins)
+        binned = time.perf_counter()
+        fig.savefig(args.output, dpi=150, bbox_inches='tight')
+        plt.close(fig)
+        done = time.perf_counter()
+        print(f"{n:>10d} points: binning {binned - start:.3f} s, rendering {done - binned:.3f} s")
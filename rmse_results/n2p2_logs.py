@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Aggregate the per-rank logs of an MPI n2p2 run (nnp-dataset.log.0000, ...)
+
+Every rank log is scanned by a worker process, one line at a time against a
+single combined regex, so the logs are never held in memory. The per-rank
+results are merged into one timeline (the *** SECTION *** blocks in the order
+the ranks reached them, with any timing lines found inside) and a summary:
+local structures and bytes received per rank, timing per rank where the log
+has it, the load imbalance factor (max / mean work) and the speedup that
+imbalance allows, warnings by message and extrapolation warnings by type and
+symmetry function.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import re
+from collections import Counter, OrderedDict
+
+# one alternation, the group that matched tells the kind of line
+SCANNER = re.compile("|".join([
+    r"^\*\*\* (?P<section>[A-Z][A-Z0-9 :/_-]*?) \*+\s*$",
+    r"^Number of processors: (?P<nprocs>\d+)",
+    r"^Process \d+ of \d+ \(rank (?P<host_rank>\d+)\): (?P<host>\S+)",
+    r"^Total number of structures: (?P<total>\d+)",
+    r"^Number of local structures: (?P<local>\d+)",
+    r"^Distributed (?P<distributed>\d+) structures, (?P<bytes>\d+) bytes",
+    r"(?P<ew>EXTRAPOLATION WARNING).*?STRUCTURE:\s*(?P<ew_structure>\d+).*?ATOM:\s*\d+"
+    r".*?SYMFUNC:\s*(?P<ew_symfunc>\d+)(?:.*?TYPE:\s*(?P<ew_type>\d+))?",
+    r"^WARNING:\s*(?P<warning>.*?)\s*$",
+    r"^(?P<timing_label>(?:TIMING\s+)?.*?(?:time|Time|TIME|elapsed|Finished)[^:\d]*)[:=]?\s+"
+    r"(?P<seconds>\d+\.?\d*(?:[eE][+-]?\d+)?)\s*(?:s|sec|seconds)\.?\s*$",
+    r"^(?P<energy_line>ENERGY)\s+(?P<rmsepa>\S+)\s+(?P<rmse>\S+)\s+(?P<maepa>\S+)\s+(?P<mae>\S+)",
+    r"^(?P<forces_line>FORCES)\s+(?P<force_rmse>\S+)\s+(?P<force_mae>\S+)",
+]))
+
+def rank_of(filename):
+    match = re.search(r"\.(\d{4})$", filename)
+    return int(match.group(1)) if match else 0
+
+def scan_log(filename):
+    """Stream one rank log and return its counters (runs in a worker process)"""
+    result = {
+        'file': filename, 'rank': rank_of(filename), 'lines': 0, 'sections': [], 'timings': [],
+        'warnings': Counter(), 'ew_by_type': Counter(), 'ew_by_symfunc': Counter(), 'ew_structures': Counter(),
+        'local_structures': None, 'bytes': None, 'hosts': {}, 'nprocs': None,
+        'total_structures': None, 'errors': {},
+    }
+    section = 'START'
+    with open(filename, 'r', errors='replace') as f:
+        for number, line in enumerate(f, 1):
+            result['lines'] = number
+            match = SCANNER.search(line)
+            if match is None:
+                continue
+            found = match.groupdict()
+            if found['section']:
+                section = found['section'].strip()
+                result['sections'].append((number, section))
+            elif found['nprocs']:
+                result['nprocs'] = int(found['nprocs'])
+            elif found['host']:
+                result['hosts'][int(found['host_rank'])] = found['host']
+            elif found['total']:
+                result['total_structures'] = int(found['total'])
+            elif found['local']:
+                result['local_structures'] = int(found['local'])
+            elif found['bytes']:
+                result['bytes'] = int(found['bytes'])
+            elif found['ew']:
+                result['ew_by_type'][int(found['ew_type'] or 0)] += 1
+                result['ew_by_symfunc'][int(found['ew_symfunc'])] += 1
+                result['ew_structures'][int(found['ew_structure'])] += 1
+            elif found['warning']:
+                result['warnings'][found['warning']] += 1
+            elif found['seconds']:
+                result['timings'].append((number, section, found['timing_label'].strip(), float(found['seconds'])))
+            elif found['energy_line']:
+                result['errors']['energy'] = {k: float(found[k]) for k in ('rmsepa', 'rmse', 'maepa', 'mae')}
+            elif found['forces_line']:
+                result['errors']['forces'] = {'rmse': float(found['force_rmse']), 'mae': float(found['force_mae'])}
+    return result
+
+def merge_timeline(results):
+    """Sections in the order ranks reached them: list of (section, ranks that logged it, seconds per rank)"""
+    timeline = OrderedDict()
+    for result in results:
+        for _, section in result['sections']:
+            timeline.setdefault(section, {'ranks': set(), 'seconds': {}})['ranks'].add(result['rank'])
+        for _, section, _, seconds in result['timings']:
+            entry = timeline.setdefault(section, {'ranks': {result['rank']}, 'seconds': {}})
+            entry['seconds'][result['rank']] = entry['seconds'].get(result['rank'], 0.0) + seconds
+    return [(section, sorted(entry['ranks']), entry['seconds']) for section, entry in timeline.items()]
+
+def imbalance(values):
+    """max / mean of per-rank work (1 is perfect balance), None without data"""
+    values = [v for v in values if v is not None]
+    if not values or sum(values) == 0:
+        return None
+    return max(values) / (sum(values) / len(values))
+
+def aggregate(files, nprocs=None):
+    with multiprocessing.Pool(min(nprocs or len(files), len(files))) as pool:
+        results = sorted(pool.map(scan_log, files), key=lambda r: r['rank'])
+
+    ranks = len(results)
+    structures = [r['local_structures'] for r in results]
+    seconds = [sum(t[3] for t in r['timings']) if r['timings'] else None for r in results]
+    # rank 0 reports the bytes it sent, the other ranks the bytes they received
+    received = [r['bytes'] if r['rank'] > 0 else None for r in results]
+    factor = imbalance(seconds) or imbalance(structures)
+    summary = {
+        'ranks': ranks,
+        'nprocs': results[0]['nprocs'] if results else None,
+        'hosts': sorted({host for r in results for host in r['hosts'].values()}),
+        'total_structures': next((r['total_structures'] for r in results if r['total_structures']), None),
+        'per_rank': [{'rank': r['rank'], 'file': r['file'], 'lines': r['lines'], 'local_structures': s,
+                      'bytes_received': b, 'seconds': t, 'extrapolation_warnings': sum(r['ew_by_type'].values())}
+                     for r, s, b, t in zip(results, structures, received, seconds)],
+        'imbalance_structures': imbalance(structures),
+        'imbalance_bytes': imbalance(received),
+        'imbalance_time': imbalance(seconds),
+        # speedup over one rank if the work were otherwise perfectly parallel
+        'max_speedup': ranks / factor if factor else None,
+        'warnings': sum((r['warnings'] for r in results), Counter()),
+        'ew_by_type': sum((r['ew_by_type'] for r in results), Counter()),
+        'ew_by_symfunc': sum((r['ew_by_symfunc'] for r in results), Counter()),
+        'ew_structures': sum((r['ew_structures'] for r in results), Counter()),
+        'errors': next((r['errors'] for r in results if r['errors']), {}),
+        'timeline': merge_timeline(results),
+    }
+    return summary
+
+def print_summary(summary, top=10):
+    print(f"Ranks: {summary['ranks']} logs (run with {summary['nprocs']} processes on {', '.join(summary['hosts'])})")
+    print(f"Structures: {summary['total_structures']}")
+    print(f"{'rank':>4} {'lines':>7} {'structures':>10} {'bytes recv':>11} {'seconds':>9} {'EW':>6}")
+    for entry in summary['per_rank']:
+        received = entry['bytes_received'] if entry['bytes_received'] is not None else '-'
+        seconds = f"{entry['seconds']:.2f}" if entry['seconds'] is not None else '-'
+        print(f"{entry['rank']:>4} {entry['lines']:>7} {str(entry['local_structures']):>10} {str(received):>11} "
+              f"{seconds:>9} {entry['extrapolation_warnings']:>6}")
+    for key, name in (('imbalance_structures', 'structures'), ('imbalance_bytes', 'bytes received'),
+                      ('imbalance_time', 'time')):
+        if summary[key] is not None:
+            print(f"Imbalance (max/mean) in {name}: {summary[key]:.3f}")
+    if summary['imbalance_time'] is None:
+        print("No timing lines in the logs: balance is judged from the work distribution only")
+    if summary['max_speedup'] is not None:
+        print(f"Best speedup from {summary['ranks']} ranks at this balance: {summary['max_speedup']:.2f}x")
+    if summary['errors']:
+        energy, forces = summary['errors'].get('energy'), summary['errors'].get('forces')
+        if energy:
+            print(f"Energy RMSE {energy['rmsepa']:.5e} per atom, force RMSE {forces['rmse'] if forces else float('nan'):.5e}")
+    print("Timeline:")
+    for section, ranks, seconds in summary['timeline']:
+        ranks_text = "all ranks" if len(ranks) == summary['ranks'] else "rank " + ",".join(map(str, ranks))
+        time_text = "  " + ", ".join(f"r{r} {t:.2f} s" for r, t in sorted(seconds.items())) if seconds else ""
+        print(f"  {section:<40} {ranks_text}{time_text}")
+    if summary['warnings']:
+        print("Warnings:")
+        for message, count in summary['warnings'].most_common():
+            print(f"  {count:6d} x {message}")
+    total = sum(summary['ew_by_type'].values())
+    print(f"Extrapolation warnings: {total}")
+    if total:
+        print("  by type: " + ", ".join(f"G{t} {n}" for t, n in sorted(summary['ew_by_type'].items())))
+        print("  by symfunc: " + ", ".join(f"{s} ({n})" for s, n in summary['ew_by_symfunc'].most_common(top)))
+        print("  by structure: " + ", ".join(f"{s} ({n})" for s, n in summary['ew_structures'].most_common(top)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge per-rank n2p2 logs into one summary")
+    parser.add_argument("files", nargs="*", help="Rank logs (default: nnp-dataset.log.*)")
+    parser.add_argument("--nprocs", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", default=None, help="Also write the summary to a JSON file")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob("nnp-dataset.log.*"))
+    if not files:
+        parser.error("no log files given or found")
+    summary = aggregate(files, args.nprocs)
+    print_summary(summary, args.top)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=1, default=lambda o: sorted(o) if isinstance(o, set) else str(o))
+        print(f"Summary written to {args.json}")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Chunked, vectorized readers for n2p2 comparison outputs
+
+energy.comp, energy.out, nnforces.out, nnatoms.out (and the trainpoints /
+trainforces files of training runs) are read in blocks of bytes that are
+converted to arrays in one call, so parsing is a few NumPy operations per
+block instead of Python work per line. Per-structure reductions are
+accumulated block by block with np.bincount over the structure column, which
+keeps memory bounded by the block size however large the validation set is.
+"""
+
+import argparse
+import re
+import numpy as np
+
+# n2p2 column layouts (0-based column of each quantity)
+LAYOUTS = {
+    'energy.comp': {'conf': 0, 'natoms': 1, 'ref': 2, 'nnp': 3},
+    'energy.out': {'conf': 0, 'natoms': 1, 'ref': 2, 'nnp': 3},
+    'nnforces.out': {'conf': 0, 'index': 1, 'ref': [2, 3, 4], 'nnp': [5, 6, 7]},
+    'nnatoms.out': {'conf': 0, 'index': 1, 'Z': 2, 'ref': 5, 'nnp': 6},
+    'forces.comp': {'conf': 0, 'index': 1, 'ref': 2, 'nnp': 3},
+    'trainpoints': {'conf': 0, 'ref': 1, 'nnp': 2},
+    # index_s index_a Fi_Ref Fi_NNP, one force component per line
+    'trainforces': {'conf': 0, 'index': 1, 'ref': 2, 'nnp': 3},
+}
+
+COMMENT = re.compile(rb'(?m)^[ \t]*#.*(?:\n|$)')
+
+def iter_chunks(filename, chunk_bytes=32 * 1024 * 1024):
+    """Yield (rows, columns) float arrays of the data lines, chunk_bytes of text at a time"""
+    with open(filename, 'rb') as f:
+        rest = b''
+        ncols = None
+        while True:
+            block = f.read(chunk_bytes)
+            eof = not block
+            block = rest + block
+            # keep an incomplete last line for the next block
+            cut = len(block) if eof else block.rfind(b'\n') + 1
+            block, rest = block[:cut], block[cut:]
+            block = COMMENT.sub(b'', block)
+            if block.strip():
+                if ncols is None:
+                    ncols = len(block.lstrip().split(b'\n', 1)[0].split())
+                values = np.array(block.split(), dtype=float)
+                if len(values) % ncols:
+                    raise ValueError(f"{filename}: data lines do not all have {ncols} columns")
+                yield values.reshape(-1, ncols)
+            if eof:
+                break
+
+def read_table(filename, chunk_bytes=32 * 1024 * 1024):
+    """All data lines of an n2p2 output as one array"""
+    chunks = list(iter_chunks(filename, chunk_bytes))
+    return np.concatenate(chunks) if chunks else np.zeros((0, 0))
+
+def layout(filename, kind=None):
+    """Column layout of an n2p2 output file, from kind (a LAYOUTS key) or the file name"""
+    if kind is not None:
+        return LAYOUTS[kind]
+    name = filename.replace('\\', '/').split('/')[-1]
+    for key, columns in LAYOUTS.items():
+        if name.startswith(key):
+            return columns
+    for key, columns in LAYOUTS.items():
+        if name.startswith(key.split('.')[0]):
+            return columns
+    raise ValueError(f"Unknown n2p2 output {filename}, expected one of {', '.join(LAYOUTS)}")
+
+def read_energies(filename, kind=None):
+    """(conf, natoms, Eref, Ennp) arrays of energy.comp / energy.out"""
+    data = read_table(filename)
+    columns = layout(filename, kind)
+    return (data[:, columns['conf']].astype(np.int64), data[:, columns['natoms']].astype(np.int64),
+            data[:, columns['ref']], data[:, columns['nnp']])
+
+def read_forces(filename, kind=None):
+    """(conf, atom index, reference forces, NNP forces) of nnforces.out, forces as (atoms, 3)
+
+    For the one-component-per-line forces.comp layout the force arrays are (components,).
+    """
+    data = read_table(filename)
+    columns = layout(filename, kind)
+    return (data[:, columns['conf']].astype(np.int64), data[:, columns['index']].astype(np.int64),
+            data[:, columns['ref']], data[:, columns['nnp']])
+
+def read_atomic_energies(filename, kind=None):
+    """(conf, atom index, Eref_atom, Ennp_atom) of nnatoms.out"""
+    data = read_table(filename)
+    columns = layout(filename, kind)
+    return (data[:, columns['conf']].astype(np.int64), data[:, columns['index']].astype(np.int64),
+            data[:, columns['ref']], data[:, columns['nnp']])
+
+def _grow(array, size):
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def force_rmse_per_structure(filename, chunk_bytes=32 * 1024 * 1024, kind=None):
+    """(conf, force RMSE over all components, number of components) per structure, in one streaming pass"""
+    columns = layout(filename, kind)
+    ref, nnp = np.atleast_1d(columns['ref']), np.atleast_1d(columns['nnp'])
+    squares = np.zeros(0)
+    counts = np.zeros(0, dtype=np.int64)
+    for chunk in iter_chunks(filename, chunk_bytes):
+        conf = chunk[:, columns['conf']].astype(np.int64)
+        error = ((chunk[:, nnp] - chunk[:, ref])**2).sum(axis=1)
+        size = int(conf.max()) + 1
+        squares, counts = _grow(squares, size), _grow(counts, size)
+        squares[:size] += np.bincount(conf, error, minlength=size)
+        counts[:size] += np.bincount(conf, minlength=size) * len(ref)
+    present = np.flatnonzero(counts)
+    return present, np.sqrt(squares[present] / counts[present]), counts[present]
+
+def energy_errors(filename, kind=None):
+    """(conf, natoms, error per atom) of energy.comp / energy.out"""
+    conf, natoms, ref, nnp = read_energies(filename, kind)
+    return conf, natoms, (nnp - ref) / natoms
+
+def atomic_energy_rmse_per_structure(filename, chunk_bytes=32 * 1024 * 1024, kind=None):
+    """(conf, RMSE of atomic energy contributions) per structure of nnatoms.out, streaming"""
+    columns = layout(filename, kind)
+    squares = np.zeros(0)
+    counts = np.zeros(0, dtype=np.int64)
+    for chunk in iter_chunks(filename, chunk_bytes):
+        conf = chunk[:, columns['conf']].astype(np.int64)
+        size = int(conf.max()) + 1
+        squares, counts = _grow(squares, size), _grow(counts, size)
+        squares[:size] += np.bincount(conf, (chunk[:, columns['nnp']] - chunk[:, columns['ref']])**2, minlength=size)
+        counts[:size] += np.bincount(conf, minlength=size)
+    present = np.flatnonzero(counts)
+    return present, np.sqrt(squares[present] / counts[present])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize n2p2 comparison outputs")
+    parser.add_argument("files", nargs="+", help="energy.comp, energy.out, nnforces.out, nnatoms.out, ...")
+    parser.add_argument("--kind", choices=list(LAYOUTS), default=None, help="Layout if not clear from the file name")
+    args = parser.parse_args()
+
+    for filename in args.files:
+        columns = layout(filename, args.kind)
+        if 'natoms' in columns:
+            conf, natoms, error = energy_errors(filename, args.kind)
+            print(f"{filename}: {len(conf)} structures, energy RMSE {np.sqrt(np.mean(error**2)) * 1000:.4f} meV/atom, "
+                  f"MAE {np.mean(np.abs(error)) * 1000:.4f} meV/atom")
+        elif 'Z' in columns:
+            conf, rmse = atomic_energy_rmse_per_structure(filename, kind=args.kind)
+            print(f"{filename}: {len(conf)} structures, mean atomic energy RMSE {rmse.mean():.6e} eV")
+        else:
+            conf, rmse, counts = force_rmse_per_structure(filename, kind=args.kind)
+            total = np.sqrt(np.sum(rmse**2 * counts) / counts.sum())
+            print(f"{filename}: {len(conf)} structures, {counts.sum()} components, force RMSE {total:.6e} eV/A, "
+                  f"worst structure {conf[np.argmax(rmse)]} ({rmse.max():.6e} eV/A)")
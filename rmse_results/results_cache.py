@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Binary cache of parsed n2p2 comparison outputs for many models and epochs
+
+Every energy.comp / nnforces.out / trainpoints.NNNNNN.out / trainforces... file
+is parsed once (n2p2_outputs.py) and stored under the SHA-1 of its contents as
+a full table (.npy, memory-mapped on load) plus a small per-structure summary
+(structure index, error, number of values); the key also holds the layout the
+file was read with, since the summary depends on it. A path index with size and mtime
+avoids re-hashing unchanged files. Learning curves, error rankings and
+model-to-model deltas are then computed from the summaries only.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from n2p2_outputs import layout, read_table, LAYOUTS
+
+SUMMARY_FIELDS = ['conf', 'error', 'count']
+
+def file_hash(filename, block_size=16 * 1024 * 1024):
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def guess_kind(filename):
+    """LAYOUTS key of a file name (trainpoints/testpoints and trainforces/testforces share layouts)"""
+    name = os.path.basename(filename)
+    if name.startswith(('trainpoints', 'testpoints')):
+        return 'trainpoints'
+    if name.startswith(('trainforces', 'testforces')):
+        return 'trainforces'
+    for key in LAYOUTS:
+        if name.startswith(key.split('.')[0]):
+            return key
+    raise ValueError(f"Cannot tell the n2p2 output type of {filename}, pass kind")
+
+def summarize(table, kind):
+    """Per-structure (conf, error, count): signed energy error per atom, or force RMSE"""
+    columns = LAYOUTS[kind]
+    conf = table[:, columns['conf']].astype(np.int64)
+    if kind in ('energy.comp', 'energy.out'):
+        natoms = table[:, columns['natoms']]
+        return conf, (table[:, columns['nnp']] - table[:, columns['ref']]) / natoms, natoms.astype(np.int64)
+    if kind == 'trainpoints':
+        # energies per atom already
+        return conf, table[:, columns['nnp']] - table[:, columns['ref']], np.ones(len(conf), dtype=np.int64)
+    ref, nnp = np.atleast_1d(columns['ref']), np.atleast_1d(columns['nnp'])
+    squared = ((table[:, nnp] - table[:, ref])**2).sum(axis=1)
+    sums = np.bincount(conf, squared)
+    counts = np.bincount(conf) * len(ref)
+    present = np.flatnonzero(counts)
+    return present, np.sqrt(sums[present] / counts[present]), counts[present]
+
+def epoch_of(filename):
+    """Epoch number of an n2p2 per-epoch file name (trainpoints.000018.out -> 18), or None"""
+    match = re.search(r'\.(\d{6})\.', os.path.basename(filename))
+    return int(match.group(1)) if match else None
+
+class ResultsCache:
+    """Parsed comparison files stored by content hash in a cache directory"""
+
+    def __init__(self, directory=".results_cache"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index_file = os.path.join(directory, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as f:
+                self.index = json.load(f)
+
+    def _save_index(self):
+        tmp = self.index_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self.index_file)
+
+    def key(self, filename):
+        """Content hash of a file, reused from the index while size and mtime are unchanged"""
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        entry = self.index.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry['sha1']
+        digest = file_hash(path)
+        self.index[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': digest}
+        self._save_index()
+        return digest
+
+    def add(self, filename, kind=None):
+        """Parse a file into the cache if needed, return its key (content hash and layout)"""
+        kind = kind or guess_kind(filename)
+        digest = f"{self.key(filename)}-{kind}"
+        folder = os.path.join(self.directory, digest)
+        if not os.path.exists(os.path.join(folder, "meta.json")):
+            table = read_table(filename)
+            os.makedirs(folder, exist_ok=True)
+            np.save(os.path.join(folder, "table.npy"), table)
+            conf, error, count = summarize(table, kind)
+            np.savez(os.path.join(folder, "summary.npz"), conf=conf, error=error, count=count)
+            with open(os.path.join(folder, "meta.json"), 'w') as f:
+                json.dump({'kind': kind, 'source': os.path.abspath(filename), 'rows': len(table),
+                           'columns': layout(filename, kind)}, f)
+        return digest
+
+    def table(self, filename, kind=None):
+        """Full parsed table (memory-mapped)"""
+        digest = self.add(filename, kind)
+        return np.load(os.path.join(self.directory, digest, "table.npy"), mmap_mode='r')
+
+    def summary(self, filename, kind=None):
+        """(conf, error, count) per structure"""
+        digest = self.add(filename, kind)
+        with np.load(os.path.join(self.directory, digest, "summary.npz")) as data:
+            return tuple(data[field] for field in SUMMARY_FIELDS)
+
+    def error_matrix(self, filenames, kind=None):
+        """(structure indices, errors of shape (files, structures)) aligned on the union of structures, NaN if absent"""
+        summaries = [self.summary(f, kind) for f in filenames]
+        union = np.unique(np.concatenate([conf for conf, _, _ in summaries])) if summaries else np.zeros(0, int)
+        matrix = np.full((len(summaries), len(union)), np.nan)
+        for row, (conf, error, _) in enumerate(summaries):
+            matrix[row, np.searchsorted(union, conf)] = error
+        return union, matrix
+
+    def rmse_curve(self, filenames, kind=None):
+        """RMSE over structures of every file (count-weighted for forces)"""
+        rmse = np.empty(len(filenames))
+        for k, filename in enumerate(filenames):
+            conf, error, count = self.summary(filename, kind)
+            weights = count if (kind or guess_kind(filename)) in ('nnforces.out', 'forces.comp', 'trainforces') \
+                else np.ones_like(error)
+            rmse[k] = np.sqrt(np.sum(weights * error**2) / max(np.sum(weights), 1))
+        return rmse
+
+    def ranking(self, filename, top=20, kind=None):
+        """Structures with the largest absolute error, (conf, error) sorted worst first"""
+        conf, error, _ = self.summary(filename, kind)
+        order = np.argsort(-np.abs(error))[:top]
+        return conf[order], error[order]
+
+    def delta(self, first, second, kind=None):
+        """(conf, |error| in second - |error| in first) for structures present in both"""
+        conf, matrix = self.error_matrix([first, second], kind)
+        both = ~np.isnan(matrix).any(axis=0)
+        return conf[both], np.abs(matrix[1, both]) - np.abs(matrix[0, both])
+
+def epoch_files(pattern):
+    """Per-epoch files matching a glob pattern, sorted by epoch: (epochs, files)"""
+    files = [f for f in glob.glob(pattern) if epoch_of(f) is not None]
+    files.sort(key=epoch_of)
+    return np.array([epoch_of(f) for f in files], dtype=np.int64), files
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache and compare parsed n2p2 comparison outputs")
+    parser.add_argument("--cache", default=".results_cache", help="Cache directory")
+    subparsers = parser.add_subparsers(dest="command")
+
+    p = subparsers.add_parser("add", help="Parse files into the cache")
+    p.add_argument("files", nargs="+")
+    p = subparsers.add_parser("curve", help="RMSE per epoch, e.g. 'trainpoints.*.out'")
+    p.add_argument("pattern")
+    p.add_argument("--output", default=None, help="Write the curve to a text file")
+    p.add_argument("--plot", default=None, help="Save a plot of the curve")
+    p = subparsers.add_parser("rank", help="Structures with the largest errors")
+    p.add_argument("file")
+    p.add_argument("--top", type=int, default=20)
+    p = subparsers.add_parser("delta", help="Per-structure error change between two models")
+    p.add_argument("first")
+    p.add_argument("second")
+    p.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    cache = ResultsCache(args.cache)
+    if args.command == "add":
+        for filename in args.files:
+            print(f"{filename}: {cache.add(filename)}")
+    elif args.command == "curve":
+        epochs, files = epoch_files(args.pattern)
+        rmse = cache.rmse_curve(files)
+        for epoch, value in zip(epochs, rmse):
+            print(f"{epoch:6d} {value:.6e}")
+        if args.output:
+            np.savetxt(args.output, np.column_stack([epochs, rmse]), fmt=['%d', '%.8e'], header="epoch rmse")
+        if args.plot:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+            fig, ax = plt.subplots(figsize=(8, 5))
+            ax.semilogy(epochs, rmse, 'o-')
+            ax.set_xlabel('Epoch')
+            ax.set_ylabel('RMSE')
+            ax.set_title(args.pattern)
+            ax.grid(True, alpha=0.3)
+            fig.savefig(args.plot, dpi=150, bbox_inches='tight')
+            print(f"Plot saved as '{args.plot}'")
+    elif args.command == "rank":
+        conf, error = cache.ranking(args.file, args.top)
+        for c, e in zip(conf, error):
+            print(f"{c:8d} {e: .6e}")
+    elif args.command == "delta":
+        conf, change = cache.delta(args.first, args.second)
+        order = np.argsort(change)
+        print(f"{len(conf)} common structures, mean |error| change {change.mean(): .6e}")
+        print("Largest decrease:")
+        for k in order[:args.top]:
+            print(f"{conf[k]:8d} {change[k]: .6e}")
+        print("Largest increase:")
+        for k in order[::-1][:args.top]:
+            print(f"{conf[k]:8d} {change[k]: .6e}")
+    else:
+        parser.print_help()
@@ -7,57 +7,20 @@ Author: Generated for Argon NNP validation
 Date: July 2025
 """
 
+import os
 import numpy as np
 import matplotlib.pyplot as plt
-from collections import defaultdict
+from n2p2_outputs import read_energies, force_rmse_per_structure, iter_chunks, layout
+from validation_stats import cluster_bootstrap
+from density_plot import plot_density, parity_plot, streamed_parity_plot
+
+# above this many points per panel, scatter plots are drawn as density rasters
+DENSITY_THRESHOLD = 100000
 
 def read_energy_comp(filename):
     """Read energy.comp file and return structure indices, reference and predicted energies"""
-    indices = []
-    ref_energies = []
-    nnp_energies = []
-    
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            # Skip comments and empty lines
-            if line.startswith('#') or not line:
-                continue
-            
-            parts = line.split()
-            if len(parts) >= 4:
-                index = int(parts[0])
-                ref_energy = float(parts[2])
-                nnp_energy = float(parts[3])
-                
-                indices.append(index)
-                ref_energies.append(ref_energy)
-                nnp_energies.append(nnp_energy)
-    
-    return np.array(indices), np.array(ref_energies), np.array(nnp_energies)
-
-def read_forces_comp(filename):
-    """Read forces.comp file and return structure-wise force data"""
-    # Group forces by structure index
-    structure_forces = defaultdict(lambda: {'ref': [], 'nnp': []})
-    
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            # Skip comments and empty lines
-            if line.startswith('#') or not line:
-                continue
-            
-            parts = line.split()
-            if len(parts) >= 4:
-                struct_idx = int(parts[0])
-                ref_force = float(parts[2])
-                nnp_force = float(parts[3])
-                
-                structure_forces[struct_idx]['ref'].append(ref_force)
-                structure_forces[struct_idx]['nnp'].append(nnp_force)
-    
-    return structure_forces
+    indices, _, ref_energies, nnp_energies = read_energies(filename, kind='energy.comp')
+    return indices, ref_energies, nnp_energies
 
 def calculate_energy_rmse_per_structure(indices, ref_energies, nnp_energies):
     """Calculate RMSE per structure for energies"""
@@ -65,59 +28,87 @@ def calculate_energy_rmse_per_structure(indices, ref_energies, nnp_energies):
     rmse_per_structure = np.abs(ref_energies - nnp_energies)  # Actually absolute error for energy
     return indices, rmse_per_structure
 
-def calculate_force_rmse_per_structure(structure_forces):
-    """Calculate RMSE per structure for forces"""
-    indices = []
-    rmse_values = []
-    
-    for struct_idx in sorted(structure_forces.keys()):
-        ref_forces = np.array(structure_forces[struct_idx]['ref'])
-        nnp_forces = np.array(structure_forces[struct_idx]['nnp'])
-        
-        # Calculate RMSE for this structure
-        rmse = np.sqrt(np.mean((ref_forces - nnp_forces)**2))
-        
-        indices.append(struct_idx)
-        rmse_values.append(rmse)
+def error_panel(ax, indices, values, color, density, bins=400):
+    """Per-structure error against structure index, as a scatter or a density raster"""
+    if density:
+        plot_density(ax, indices, values, bins)
+    else:
+        ax.scatter(indices, values, c=color, alpha=0.7, s=8)
+
+def force_component_chunks(forces_file):
+    """Function returning a fresh iterator over (reference, NNP) force component blocks of forces.comp / nnforces.out"""
+    kind = 'nnforces.out' if os.path.basename(forces_file).startswith('nnforces') else 'forces.comp'
+    columns = layout(forces_file, kind)
+    ref, nnp = np.atleast_1d(columns['ref']), np.atleast_1d(columns['nnp'])
+    return lambda: ((chunk[:, ref], chunk[:, nnp]) for chunk in iter_chunks(forces_file))
+
+def create_parity_plots(energy_file='energy.comp', forces_file='nnforces.out', output='parity_plots.png', bins=400,
+                        log=True):
+    """Density parity plots of NNP against reference energies per atom and force components
+
+    Force components are binned block by block while reading, so memory does not grow with the data set.
+    """
+    _, natoms, ref_energies, nnp_energies = read_energies(energy_file, kind='energy.comp')
+    
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(13, 6))
+    parity_plot(ax1, ref_energies / natoms, nnp_energies / natoms, bins, log)
+    ax1.set_xlabel('Reference Energy per Atom')
+    ax1.set_ylabel('NNP Energy per Atom')
+    ax1.set_title(f'Energy Parity ({len(natoms)} structures)')
+    components = streamed_parity_plot(ax2, force_component_chunks(forces_file), bins, log)
+    ax2.set_xlabel('Reference Force Component')
+    ax2.set_ylabel('NNP Force Component')
+    ax2.set_title(f'Force Parity ({components} components)')
     
-    return np.array(indices), np.array(rmse_values)
+    plt.tight_layout()
+    plt.savefig(output, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    print(f"Parity plots saved as '{output}'")
 
-def create_rmse_plots():
-    """Create RMSE plots for energy and forces"""
+def create_rmse_plots(density=None, energy_file='energy.comp'):
+    """Create RMSE plots for energy and forces (density rasters if density, or automatically for large sets)"""
     
     print("Reading energy comparison data...")
-    energy_indices, ref_energies, nnp_energies = read_energy_comp('energy.comp')
+    energy_indices, natoms, ref_energies, nnp_energies = read_energies(energy_file, kind='energy.comp')
     
     print("Reading forces comparison data...")
-    structure_forces = read_forces_comp('forces.comp')
+    # nnp-dataset writes nnforces.out (one atom per line), older runs forces.comp
+    forces_file = 'forces.comp' if os.path.exists('forces.comp') else 'nnforces.out'
+    kind = 'forces.comp' if forces_file == 'forces.comp' else 'nnforces.out'
     
     print("Calculating RMSE values...")
-    # Calculate RMSE per structure
+    # Calculate RMSE per structure (forces are reduced chunk by chunk while reading)
     energy_indices, energy_rmse = calculate_energy_rmse_per_structure(energy_indices, ref_energies, nnp_energies)
-    force_indices, force_rmse = calculate_force_rmse_per_structure(structure_forces)
+    force_indices, force_rmse, _ = force_rmse_per_structure(forces_file, kind=kind)
     
     # Calculate mean RMSE values
     mean_energy_rmse = np.mean(energy_rmse)
     mean_force_rmse = np.mean(force_rmse)
     
-    print(f"Mean Energy RMSE: {mean_energy_rmse:.6f}")
+    print(f"Mean Absolute Energy Error: {mean_energy_rmse:.6f}")
     print(f"Mean Force RMSE: {mean_force_rmse:.6f}")
+    # overall RMSE with a 95% interval from resampling whole structures
+    rmse, lower, upper = cluster_bootstrap(((nnp_energies - ref_energies) / natoms)**2, np.ones(len(natoms)))
+    print(f"Energy RMSE per atom: {rmse:.6e} (95% CI {lower:.6e} - {upper:.6e})")
+    
+    if density is None:
+        density = max(len(energy_indices), len(force_indices)) > DENSITY_THRESHOLD
     
     # Create plots
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
     
-    # Energy RMSE plot
-    ax1.scatter(energy_indices, energy_rmse, c='red', alpha=0.7, s=8)
+    # Energy error plot (one energy per structure, so this is the absolute error)
+    error_panel(ax1, energy_indices, energy_rmse, 'red', density)
     ax1.axhline(y=mean_energy_rmse, color='orange', linestyle='--', 
-                label=f'Mean Energy RMSE: {mean_energy_rmse:.6f}')
+                label=f'Mean Absolute Energy Error: {mean_energy_rmse:.6f}')
     ax1.set_xlabel('Structure Index')
-    ax1.set_ylabel('Energy RMSE')
-    ax1.set_title('Energy RMSE vs Structure Index')
+    ax1.set_ylabel('Absolute Energy Error')
+    ax1.set_title('Absolute Energy Error vs Structure Index')
     ax1.grid(True, alpha=0.3)
     ax1.legend()
     
     # Force RMSE plot
-    ax2.scatter(force_indices, force_rmse, c='blue', alpha=0.7, s=8)
+    error_panel(ax2, force_indices, force_rmse, 'blue', density)
     ax2.axhline(y=mean_force_rmse, color='red', linestyle='--', 
                 label=f'Mean Force RMSE: {mean_force_rmse:.6f}')
     ax2.set_xlabel('Structure Index')
@@ -132,6 +123,17 @@ def create_rmse_plots():
     
     print(f"Plots saved as 'rmse_validation_plots.png'")
     print(f"Total structures analyzed: {len(energy_indices)}")
+    
+    create_parity_plots(energy_file, forces_file)
 
 if __name__ == "__main__":
-    create_rmse_plots()
+    import argparse
+    parser = argparse.ArgumentParser(description="RMSE and parity plots of n2p2 validation results")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--density", dest="density", action="store_true", default=None,
+                      help="Always draw per-structure errors as density rasters")
+    mode.add_argument("--scatter", dest="density", action="store_false",
+                      help=f"Always draw scatter plots (default: density above {DENSITY_THRESHOLD} points)")
+    args = parser.parse_args()
+
+    create_rmse_plots(args.density)
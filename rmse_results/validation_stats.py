@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Validation statistics for n2p2 comparison outputs
+
+RMSE and MAE of energies per atom and of force components, with bootstrap
+confidence intervals. Structures are resampled as a whole (force components of
+one structure are correlated), and resampling works on per-structure sums of
+squared errors, so thousands of resamples are a few gathers of a
+(resamples, structures) index matrix, processed in batches of bounded size.
+Also reports errors by atom count, per force component, force magnitude and
+direction errors, and the worst structures and atoms.
+"""
+
+import argparse
+import json
+import numpy as np
+from n2p2_outputs import read_energies, read_forces
+
+def cluster_bootstrap(sums, counts, nresamples=2000, confidence=0.95, seed=0, root=True, max_elements=2**24):
+    """Percentile interval of sum(sums) / sum(counts) (its square root if root) under resampling of clusters
+
+    Returns (estimate, lower, upper).
+    """
+    sums = np.asarray(sums, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    n = len(sums)
+    transform = np.sqrt if root else (lambda x: x)
+    estimate = float(transform(sums.sum() / counts.sum()))
+    if n < 2:
+        return estimate, estimate, estimate
+    rng = np.random.default_rng(seed)
+    batch = max(1, min(nresamples, max_elements // n))
+    samples = np.empty(nresamples)
+    for start in range(0, nresamples, batch):
+        stop = min(start + batch, nresamples)
+        index = rng.integers(0, n, (stop - start, n))
+        samples[start:stop] = transform(sums[index].sum(axis=1) / counts[index].sum(axis=1))
+    alpha = 0.5 * (1.0 - confidence)
+    lower, upper = np.quantile(samples, [alpha, 1.0 - alpha])
+    return estimate, float(lower), float(upper)
+
+def energy_statistics(conf, natoms, ref, nnp, nresamples=2000, confidence=0.95, seed=0, outliers=10):
+    """Energy per atom error statistics"""
+    error = (nnp - ref) / natoms
+    rmse, lower, upper = cluster_bootstrap(error**2, np.ones_like(error), nresamples, confidence, seed)
+    mae, mae_lower, mae_upper = cluster_bootstrap(np.abs(error), np.ones_like(error), nresamples, confidence, seed,
+                                                  root=False)
+    result = {
+        'structures': int(len(error)),
+        'rmse': rmse, 'rmse_ci': [lower, upper],
+        'mae': mae, 'mae_ci': [mae_lower, mae_upper],
+        'max_abs': float(np.abs(error).max()) if len(error) else 0.0,
+        'by_natoms': {},
+    }
+    sizes, inverse = np.unique(natoms, return_inverse=True)
+    squared = np.bincount(inverse, error**2)
+    number = np.bincount(inverse)
+    for size, total, count in zip(sizes, squared, number):
+        result['by_natoms'][int(size)] = {'structures': int(count), 'rmse': float(np.sqrt(total / count))}
+    worst = np.argsort(-np.abs(error))[:outliers]
+    result['outliers'] = [(int(conf[k]), float(error[k])) for k in worst]
+    return result
+
+def force_statistics(conf, index, ref, nnp, nresamples=2000, confidence=0.95, seed=0, outliers=10,
+                     min_force=1e-3):
+    """Force error statistics for (atoms, 3) reference and NNP forces"""
+    diff = nnp - ref
+    squared = np.einsum('ij,ij->i', diff, diff)
+    # per-structure sums for the cluster bootstrap
+    structures, inverse = np.unique(conf, return_inverse=True)
+    sums = np.bincount(inverse, squared)
+    counts = 3 * np.bincount(inverse)
+    rmse, lower, upper = cluster_bootstrap(sums, counts, nresamples, confidence, seed)
+
+    ref_norm = np.sqrt(np.einsum('ij,ij->i', ref, ref))
+    nnp_norm = np.sqrt(np.einsum('ij,ij->i', nnp, nnp))
+    magnitude = nnp_norm - ref_norm
+    # direction error only where the reference force is not negligible
+    significant = (ref_norm > min_force) & (nnp_norm > 0)
+    cos = np.einsum('ij,ij->i', ref[significant], nnp[significant]) / (ref_norm[significant] * nnp_norm[significant])
+    angle = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+    per_structure = np.sqrt(sums / counts)
+    worst_structures = np.argsort(-per_structure)[:outliers]
+    worst_atoms = np.argsort(-squared)[:outliers]
+    return {
+        'structures': int(len(structures)),
+        'components': int(3 * len(conf)),
+        'rmse': rmse, 'rmse_ci': [lower, upper],
+        'mae': float(np.abs(diff).mean()) if len(diff) else 0.0,
+        'rmse_xyz': np.sqrt((diff**2).mean(axis=0)).tolist() if len(diff) else [0.0] * 3,
+        'magnitude_rmse': float(np.sqrt(np.mean(magnitude**2))) if len(diff) else 0.0,
+        'magnitude_bias': float(magnitude.mean()) if len(diff) else 0.0,
+        'angle_mean': float(angle.mean()) if len(angle) else 0.0,
+        'angle_p95': float(np.percentile(angle, 95)) if len(angle) else 0.0,
+        'angle_atoms': int(significant.sum()),
+        'outlier_structures': [(int(structures[k]), float(per_structure[k])) for k in worst_structures],
+        'outlier_atoms': [(int(conf[k]), int(index[k]), float(np.sqrt(squared[k]))) for k in worst_atoms],
+    }
+
+def print_report(energy=None, forces=None, confidence=0.95):
+    percent = int(round(confidence * 100))
+    if energy is not None:
+        print(f"Energy ({energy['structures']} structures)")
+        print(f"  RMSE {energy['rmse'] * 1000:.4f} meV/atom, {percent}% CI "
+              f"[{energy['rmse_ci'][0] * 1000:.4f}, {energy['rmse_ci'][1] * 1000:.4f}]")
+        print(f"  MAE  {energy['mae'] * 1000:.4f} meV/atom, {percent}% CI "
+              f"[{energy['mae_ci'][0] * 1000:.4f}, {energy['mae_ci'][1] * 1000:.4f}]")
+        print(f"  max |error| {energy['max_abs'] * 1000:.4f} meV/atom")
+        for size, entry in energy['by_natoms'].items():
+            print(f"  {size:6d} atoms: {entry['structures']:6d} structures, RMSE {entry['rmse'] * 1000:.4f} meV/atom")
+        print("  worst structures (index, error meV/atom): " +
+              ", ".join(f"{c} ({e * 1000:+.3f})" for c, e in energy['outliers']))
+    if forces is not None:
+        print(f"Forces ({forces['components']} components in {forces['structures']} structures)")
+        print(f"  RMSE {forces['rmse'] * 1000:.4f} meV/A, {percent}% CI "
+              f"[{forces['rmse_ci'][0] * 1000:.4f}, {forces['rmse_ci'][1] * 1000:.4f}]")
+        print(f"  MAE  {forces['mae'] * 1000:.4f} meV/A")
+        print("  RMSE x/y/z " + " / ".join(f"{v * 1000:.4f}" for v in forces['rmse_xyz']) + " meV/A")
+        print(f"  magnitude RMSE {forces['magnitude_rmse'] * 1000:.4f} meV/A, bias {forces['magnitude_bias'] * 1000:+.4f} meV/A")
+        print(f"  direction error mean {forces['angle_mean']:.3f} deg, 95th percentile {forces['angle_p95']:.3f} deg "
+              f"({forces['angle_atoms']} atoms)")
+        print("  worst structures (index, RMSE meV/A): " +
+              ", ".join(f"{c} ({e * 1000:.3f})" for c, e in forces['outlier_structures']))
+        print("  worst atoms (structure:atom, |dF| meV/A): " +
+              ", ".join(f"{c}:{a} ({e * 1000:.3f})" for c, a, e in forces['outlier_atoms']))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals and error breakdowns")
+    parser.add_argument("--energy", default="energy.comp", help="energy.comp / energy.out ('' to skip)")
+    parser.add_argument("--forces", default="nnforces.out", help="nnforces.out ('' to skip)")
+    parser.add_argument("--resamples", type=int, default=2000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--outliers", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the statistics to a JSON file")
+    args = parser.parse_args()
+
+    energy = forces = None
+    if args.energy:
+        energy = energy_statistics(*read_energies(args.energy), args.resamples, args.confidence, args.seed,
+                                   args.outliers)
+    if args.forces:
+        forces = force_statistics(*read_forces(args.forces, kind='nnforces.out'), args.resamples, args.confidence,
+                                  args.seed, args.outliers)
+    print_report(energy, forces, args.confidence)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'energy': energy, 'forces': forces}, f, indent=1, default=float)
+        print(f"Statistics written to {args.json}")